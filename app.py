@@ -3,20 +3,36 @@ from typing import Optional
 import streamlit as st
 import json
 import os
+import time
 import requests
 from dotenv import load_dotenv
-from pprint import pprint
 
-from settings import CONF_FILE, LANGFLOW_TWEAKS, COUNTRIES, AGE_GROUPS, PLATFORMS, TRIBES
+from langflow_client import FlowStream, LangflowStreamError, build_payload, build_session, run_url
+from settings import CONF_FILE, LANGFLOW_TWEAKS, COUNTRIES, AGE_GROUPS, PLATFORMS, TRIBES, LANGFLOW_STREAM, \
+    LANGFLOW_STREAM_COMPONENT, LANGFLOW_CONNECT_TIMEOUT_S, LANGFLOW_READ_TIMEOUT_S, LANGFLOW_JSON_FILE
+from tweaks import TweakBuilder, Tweaks, load_flow_defaults, update_tweaks_with_user_input
+from custom_components.stats_cube import STATS_CUBE_METRICS, get_stats_cube, stats_cube_path
 
 load_dotenv(".env")
 
+# Baseline tweaks are pruned once; each turn only adds the user's overrides
+TWEAK_BUILDER = TweakBuilder(LANGFLOW_TWEAKS, flow_defaults=load_flow_defaults(LANGFLOW_JSON_FILE))
+
+# Segment statistics, pre-aggregated at ingestion for the collection the flow searches
+STATS_CUBE_PATH = stats_cube_path(LANGFLOW_TWEAKS["AstraDB-wNHGZ"]["collection_name"])
+
 # Load configuration from config.json file
 def load_config():
     with open(CONF_FILE, 'r') as file:
         return json.load(file)
 
 
+# One pooled keep-alive session per process, shared by every browser session
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    return build_session()
+
+
 # Inject custom CSS for styling
 def add_custom_css():
     st.markdown(
@@ -46,56 +62,6 @@ def add_custom_css():
 add_custom_css()
 
 
-# Function to update tweaks with user inputs
-def update_tweaks_with_user_input(
-        tweaks: dict,
-        chat_input: str,
-        tribe: Optional[int] = None,
-        age_group: Optional[str] = None,
-        country: Optional[str] = None,
-        gender: Optional[str] = None,
-        platform: Optional[str] = None,
-        rag_query: Optional[str] = None,
-        min_follower_count: Optional[str] = None,
-        min_likes_count: Optional[str] = None):
-
-    if not 'ChatInput-nM66I' in tweaks:
-        tweaks['ChatInput-nM66I'] = {}
-    tweaks['ChatInput-nM66I']['input_value'] = chat_input
-
-    if tribe and tribe != "":
-        tweaks['TextInput-n0QkP'] = {}
-        tweaks['TextInput-n0QkP']['input_value'] = tribe
-
-    if age_group and age_group != "":
-        tweaks['TextInput-4wKnt'] = {}
-        tweaks['TextInput-4wKnt']['input_value'] = age_group  # Age group filter
-
-    if country and country != "":
-        tweaks['TextInput-wg8O0'] = {}
-        tweaks['TextInput-wg8O0']['input_value'] = country  # Country filter
-
-    if gender and gender != "":
-        tweaks['TextInput-WCBMY'] = {}
-        tweaks['TextInput-WCBMY']['input_value'] = gender
-
-    if platform and platform != "":
-        tweaks['TextInput-aYfSJ'] = {}
-        tweaks['TextInput-aYfSJ']['input_value'] = platform
-
-    if min_follower_count and min_follower_count != "":
-        tweaks['TextInput-UhThw']['input_value'] = min_follower_count  # Minimum follower count
-
-    if min_likes_count and min_likes_count:
-        tweaks['TextInput-P1BmY'] = {}
-        tweaks['TextInput-P1BmY']['input_value'] = min_likes_count  # Minimum likes count
-
-    tweaks['TextInput-JZobh'] = {}
-    tweaks['TextInput-JZobh']['input_value'] = rag_query  # RAG query
-
-    return tweaks
-
-
 # Function to extract message from the response
 def extract_message(response: dict):
     try:
@@ -116,30 +82,15 @@ def extract_message(response: dict):
 
 # Function to run flow with Streamlit inputs
 def run_flow(message: str,
-             tweaks: dict,
+             tweaks: Tweaks,
              config: dict,
              output_type: str = "chat",
              input_type: str = "chat"):
     """
     Run a flow with a given message and optional tweaks.
     """
-    BASE_API_URL = "https://api.langflow.astra.datastax.com"
-    langflow_id = config['langflow_id']
-    flow_id = config['flow_id']
-    api_url = f"{BASE_API_URL}/lf/{langflow_id}/api/v1/run/{flow_id}"
-
-    payload = {
-        "inputs": {
-            "ChatInput-nM66I": {
-                "input_value": message
-            }
-        },
-        "output_type": output_type,
-        "input_type": input_type,
-        "tweaks": tweaks
-    }
-
-    pprint(tweaks)
+    api_url = run_url(config)
+    payload = build_payload(message, tweaks, output_type=output_type, input_type=input_type)
 
     # Get token from environment variable
     application_token = os.getenv('ASTRA_DB_VECTOR_TOKEN')
@@ -154,7 +105,10 @@ def run_flow(message: str,
     }
 
     try:
-        response = requests.post(api_url, json=payload, headers=headers, timeout=60)
+        response = get_http_session().post(
+            api_url, json=payload, headers=headers,
+            timeout=(LANGFLOW_CONNECT_TIMEOUT_S, LANGFLOW_READ_TIMEOUT_S)
+        )
         response.raise_for_status()  # Raise an exception for bad status codes
 
         # Only try to parse JSON if we have content
@@ -180,6 +134,78 @@ def run_flow(message: str,
         return None
 
 
+# Function to run flow and stream the final report into the page as it is generated
+def run_flow_stream(message: str,
+                    tweaks: Tweaks,
+                    config: dict,
+                    output_type: str = "chat",
+                    input_type: str = "chat") -> str:
+    """
+    Run a flow with `stream=true` and render tokens as they arrive.
+
+    Only the final merge model streams (the two analysis models feed it), so the
+    first token lands once the merge step starts instead of after the whole report.
+    Returns the full message text for the chat history.
+    """
+    api_url = run_url(config)
+    # Turn streaming on for the final model only (a new Tweaks - the caller's is untouched)
+    tweaks = tweaks.with_overrides({LANGFLOW_STREAM_COMPONENT: {"stream": True}})
+    payload = build_payload(message, tweaks, output_type=output_type, input_type=input_type)
+
+    application_token = os.getenv('ASTRA_DB_VECTOR_TOKEN')
+    if not application_token:
+        st.error("ASTRA_DB_VECTOR_TOKEN not found in environment variables")
+        return "Error: Unable to extract message from the response."
+
+    headers = {
+        "Authorization": f"Bearer {application_token}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream, application/x-ndjson"
+    }
+
+    try:
+        with get_http_session().post(api_url, params={"stream": "true"}, json=payload, headers=headers,
+                                     stream=True,
+                                     timeout=(LANGFLOW_CONNECT_TIMEOUT_S, LANGFLOW_READ_TIMEOUT_S)) as response:
+            response.raise_for_status()
+            stream = FlowStream(response.iter_lines())
+            streamed_text = st.write_stream(stream)
+    except requests.exceptions.RequestException as e:
+        st.error(f"API request failed: {str(e)}")
+        return "Error: Unable to extract message from the response."
+    except LangflowStreamError as e:
+        st.error(f"API Error: {str(e)}")
+        return "Error: Unable to extract message from the response."
+
+    if isinstance(streamed_text, str) and streamed_text:
+        return streamed_text
+
+    # Nothing streamed (e.g. the model ignored the stream flag) - fall back to the end result
+    return extract_message(stream.result)
+
+
+# Show the size and engagement of the selected audience without running the flow
+def show_segment_stats(**filters):
+    cube = get_stats_cube(STATS_CUBE_PATH)
+    if cube is None:
+        st.sidebar.caption("Audience statistics appear here once posts have been ingested.")
+        return
+    stats = cube.segment(**filters)
+    st.sidebar.metric("Posts in this audience", f"{stats.posts:,}")
+    if stats.posts:
+        def number(value):
+            return "-" if value is None else f"{value:,.0f}"
+
+        # One row per metric, labelled by the metric's name
+        st.sidebar.table({
+            column: {metric.capitalize(): number(value(metric)) for metric in STATS_CUBE_METRICS}
+            for column, value in (("Total", lambda metric: stats.totals[metric]),
+                                  ("Median", lambda metric: stats.percentiles[metric][50]),
+                                  ("90th pct", lambda metric: stats.percentiles[metric][90]))
+        })
+    st.sidebar.caption(f"As of {time.strftime('%d %b %Y %H:%M', time.localtime(cube.built_at))}")
+
+
 # Streamlit app setup
 # st.markdown('<h1 class="title">LangFlow Chat Application</h1>', unsafe_allow_html=True)
 st.title('Welcome to The TRIBE Experiment')
@@ -201,9 +227,6 @@ if 'chat_history' not in st.session_state:
 if st.session_state.clear_input:
     st.session_state.clear_input = False
 
-# Load tweaks but do not display them on the page
-tweaks = LANGFLOW_TWEAKS.copy()
-
 # Add configurable parameters for session-level tweaking (optional)
 st.sidebar.header("Define Your Audience")
 
@@ -248,6 +271,14 @@ selected_platform = st.sidebar.selectbox(
     help="Select a social media platform."
 )
 
+show_segment_stats(
+    tribe=TRIBES[selected_tribe],
+    age=AGE_GROUPS[selected_age_group],
+    country=COUNTRIES[selected_country],
+    platform=PLATFORMS[selected_platform],
+    gender=selected_gender,
+)
+
 # New free-text input
 rag_query = st.sidebar.text_input(
     label="RAG Query",
@@ -273,10 +304,9 @@ if submitted and user_message:
     # Add user message to chat history
     st.session_state.chat_history.append({"text": user_message, "is_user": True})
 
-    # Update tweaks to include the user input in ChatInput-nM66I
-    tweaks = LANGFLOW_TWEAKS.copy()
+    # Apply this turn's user input (ChatInput-nM66I, filters, RAG query) on top of the shared baseline
     tweaks = update_tweaks_with_user_input(
-        tweaks,
+        TWEAK_BUILDER.baseline,
         chat_input=user_message,
         tribe=TRIBES[selected_tribe],
         age_group=AGE_GROUPS[selected_age_group],
@@ -286,11 +316,15 @@ if submitted and user_message:
         rag_query=rag_query
     )
 
-    # Call the run_flow function and get the response
-    response = run_flow(user_message, tweaks=tweaks, config=config)
+    if LANGFLOW_STREAM:
+        # Tokens are rendered as they arrive; the full text comes back for the history
+        extracted_message = run_flow_stream(user_message, tweaks=tweaks, config=config)
+    else:
+        # Call the run_flow function and get the response
+        response = run_flow(user_message, tweaks=tweaks, config=config)
 
-    # Extract and display only the message part
-    extracted_message = extract_message(response)
+        # Extract and display only the message part
+        extracted_message = extract_message(response)
 
     # Add AI response to chat history immediately after receiving it
     st.session_state.chat_history.append({"text": extracted_message, "is_user": False})
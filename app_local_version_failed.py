@@ -4,7 +4,9 @@ import json
 from dotenv import load_dotenv
 from langflow.load import run_flow_from_json
 
-from settings import CONF_FILE, LANGFLOW_TWEAKS, COUNTRIES, AGE_GROUPS, PLATFORMS, TRIBES, LANGFLOW_JSON_FILE
+from flow_runner import get_flow_runner
+from settings import CONF_FILE, LANGFLOW_TWEAKS, COUNTRIES, AGE_GROUPS, PLATFORMS, TRIBES, LANGFLOW_JSON_FILE, \
+    LANGFLOW_LOCAL_RUNNER
 
 load_dotenv(".env")
 
@@ -91,18 +93,27 @@ def extract_message(response: dict):
 
 
 
+# The flow is parsed and its components built once per process, not on every message
+@st.cache_resource
+def get_local_flow_runner():
+    return get_flow_runner(LANGFLOW_JSON_FILE)
+
+
 # Function to run flow with Streamlit inputs
 def run_flow(message: str, tweaks: dict,):
     """
     Run a flow locally with a given message and optional tweaks.
     """
     try:
-        result = run_flow_from_json(
-            flow=LANGFLOW_JSON_FILE,
-            input_value=message,
-            tweaks=tweaks,
-            fallback_to_env_vars=True
-        )
+        if LANGFLOW_LOCAL_RUNNER:
+            result = get_local_flow_runner().run(input_value=message, tweaks=tweaks)
+        else:
+            result = run_flow_from_json(
+                flow=LANGFLOW_JSON_FILE,
+                input_value=message,
+                tweaks=tweaks,
+                fallback_to_env_vars=True
+            )
         return result
     except Exception as e:
         st.error(f"Error running flow: {str(e)}")
@@ -0,0 +1,145 @@
+"""
+Paging for Custom Search: how far to read a `find`, and how much to ask for next.
+
+Custom Search fetches `limit` rows sorted by similarity, drops those under the score
+threshold, collapses near-duplicates, and goes back for more when fewer than k
+survive. Each round trip is a page. Because rows arrive in descending similarity:
+
+- the cursor is read only up to the first row under the threshold; nothing after it
+  can qualify, so that also ends the search with no further page;
+- a page shorter than its limit means the collection (or filter) is exhausted.
+
+Otherwise the next limit is sized from the share of rows that survived so far
+instead of just doubling, so searches that lose many rows to deduplication reach k
+in one more page rather than several. `AdaptiveFetch.report` says how many pages a
+search took and why it stopped.
+
+A search written as a plan (a generator that yields each `find` to run) holds this
+logic once for both the blocking and the async client: `run_plan` and `arun_plan`
+only perform the finds.
+"""
+import math
+from typing import Any, AsyncIterable, Awaitable, Callable, Generator, Iterable, NamedTuple, Optional
+
+# Head-room on the estimated number of rows needed for k survivors
+FETCH_MARGIN: float = 1.25
+# Growth when no row of the page survived, so there is nothing to estimate from
+FETCH_GROWTH_WITHOUT_SURVIVORS: int = 4
+
+
+class FetchReport(NamedTuple):
+    pages: int  # find round trips (or local index searches)
+    rows: int  # rows read, including the one under the threshold that ended the search
+    hits: int
+    stopped: str  # "k reached", "below threshold", "exhausted" or "max limit"
+
+
+def read_until_below(rows: Iterable[dict], score_threshold: Optional[float]) -> tuple[list[dict], bool]:
+    """Rows of a similarity-sorted page down to the threshold, and whether a row under it was reached."""
+    kept = []
+    for row in rows:
+        if score_threshold is not None and row["$similarity"] < score_threshold:
+            return kept, True
+        kept.append(row)
+    return kept, False
+
+
+async def aread_until_below(rows: AsyncIterable[dict], score_threshold: Optional[float]) -> tuple[list[dict], bool]:
+    """Async twin of `read_until_below`, for an `AsyncCollection.find` cursor."""
+    kept = []
+    async for row in rows:
+        if score_threshold is not None and row["$similarity"] < score_threshold:
+            return kept, True
+        kept.append(row)
+    return kept, False
+
+
+def next_limit(limit: int, k: int, survivors: int, max_limit: int) -> int:
+    """Limit for the next page, after `limit` rows gave `survivors` (< k) results."""
+    if survivors:
+        wanted = math.ceil(limit * k / survivors * FETCH_MARGIN)
+    else:
+        wanted = limit * FETCH_GROWTH_WITHOUT_SURVIVORS
+    return min(max_limit, max(wanted, limit + k))
+
+
+class AdaptiveFetch:
+    """
+    Loop state for one search:
+
+        fetch = AdaptiveFetch(k, initial_limit, max_limit)
+        while True:
+            rows, below = read_until_below(find(limit=fetch.limit), score_threshold)
+            hits = select(rows)
+            if fetch.done(len(rows), below, len(hits)):
+                break
+    """
+
+    def __init__(self, k: int, initial_limit: int, max_limit: int):
+        self.k = k
+        self.limit = min(initial_limit, max_limit)
+        self.max_limit = max_limit
+        self.pages = 0
+        self.rows = 0
+        self.hits = 0
+        self.stopped = ""
+
+    def done(self, rows: int, below_threshold: bool, hits: int) -> bool:
+        """Record a page of `rows` qualifying rows giving `hits` results; False sets `limit` for the next one."""
+        self.pages += 1
+        self.rows += rows + below_threshold
+        self.hits = hits
+        if hits >= self.k:
+            self.stopped = "k reached"
+        elif below_threshold:
+            self.stopped = "below threshold"
+        elif rows < self.limit:
+            self.stopped = "exhausted"
+        elif self.limit >= self.max_limit:
+            self.stopped = "max limit"
+        else:
+            self.limit = next_limit(self.limit, self.k, hits, self.max_limit)
+            return False
+        return True
+
+    @property
+    def report(self) -> FetchReport:
+        return FetchReport(self.pages, self.rows, self.hits, self.stopped)
+
+
+# Yields the keyword arguments of each find, is sent back its (rows, below_threshold)
+SearchPlan = Generator[dict, tuple[list[dict], bool], Any]
+
+
+def run_plan(plan: SearchPlan, find: Callable[..., tuple[list[dict], bool]]):
+    """
+    Run a search plan with a blocking `find(**request) -> (rows, below_threshold)`
+    and return the plan's result. An exception from `find` is thrown into the plan,
+    which may handle it or let it propagate.
+    """
+    try:
+        request = next(plan)
+        while True:
+            try:
+                page = find(**request)
+            except Exception as e:
+                request = plan.throw(e)
+            else:
+                request = plan.send(page)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_plan(plan: SearchPlan, find: Callable[..., Awaitable[tuple[list[dict], bool]]]):
+    """Async twin of `run_plan`, for an awaitable `find`."""
+    try:
+        request = next(plan)
+        while True:
+            try:
+                page = await find(**request)
+            except Exception as e:
+                request = plan.throw(e)
+            else:
+                request = plan.send(page)
+    except StopIteration as stop:
+        return stop.value
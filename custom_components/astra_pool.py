@@ -0,0 +1,181 @@
+"""
+Process-wide registry of Astra DB collection handles.
+
+Building a `DataAPIClient` -> `Database` -> `Collection` chain is cheap on its own,
+but the old `collection` property rebuilt it on every search and called
+`database.info()` / `collection.info()` just to log names, which costs two extra
+DevOps API round trips per search (and per tenacity retry). Handles are now built
+once per (token, endpoint, namespace, collection) and shared by every component
+instance in the process, all on top of a single keep-alive httpx pool.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+from astrapy import DataAPIClient
+from astrapy.api_commander import APICommander
+from loguru import logger
+
+POOL_MAX_CONNECTIONS: int = 32
+POOL_MAX_KEEPALIVE_CONNECTIONS: int = 16
+POOL_KEEPALIVE_EXPIRY_S: float = 60.0
+
+# A handle is dropped after this many failed calls in a row, or once it has sat idle too long
+MAX_CONSECUTIVE_FAILURES: int = 3
+MAX_IDLE_S: float = 15 * 60
+
+_lock = threading.Lock()
+_registry: dict[tuple, "_PoolEntry"] = {}
+# httpx.AsyncClient connections belong to the event loop that opened them, so async
+# handles are shared per loop rather than process-wide
+_async_registry: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_pooled_client_installed = False
+
+
+@dataclass
+class _PoolEntry:
+    collection: object
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    failures: int = 0
+
+
+def install_pooled_http_client():
+    """
+    Swap astrapy's shared sync httpx client for one with a tuned keep-alive pool.
+
+    astrapy keeps a single class-level `httpx.Client` on `APICommander`, so replacing
+    it once makes every collection in the process reuse warm TCP/TLS connections.
+    """
+    global _pooled_client_installed
+    with _lock:
+        if _pooled_client_installed:
+            return
+        APICommander.client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY_S,
+            ),
+        )
+        _pooled_client_installed = True
+
+
+def _registry_key(token: str, api_endpoint: str, collection_name: str, namespace: Optional[str]) -> tuple:
+    # Never keep the raw token around as part of a key that might end up in a log line
+    token_digest = hashlib.sha256(str(token).encode("utf-8")).hexdigest()
+    return token_digest, api_endpoint.rstrip("/"), namespace or "", collection_name
+
+
+def get_collection(
+        token: str,
+        api_endpoint: str,
+        collection_name: str,
+        namespace: Optional[str] = None,
+        environment: Optional[str] = None):
+    """
+    Return the shared `Collection` for these connection details, building it on first use.
+
+    No network call is made here: astrapy only talks to the Data API when an
+    operation runs on the collection.
+    """
+    install_pooled_http_client()
+    key = _registry_key(token, api_endpoint, collection_name, namespace)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _registry.get(key)
+        if entry is not None and now - entry.last_used > MAX_IDLE_S:
+            logger.debug(f"Evicting idle Astra DB handle for {describe(entry.collection)}")
+            entry = None
+            del _registry[key]
+
+        if entry is None:
+            client = DataAPIClient(token, environment=environment)
+            database = client.get_database(api_endpoint, keyspace=namespace or None)
+            collection = database.get_collection(collection_name)
+            entry = _PoolEntry(collection=collection)
+            _registry[key] = entry
+            logger.info(f"* Collection handle created: {describe(collection)}")
+
+        entry.last_used = now
+        return entry.collection
+
+
+def get_async_collection(
+        token: str,
+        api_endpoint: str,
+        collection_name: str,
+        namespace: Optional[str] = None,
+        environment: Optional[str] = None):
+    """
+    Async twin of `get_collection`: the shared `AsyncCollection` for the running event loop.
+
+    Derived from the pooled sync handle, so health-based eviction of that handle also
+    forces a fresh async one on the next call.
+    """
+    collection = get_collection(token, api_endpoint, collection_name, namespace, environment)
+    loop = asyncio.get_running_loop()
+    key = _registry_key(token, api_endpoint, collection_name, namespace)
+    with _lock:
+        handles = _async_registry.setdefault(loop, {})
+        source, async_collection = handles.get(key, (None, None))
+        if source is not collection:
+            async_collection = collection.to_async()
+            handles[key] = (collection, async_collection)
+        return async_collection
+
+
+def describe(collection) -> str:
+    """Human-readable collection name built from local state only (no DevOps API call)."""
+    return f"{collection.full_name} @ {collection.database.api_endpoint}"
+
+
+def _find_key(collection) -> Optional[tuple]:
+    for key, entry in _registry.items():
+        if entry.collection is collection:
+            return key
+    return None
+
+
+def report_success(collection):
+    with _lock:
+        key = _find_key(collection)
+        if key is not None:
+            _registry[key].failures = 0
+
+
+def report_failure(collection, error: Optional[BaseException] = None):
+    """
+    Record a failed call against a shared handle and evict it when it looks unhealthy.
+
+    Transport-level errors (refused/reset connections, TLS failures) evict straight
+    away so the next attempt rebuilds the chain; anything else is only evicted after
+    `MAX_CONSECUTIVE_FAILURES` in a row.
+    """
+    with _lock:
+        key = _find_key(collection)
+        if key is None:
+            return
+        entry = _registry[key]
+        entry.failures += 1
+        if isinstance(error, httpx.TransportError) or entry.failures >= MAX_CONSECUTIVE_FAILURES:
+            logger.warning(
+                f"Evicting Astra DB handle for {describe(collection)} after {entry.failures} failure(s): {error}"
+            )
+            del _registry[key]
+
+
+def evict(token: str, api_endpoint: str, collection_name: str, namespace: Optional[str] = None):
+    with _lock:
+        _registry.pop(_registry_key(token, api_endpoint, collection_name, namespace), None)
+
+
+def clear():
+    with _lock:
+        _registry.clear()
@@ -1,5 +1,5 @@
 from loguru import logger
-import json
+import asyncio
 
 from langflow.base.vectorstores.model import LCVectorStoreComponent, check_cached_vector_store
 from langflow.helpers import docs_to_data
@@ -15,14 +15,52 @@ from langflow.io import (
     StrInput,
 )
 
-from astrapy import DataAPIClient
+from custom_components.adaptive_fetch import (
+    AdaptiveFetch,
+    FetchReport,
+    SearchPlan,
+    aread_until_below,
+    arun_plan,
+    read_until_below,
+    run_plan,
+)
+from custom_components.astra_pool import get_async_collection, get_collection, report_failure, report_success
+from custom_components.embedding_cache import get_embedding_cache
+from custom_components.ingest_manifest import (
+    ManifestEntry,
+    embedding_version,
+    get_ingest_manifest,
+    metadata_hash,
+    text_hash,
+)
+from custom_components.lexical_index import HYBRID_CANDIDATES_FACTOR, reciprocal_rank_fusion
+from custom_components.local_index import LOCAL_INDEX_DIR, LOCAL_INDEX_NPROBE, get_local_index, local_index_path
+from custom_components.mmr import MMR_FETCH_K_FACTOR, MMR_LAMBDA, maximal_marginal_relevance, vector_matrix
+from custom_components.near_duplicates import (
+    NEAR_DUPLICATE_MAX_DISTANCE,
+    NEAR_DUPLICATE_OVERFETCH,
+    collapse_near_duplicates,
+)
+from custom_components.result_cache import collection_id, get_result_cache
+from custom_components.result_projection import SNIPPET_TEMPLATE, SearchHit, plan_projection
+from custom_components.search_filter import compile_search_filter, prefix_metadata_fields
+from custom_components.tribe_fanout import (
+    FANOUT_DEFAULT_TRIBES,
+    fanout,
+    fanout_quota,
+    fanout_scope,
+    merge_by_similarity,
+    tribe_filter,
+)
 
 from langflow.schema.data import Data
-from langchain_core.documents.base import Document
 
 from tenacity import retry, stop_after_attempt, wait_exponential, before_sleep_log
 from logging import WARNING
 
+# Largest `limit` the Data API accepts for a vector-sorted find
+ASTRA_FIND_MAX_LIMIT = 1000
+
 
 class AstraVectorStoreComponent(LCVectorStoreComponent):
     display_name: str = "Astra DB"
@@ -119,6 +157,21 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
             info="Boolean flag to determine whether to delete the collection before creating a new one.",
             advanced=True,
         ),
+        BoolInput(
+            name="skip_unchanged_documents",
+            display_name="Skip Already-Ingested Documents",
+            info="Keep a local manifest of ingested documents and only embed and write new or changed ones.",
+            advanced=True,
+            value=True,
+        ),
+        StrInput(
+            name="document_id_field",
+            display_name="Document ID Field",
+            info="With 'Skip Already-Ingested Documents': the ingested data's field holding each post's stable id, "
+                 "so an edited post replaces its previous version. Posts without it are keyed on their text.",
+            advanced=True,
+            value="id",
+        ),
         StrInput(
             name="metadata_indexing_include",
             display_name="Metadata Indexing Include",
@@ -154,10 +207,94 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
             name="search_type",
             display_name="Search Type",
             info="Search type to use",
-            options=["Similarity", "Similarity with score threshold", "MMR (Max Marginal Relevance)", "Custom Search"],
+            options=["Similarity", "Similarity with score threshold", "MMR (Max Marginal Relevance)", "Custom Search",
+                     "Per-Tribe Fan-out", "Local Index", "Hybrid (BM25 + Vector)"],
             value="Similarity",
             advanced=True,
         ),
+        StrInput(
+            name="fanout_tribes",
+            display_name="Fan-out Tribes",
+            info="Comma-separated tribe ids to query separately when using 'Per-Tribe Fan-out' and the filter "
+                 "picks no tribe. Leave blank for all tribes. A tribe (or list of tribes) in the filter takes "
+                 "precedence.",
+            advanced=True,
+        ),
+        IntInput(
+            name="per_tribe_quota",
+            display_name="Per-Tribe Quota",
+            info="Maximum results per tribe for 'Per-Tribe Fan-out'. 0 splits Number of Results evenly across tribes. "
+                 "Either way at most Number of Results are returned, taken round-robin across the tribes.",
+            advanced=True,
+            value=0,
+        ),
+        IntInput(
+            name="fanout_max_workers",
+            display_name="Fan-out Max Workers",
+            info="Maximum number of tribe queries in flight at once for 'Per-Tribe Fan-out'.",
+            advanced=True,
+            value=8,
+        ),
+        BoolInput(
+            name="dedupe_near_duplicates",
+            display_name="Collapse Near-Duplicates",
+            info="Custom Search and Fan-out: keep one post (the most engaged-with) per group of near-identical "
+                 "posts, fetching extra results so Number of Results are still returned.",
+            advanced=True,
+            value=True,
+        ),
+        IntInput(
+            name="near_duplicate_max_distance",
+            display_name="Near-Duplicate Distance",
+            info="Maximum SimHash distance (bits out of 64) for two posts to count as near-duplicates.",
+            advanced=True,
+            value=NEAR_DUPLICATE_MAX_DISTANCE,
+        ),
+        BoolInput(
+            name="mmr_rerank",
+            display_name="Diversify Results (MMR)",
+            info="Custom Search: fetch Fetch K candidates with their vectors and pick Number of Results by "
+                 "maximal marginal relevance, in the same request.",
+            advanced=True,
+            value=False,
+        ),
+        FloatInput(
+            name="mmr_lambda",
+            display_name="MMR Lambda",
+            info="Relevance/diversity trade-off for Diversify Results: 1 ranks by relevance only, 0 by diversity only.",
+            advanced=True,
+            value=MMR_LAMBDA,
+        ),
+        IntInput(
+            name="mmr_fetch_k",
+            display_name="MMR Fetch K",
+            info=f"Candidates to rerank for Diversify Results. 0 uses {MMR_FETCH_K_FACTOR} x Number of Results.",
+            advanced=True,
+            value=0,
+        ),
+        MultilineInput(
+            name="result_template",
+            display_name="Result Template",
+            info="Template the results are rendered with downstream (Parse Data). Custom Search only fetches the "
+                 "metadata it uses; leave blank to fetch all metadata.",
+            advanced=True,
+            value=SNIPPET_TEMPLATE,
+        ),
+        StrInput(
+            name="local_index_path",
+            display_name="Local Index Path",
+            info=f"Directory of the offline index used by 'Local Index' and the BM25 side of 'Hybrid (BM25 + Vector)'. "
+                 f"Leave blank for {LOCAL_INDEX_DIR}/<collection>.",
+            advanced=True,
+        ),
+        IntInput(
+            name="local_index_nprobe",
+            display_name="Local Index Probes",
+            info="Index lists scanned per 'Local Index' query for up to 25 results, scaled up for more. Higher is "
+                 "slower but closer to an exact search: the default finds about 90% of the exact top 10 to top 100.",
+            advanced=True,
+            value=LOCAL_INDEX_NPROBE,
+        ),
         FloatInput(
             name="search_score_threshold",
             display_name="Search Score Threshold",
@@ -247,15 +384,68 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
             else:
                 raise ValueError("Vector Store Inputs must be Data objects.")
 
-        if documents:
+        if documents and self.skip_unchanged_documents:
+            self._add_new_documents_to_vector_store(vector_store, documents)
+        elif documents:
             logger.debug(f"Adding {len(documents)} documents to the Vector Store.")
             try:
                 vector_store.add_documents(documents)
             except Exception as e:
                 raise ValueError(f"Error adding documents to AstraDBVectorStore: {str(e)}") from e
+            # Freshly ingested posts may belong in results we have already cached
+            self.invalidate_search_cache()
         else:
             logger.debug("No documents to add to the Vector Store.")
 
+    def _add_new_documents_to_vector_store(self, vector_store, documents):
+        """
+        Write only the documents the ingestion manifest has not seen with the same text,
+        metadata and embedding model.
+
+        Documents are keyed on their Document ID Field (a hash of the text for those
+        without one), so an edited post replaces its previous version. New and edited
+        posts are embedded and upserted; posts whose metadata alone changed keep their
+        stored vector and only get their metadata rewritten, as in ingest.py.
+
+        Posts already in the collection under other ids (random UUIDs written with this
+        switched off, or text hashes for posts that now have an id) are not matched, so
+        the first run with it on writes them a second time; recreate the collection
+        (Pre Delete Collection) on that run to avoid duplicates.
+        """
+        manifest = get_ingest_manifest()
+        collection_key = self._collection_id()
+        model = embedding_version(self.embedding)
+        if self.pre_delete_collection:
+            manifest.forget(collection_key)
+
+        by_id = {}
+        for document in documents:
+            source_id = document.metadata.get(self.document_id_field) if self.document_id_field else None
+            content_id = text_hash(document.page_content)
+            doc_id = str(source_id) if source_id not in (None, "") else content_id
+            by_id[doc_id] = (ManifestEntry(doc_id, content_id, metadata_hash(document.metadata)), document)
+        entries = [entry for entry, _ in by_id.values()]
+        plan = manifest.plan(collection_key, model, entries)
+        logger.info(f"Ingestion manifest: {len(plan.new)} new, {len(plan.changed)} changed, "
+                    f"{len(plan.metadata_only)} with new metadata only, {len(plan.unchanged)} skipped as unchanged, "
+                    f"{len(documents) - len(by_id)} duplicates")
+        to_embed = [entries[i] for i in sorted(plan.new + plan.changed)]
+        metadata_only = [entries[i] for i in plan.metadata_only]
+        if not to_embed and not metadata_only:
+            return
+        try:
+            if to_embed:
+                # Upserts: a changed document replaces the one stored under its id
+                vector_store.add_documents([by_id[entry.doc_id][1] for entry in to_embed],
+                                           ids=[entry.doc_id for entry in to_embed])
+            collection = self.collection
+            for entry in metadata_only:
+                collection.update_one({"_id": entry.doc_id}, {"$set": {"metadata": by_id[entry.doc_id][1].metadata}})
+        except Exception as e:
+            raise ValueError(f"Error adding documents to AstraDBVectorStore: {str(e)}") from e
+        manifest.record(collection_key, model, to_embed + metadata_only)
+        self.invalidate_search_cache()
+
     def _map_search_type(self):
         if self.search_type == "Similarity with score threshold":
             return "similarity_score_threshold"
@@ -263,6 +453,12 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
             return "mmr"
         elif self.search_type =="Custom Search":
             return "custom_search"
+        elif self.search_type == "Per-Tribe Fan-out":
+            return "per_tribe_fanout"
+        elif self.search_type == "Local Index":
+            return "local_index"
+        elif self.search_type == "Hybrid (BM25 + Vector)":
+            return "hybrid"
         else:
             return "similarity"
 
@@ -272,49 +468,7 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
             "score_threshold": self.search_score_threshold,
         }
 
-        filter_dict = None
-        if self.search_filter:
-            try:
-                filter_list = json.loads(self.search_filter)
-                logger.info(f"Filter list supplied: {filter_list}")
-
-                if isinstance(filter_list, list):
-                    filter_conditions = []
-                    operator_map = {
-                        "eq": None,  # For equality, assign value directly
-                        "neq": "$ne",
-                        "gt": "$gt",
-                        "gte": "$gte",
-                        "lt": "$lt",
-                        "lte": "$lte",
-                        # Add more operators as needed
-                    }
-                    for item in filter_list:
-                        if isinstance(item, dict):
-                            field = item.get('field')
-                            operator = item.get('operator')
-                            value = item.get('value')
-                            if field and operator and value is not None:
-                                mapped_operator = operator_map.get(operator)
-                                if mapped_operator:
-                                    # For operators like 'gte', 'lte', etc.
-                                    condition = {field: {mapped_operator: value}}
-                                else:
-                                    # For equality ('eq')
-                                    condition = {field: value}
-                                filter_conditions.append(condition)
-                    if filter_conditions:
-                        if len(filter_conditions) == 1:
-                            filter_dict = filter_conditions[0]
-                        else:
-                            filter_dict = {"$and": filter_conditions}
-                else:
-                    logger.warning("Invalid search filter format. Expected a list of conditions.")
-            except json.JSONDecodeError:
-                logger.warning("Invalid JSON format for search filter.")
-            except Exception as e:
-                logger.error(f"Error processing search filter: {str(e)}")
-
+        filter_dict = compile_search_filter(self.search_filter).filter
         if filter_dict:
             args["filter"] = filter_dict
 
@@ -327,7 +481,9 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
         retry_error_callback=lambda x: logger.warning(f"Attempt {x.attempt_number} failed.")
     )
     def search_documents(self) -> list[Data]:
-        vector_store = self.build_vector_store()
+        search_type = self._map_search_type()
+        # The local index answers offline, without a vector store or a connection to Astra DB
+        vector_store = None if search_type == "local_index" else self.build_vector_store()
 
         logger.debug(f"Search input: {self.search_input}")
         logger.debug(f"Search type: {self.search_type}")
@@ -335,7 +491,6 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
 
         if self.search_input and isinstance(self.search_input, str) and self.search_input.strip():
             try:
-                search_type = self._map_search_type()
                 search_args = self._build_search_args()
                 filter_dict = search_args.get("filter")
                 k = search_args.get("k", self.number_of_results)
@@ -370,38 +525,33 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
                         raise ValueError(
                             "No embedding model found. Please ensure an embedding model is provided when initializing the vector store.")
                     embedding_model = vector_store.embeddings
-                    query_vector = embedding_model.embed_query(self.search_input)
-
-                    # Amend filter dict to prepend with metadata.
-                    def prepend_metadata_to_fields(filter_dict):
-                        if not isinstance(filter_dict, dict):
-                            return filter_dict
-                        result = {}
-                        for key, value in filter_dict.items():
-                            if key.startswith('$'):
-                                # Handle operators ($and, $or, etc.)
-                                result[key] = [
-                                    prepend_metadata_to_fields(item)
-                                    for item in value
-                                ] if isinstance(value, list) else prepend_metadata_to_fields(value)
-                            else:
-                                # Prepend metadata. to field names
-                                new_key = f"metadata.{key}"
-                                result[new_key] = prepend_metadata_to_fields(value)
-                        return result
-
-                    new_filter = prepend_metadata_to_fields(filter_dict)
-
-                    results = self.collection.find(
-                        new_filter,
-                        sort={"$vector": query_vector},
-                        limit=k,
-                        include_similarity=True,
-                        projection={"*": True},
-                        max_time_ms=self.custom_search_timeout_ms
-                    )
-                    docs = [Document(page_content=doc['$vectorize'], metadata=doc['metadata']) for doc in results
-                            if doc['$similarity'] >= score_threshold]
+                    embedding_cache = get_embedding_cache()
+                    query_vector = embedding_cache.embed_query(embedding_model, self.search_input)
+                    logger.debug(f"Embedding cache: {embedding_cache.stats}")
+
+                    # Same filter with metadata. prepended to the field names, compiled once per filter
+                    new_filter = compile_search_filter(self.search_filter).astra_filter
+
+                    docs = [doc for doc, _ in self._custom_find(new_filter, query_vector, k, score_threshold,
+                                                                diversify=True)]
+                elif search_type == "per_tribe_fanout":
+                    if vector_store.embeddings is None:
+                        raise ValueError(
+                            "No embedding model found. Please ensure an embedding model is provided when initializing the vector store.")
+                    query_vector = get_embedding_cache().embed_query(vector_store.embeddings, self.search_input)
+                    docs = self._fanout_search(filter_dict, query_vector, k, score_threshold)
+                elif search_type == "local_index":
+                    if self.embedding is None or isinstance(self.embedding, dict):
+                        raise ValueError(
+                            "No embedding model found. The Local Index needs an embedding model to embed the query.")
+                    query_vector = get_embedding_cache().embed_query(self.embedding, self.search_input)
+                    docs = [doc for doc, _ in self._local_index_find(filter_dict, query_vector, k, score_threshold)]
+                elif search_type == "hybrid":
+                    if vector_store.embeddings is None:
+                        raise ValueError(
+                            "No embedding model found. Please ensure an embedding model is provided when initializing the vector store.")
+                    query_vector = get_embedding_cache().embed_query(vector_store.embeddings, self.search_input)
+                    docs = self._hybrid_search(filter_dict, query_vector, k, score_threshold)
                 else:
                     raise ValueError(f"Unknown search_type: {search_type}")
 
@@ -419,18 +569,271 @@ class AstraVectorStoreComponent(LCVectorStoreComponent):
             logger.debug("No search input provided. Skipping search.")
             return []
 
-    @property
-    def collection(self):
-        # Initialize the Astra DB client and get a "Database" object
-        client = DataAPIClient(self.token)
-        database = client.get_database(self.api_endpoint)
-        logger.info(f"* Database: {database.info().name}\n")
+    def _custom_find(self, astra_filter, query_vector, k, score_threshold,
+                     diversify=False) -> list[tuple[SearchHit, float]]:
+        """
+        Run one Custom Search `find` (through the result cache) and return (hit, similarity) pairs.
+
+        `diversify` applies the MMR rerank when it is switched on for the component.
+        """
+        mmr = self._mmr_settings(k) if diversify else None
+        collection = self.collection
+        # Rows come sorted by similarity: stop reading at the first one under the threshold
+        return run_plan(self._custom_find_plan(astra_filter, query_vector, k, score_threshold, mmr),
+                        lambda **request: read_until_below(collection.find(**request), score_threshold))
+
+    async def _acustom_find(self, astra_filter, query_vector, k, score_threshold,
+                            diversify=False) -> list[tuple[SearchHit, float]]:
+        """Async twin of `_custom_find`, awaiting `AsyncCollection.find` and consuming its cursor as pages arrive."""
+        mmr = self._mmr_settings(k) if diversify else None
+        async_collection = get_async_collection(
+            token=self.token,
+            api_endpoint=self.api_endpoint,
+            collection_name=self.collection_name,
+            namespace=self.namespace or None,
+        )
+
+        async def find(**request):
+            return await aread_until_below(async_collection.find(**request), score_threshold)
+
+        return await arun_plan(self._custom_find_plan(astra_filter, query_vector, k, score_threshold, mmr), find)
+
+    def _custom_find_plan(self, astra_filter, query_vector, k, score_threshold, mmr) -> SearchPlan:
+        """
+        Custom Search as a plan (see `adaptive_fetch.run_plan`), shared by the sync and
+        async paths: the result cache, the adaptive paging loop, connection health
+        reporting and the (hit, similarity) pairs it returns. It yields each `find`'s
+        arguments; the caller runs it and sends back the rows down to the threshold.
+        """
+        result_cache = get_result_cache()
+        cache_key = result_cache.make_key(self._collection_id(), astra_filter, query_vector, k, score_threshold,
+                                          variant=(self._near_duplicate_distance(), mmr, self.result_template))
+        hits = result_cache.get(cache_key)
+        if hits is None:
+            # An ingestion finishing while this search runs makes its results stale; put() then skips them
+            generation = result_cache.generation(cache_key[0])
+            collection = self.collection
+            fetch = AdaptiveFetch(k, self._initial_find_limit(k, mmr), ASTRA_FIND_MAX_LIMIT)
+            try:
+                while True:
+                    results, below_threshold = yield dict(
+                        filter=astra_filter,
+                        sort={"$vector": query_vector},
+                        limit=fetch.limit,
+                        include_similarity=True,
+                        projection=plan_projection(self.result_template, include_vector=mmr is not None),
+                        max_time_ms=self.custom_search_timeout_ms
+                    )
+                    hits = self._select_hits(results, k, query_vector, mmr)
+                    if fetch.done(len(results), below_threshold, len(hits)):
+                        break
+            except Exception as e:
+                report_failure(collection, e)
+                raise
+            report_success(collection)
+            self._log_fetch(fetch.report, k)
+            result_cache.put(cache_key, hits, generation)
+        logger.debug(f"Result cache: {result_cache.stats}")
+        return hits
+
+    def _local_index_find(self, filter_dict, query_vector, k, score_threshold) -> list[tuple[SearchHit, float]]:
+        """Custom Search against the local index: same post-processing, no round trip."""
+        index = get_local_index(self.local_index_path or local_index_path(self.collection_name))
+        nprobe = self.local_index_nprobe or LOCAL_INDEX_NPROBE
+        mmr = self._mmr_settings(k)
+        fetch = AdaptiveFetch(k, self._initial_find_limit(k, mmr), ASTRA_FIND_MAX_LIMIT)
+        while True:
+            results, below_threshold = read_until_below(
+                index.search(query_vector, fetch.limit, filter_dict, nprobe=nprobe), score_threshold)
+            hits = self._select_hits(results, k, query_vector, mmr)
+            if fetch.done(len(results), below_threshold, len(hits)):
+                self._log_fetch(fetch.report, k)
+                return hits
+
+    def _hybrid_search(self, filter_dict, query_vector, k, score_threshold) -> list[SearchHit]:
+        """
+        Vector `find` and BM25 over the local index's texts, fused by reciprocal rank.
+
+        Each side contributes k * HYBRID_CANDIDATES_FACTOR candidates, so a post ranked
+        well by only one of them (an exact brand or hashtag the embedding misses) still
+        makes the top k. The score threshold applies to the vector side only; hits carry
+        the normalised fused score as their similarity.
+        """
+        candidates = k * HYBRID_CANDIDATES_FACTOR
+        vector_hits = [hit for hit, _ in self._custom_find(compile_search_filter(self.search_filter).astra_filter,
+                                                            query_vector, candidates, score_threshold)]
+        index = get_local_index(self.local_index_path or local_index_path(self.collection_name))
+        lexical_hits = [SearchHit.from_result(doc)
+                        for doc in index.lexical_search(self.search_input, candidates, filter_dict)]
+        logger.debug(f"Hybrid search: {len(vector_hits)} vector and {len(lexical_hits)} BM25 candidates")
+
+        by_id = {hit.id: hit for hit in lexical_hits}
+        by_id.update((hit.id, hit) for hit in vector_hits)
+        fused = reciprocal_rank_fusion([[hit.id for hit in vector_hits], [hit.id for hit in lexical_hits]],
+                                       normalize=True)
+        hits = []
+        for hit_id, score in fused:
+            hit = by_id[hit_id]
+            hits.append(SearchHit(hit.id, hit.text, score, hit.fields))
+
+        max_distance = self._near_duplicate_distance()
+        if max_distance is not None:
+            kept = collapse_near_duplicates([{"$vectorize": hit.text, "metadata": hit.fields} for hit in hits],
+                                            max_distance=max_distance)
+            hits = [hits[i] for i in kept]
+        return hits[:k]
+
+    def _near_duplicate_distance(self):
+        if not self.dedupe_near_duplicates:
+            return None
+        return NEAR_DUPLICATE_MAX_DISTANCE if self.near_duplicate_max_distance is None else self.near_duplicate_max_distance
+
+    def _mmr_settings(self, k):
+        """(lambda, fetch_k) when Diversify Results is on, else None."""
+        if not self.mmr_rerank:
+            return None
+        lambda_mult = MMR_LAMBDA if self.mmr_lambda is None else self.mmr_lambda
+        fetch_k = self.mmr_fetch_k or k * MMR_FETCH_K_FACTOR
+        return lambda_mult, min(ASTRA_FIND_MAX_LIMIT, max(k, fetch_k))
+
+    def _initial_find_limit(self, k, mmr=None) -> int:
+        limit = k
+        if self._near_duplicate_distance() is not None:
+            limit = max(limit, int(k * NEAR_DUPLICATE_OVERFETCH + 0.5))
+        if mmr is not None:
+            limit = max(limit, mmr[1])
+        return min(ASTRA_FIND_MAX_LIMIT, limit)
+
+    def _select_hits(self, results, k, query_vector=None, mmr=None) -> list[tuple[SearchHit, float]]:
+        """
+        Up to k (hit, similarity) pairs from the rows of one `find` above the score
+        threshold, near-duplicates collapsed and MMR-reranked if enabled.
+        """
+        max_distance = self._near_duplicate_distance()
+        if max_distance is not None:
+            kept = collapse_near_duplicates(results, max_distance=max_distance)
+            logger.debug(f"Near-duplicates: kept {len(kept)} of {len(results)} results")
+            results = [results[i] for i in kept]
+        if mmr is not None and len(results) > 1:
+            lambda_mult, _ = mmr
+            picked = maximal_marginal_relevance(query_vector, vector_matrix([doc['$vector'] for doc in results]),
+                                                k, lambda_mult=lambda_mult)
+            results = [results[i] for i in picked]
+        return [(SearchHit.from_result(doc), doc['$similarity']) for doc in results[:k]]
+
+    @staticmethod
+    def _log_fetch(report: FetchReport, k: int):
+        logger.info(f"Custom Search: {report.hits} of {k} results from {report.pages} page(s), "
+                    f"{report.rows} rows read ({report.stopped})")
+
+    def _fanout_tribes(self) -> list[int]:
+        if not self.fanout_tribes or not str(self.fanout_tribes).strip():
+            return list(FANOUT_DEFAULT_TRIBES)
+        try:
+            return [int(tribe) for tribe in str(self.fanout_tribes).split(",") if tribe.strip()]
+        except ValueError:
+            raise ValueError(f"Invalid fan-out tribes: {self.fanout_tribes}. Expected comma-separated tribe ids.")
+
+    def _fanout_search(self, filter_dict, query_vector, k, score_threshold) -> list[SearchHit]:
+        """
+        One filtered `find` per tribe, run in parallel, merged by similarity.
+
+        An unfiltered search lets the largest tribe crowd out the others in the top-k,
+        so every tribe gets its own query capped at the per-tribe quota. The tribes are
+        those the filter selects (eq or $in on tribe), else Fan-out Tribes. Queries run
+        on a bounded thread pool, so wall-clock time tracks the slowest tribe, not the sum.
+        The merge is cut to k, round-robin across the tribes.
+        """
+        tribes, base_filter = fanout_scope(filter_dict, self._fanout_tribes())
+        if not tribes:
+            return []
+        quota = fanout_quota(k, len(tribes), self.per_tribe_quota)
+
+        def search_tribe(tribe):
+            return self._custom_find(self._prepend_metadata_to_fields(tribe_filter(base_filter, tribe)),
+                                     query_vector, quota, score_threshold)
 
-        # TODO: Bug fix - getting collection not found error
-        collection = database.get_collection(self.collection_name)
-        logger.info(f"* Collection: {collection.info().name}\n")
+        per_tribe = fanout(search_tribe, tribes, self.fanout_max_workers)
+        for tribe, hits in zip(tribes, per_tribe):
+            logger.debug(f"Tribe {tribe}: {len(hits)} results")
+        return [doc for doc, _ in merge_by_similarity(per_tribe, k)]
 
-        return collection
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=1, max=5),
+        before_sleep=before_sleep_log(logger, WARNING),
+        retry_error_callback=lambda x: logger.warning(f"Attempt {x.attempt_number} failed.")
+    )
+    async def asearch_documents(self) -> list[Data]:
+        """
+        Async twin of `search_documents`.
+
+        Custom Search runs natively on the event loop: the query embedding is started
+        alongside `build_vector_store` (which may do setup or ingestion work in a
+        thread), then `_acustom_find` runs the same plan as the sync path over
+        `AsyncCollection.find`. Other search types, Per-Tribe Fan-out, Local Index and
+        Hybrid included, still go through the sync path in a worker thread.
+        """
+        if self._map_search_type() != "custom_search":
+            return await asyncio.to_thread(self.search_documents)
+
+        logger.debug(f"Search input: {self.search_input}")
+        logger.debug(f"Search type: {self.search_type}")
+        logger.debug(f"Number of results: {self.number_of_results}")
+
+        if not (self.search_input and isinstance(self.search_input, str) and self.search_input.strip()):
+            await asyncio.to_thread(self.build_vector_store)
+            logger.debug("No search input provided. Skipping search.")
+            return []
+
+        try:
+            if self.embedding is None or isinstance(self.embedding, dict):
+                raise ValueError(
+                    "No embedding model found. Please ensure an embedding model is provided when initializing the vector store.")
+            embedding_cache = get_embedding_cache()
+            _, query_vector = await asyncio.gather(
+                asyncio.to_thread(self.build_vector_store),
+                embedding_cache.aembed_query(self.embedding, self.search_input),
+            )
+            logger.debug(f"Embedding cache: {embedding_cache.stats}")
+
+            search_args = self._build_search_args()
+            k = search_args.get("k", self.number_of_results)
+            score_threshold = search_args.get("score_threshold")
+            new_filter = compile_search_filter(self.search_filter).astra_filter
+
+            hits = await self._acustom_find(new_filter, query_vector, k, score_threshold, diversify=True)
+            docs = [doc for doc, _ in hits]
+        except Exception as e:
+            raise ValueError(f"Error performing search in AstraDBVectorStore: {str(e)})") from e
+
+        logger.debug(f"Retrieved documents: {len(docs)}")
+
+        data = docs_to_data(docs)
+        logger.debug(f"Converted documents to data: {len(data)}")
+        self.status = data
+        return data
+
+    @staticmethod
+    def _prepend_metadata_to_fields(filter_dict):
+        return prefix_metadata_fields(filter_dict)
+
+    @property
+    def collection(self):
+        # Shared, pooled handle - no network round trip until the collection is queried
+        return get_collection(
+            token=self.token,
+            api_endpoint=self.api_endpoint,
+            collection_name=self.collection_name,
+            namespace=self.namespace or None,
+        )
+
+    def _collection_id(self) -> str:
+        return collection_id(self.api_endpoint, self.namespace, self.collection_name)
+
+    def invalidate_search_cache(self):
+        """Drop cached Custom Search results for this component's collection."""
+        get_result_cache().invalidate(self._collection_id())
 
     def get_retriever_kwargs(self):
         search_args = self._build_search_args()
@@ -0,0 +1,232 @@
+"""
+Bulk candidate fetching from an Astra DB collection with keyset pagination.
+
+Vector-sorted `find` calls are capped at 1,000 documents and cannot be paged, so
+large candidate sets (1,000-10,000 posts for a tribe) are pulled in key order
+instead: on `(created_at, _id)` by default, newest first. The key space is split
+into disjoint ranges which are paged concurrently on the pooled client, and
+documents are yielded as pages land. A bounded queue between the fetch threads
+and the consumer provides backpressure, so a slow consumer stalls the fetchers
+instead of buffering the whole result set.
+
+Usage (see notebooks/1.1):
+
+    collection = get_collection(token, endpoint, "climate_change")
+    for doc in parallel_search(collection, {"metadata.tribe": 0}, total_size=5000):
+        ...
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+from loguru import logger
+
+DEFAULT_KEY_FIELD: str = "created_at"
+DEFAULT_BATCH_SIZE: int = 100
+DEFAULT_PARTITIONS: int = 4
+DEFAULT_MAX_BUFFERED_PAGES: int = 8
+
+_DONE = object()
+
+
+def _and(*conditions: Optional[dict]) -> dict:
+    conditions = [c for c in conditions if c]
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def keyset_filter(filter_dict: Optional[dict], key_field: str, last_key: Any, last_id: Any,
+                  descending: bool = True) -> dict:
+    """Filter for the page after (last_key, last_id) in descending (or ascending) (key, _id) order."""
+    if last_key is None or last_id is None:
+        return _and(filter_dict)
+    beyond = "$lt" if descending else "$gt"
+    after = {"$or": [
+        {key_field: {beyond: last_key}},
+        {"$and": [
+            {key_field: {"$eq": last_key}},
+            {"_id": {beyond: last_id}},
+        ]},
+    ]}
+    # Combine with $and rather than setting "$or" on the filter, which would
+    # clobber an $or the caller already had
+    return _and(filter_dict, after)
+
+
+def split_key_range(lower, upper, partitions: int) -> list[tuple]:
+    """
+    Split [lower, upper] into `partitions` disjoint [lo, hi) ranges (the last one is closed).
+
+    Works for ints, floats and datetimes; other key types fall back to a single range.
+    """
+    if partitions <= 1 or lower is None or upper is None or lower >= upper:
+        return [(lower, upper)]
+    if isinstance(lower, datetime):
+        step = (upper - lower) / partitions
+    elif isinstance(lower, (int, float)) and not isinstance(lower, bool):
+        step = (upper - lower) / partitions
+        if isinstance(lower, int) and isinstance(upper, int):
+            step = max(1, -(-(upper - lower) // partitions))
+    else:
+        logger.warning(f"Cannot split key range of type {type(lower).__name__}; using a single partition.")
+        return [(lower, upper)]
+    bounds = [lower + step * i for i in range(partitions)] + [upper]
+    ranges = [(bounds[i], bounds[i + 1]) for i in range(partitions) if bounds[i] < bounds[i + 1]]
+    return ranges or [(lower, upper)]
+
+
+def find_key_range(collection, filter_dict: Optional[dict], key_field: str = DEFAULT_KEY_FIELD,
+                   max_time_ms: Optional[int] = None) -> tuple:
+    """Smallest and largest `key_field` values under `filter_dict` (two round trips)."""
+    bounds = []
+    for direction in (1, -1):
+        doc = collection.find_one(
+            _and(filter_dict, {key_field: {"$exists": True}}),
+            sort={key_field: direction},
+            projection={key_field: True},
+            max_time_ms=max_time_ms,
+        )
+        bounds.append(_get_path(doc, key_field) if doc else None)
+    return bounds[0], bounds[1]
+
+
+def _get_path(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def fetch_range(collection,
+                filter_dict: Optional[dict],
+                key_field: str = DEFAULT_KEY_FIELD,
+                lower=None,
+                upper=None,
+                upper_inclusive: bool = True,
+                batch_size: int = DEFAULT_BATCH_SIZE,
+                projection: Optional[dict] = None,
+                max_time_ms: Optional[int] = None,
+                stop: Optional[threading.Event] = None,
+                newest_first: bool = True,
+                start_after: Optional[tuple] = None) -> Iterator[list[dict]]:
+    """
+    Yield pages of `batch_size` documents with lower <= key <(=) upper, newest first
+    (or oldest first), resuming after the (key, _id) position `start_after` if given.
+    """
+    bounds = {}
+    if lower is not None:
+        bounds["$gte"] = lower
+    if upper is not None:
+        bounds["$lte" if upper_inclusive else "$lt"] = upper
+    range_filter = _and(filter_dict, {key_field: bounds} if bounds else None)
+
+    direction = -1 if newest_first else 1
+    last_key, last_id = start_after or (None, None)
+    while stop is None or not stop.is_set():
+        page = list(collection.find(
+            keyset_filter(range_filter, key_field, last_key, last_id, descending=newest_first),
+            sort={key_field: direction, "_id": direction},
+            limit=batch_size,
+            projection=projection or {"*": True},
+            max_time_ms=max_time_ms,
+        ))
+        if not page:
+            return
+        yield page
+        if len(page) < batch_size:
+            return
+        last_key, last_id = _get_path(page[-1], key_field), page[-1].get("_id")
+
+
+def fetch_in_batches(collection, filter_dict: Optional[dict], total_size: int = 1000,
+                     batch_size: int = DEFAULT_BATCH_SIZE, key_field: str = DEFAULT_KEY_FIELD) -> list[dict]:
+    """Sequential keyset pagination, as first sketched in notebooks/1.1."""
+    results = []
+    for page in fetch_range(collection, filter_dict, key_field, batch_size=batch_size):
+        results.extend(page)
+        if len(results) >= total_size:
+            break
+    return results[:total_size]
+
+
+def parallel_search(collection,
+                    filter_dict: Optional[dict],
+                    total_size: int = 1000,
+                    batch_size: int = DEFAULT_BATCH_SIZE,
+                    key_field: str = DEFAULT_KEY_FIELD,
+                    key_range: Optional[tuple] = None,
+                    partitions: int = DEFAULT_PARTITIONS,
+                    max_workers: Optional[int] = None,
+                    max_buffered_pages: int = DEFAULT_MAX_BUFFERED_PAGES,
+                    projection: Optional[dict] = None,
+                    max_time_ms: Optional[int] = None) -> Iterator[dict]:
+    """
+    Yield up to `total_size` documents matching `filter_dict`, fetched over disjoint key ranges in parallel.
+
+    Documents from different ranges are interleaved in arrival order; within a range
+    they come newest first. Pass `key_range=(lower, upper)` to skip the two lookups
+    that find the bounds. Stopping iteration early (or reaching `total_size`) cancels
+    the remaining fetches.
+    """
+    if total_size <= 0:
+        return
+    if key_range is None:
+        key_range = find_key_range(collection, filter_dict, key_field, max_time_ms)
+    lower, upper = key_range
+    if lower is None or upper is None:
+        return
+
+    ranges = split_key_range(lower, upper, partitions)
+    pages: queue.Queue = queue.Queue(maxsize=max(1, max_buffered_pages))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Blocks while the consumer is behind, but wakes up regularly to notice cancellation
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(index: int, lo, hi):
+        try:
+            for page in fetch_range(collection, filter_dict, key_field, lo, hi,
+                                    upper_inclusive=index == len(ranges) - 1,
+                                    batch_size=batch_size, projection=projection,
+                                    max_time_ms=max_time_ms, stop=stop):
+                if not put(page):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(ranges), thread_name_prefix="bulk-fetch")
+    try:
+        for index, (lo, hi) in enumerate(ranges):
+            executor.submit(worker, index, lo, hi)
+
+        remaining_workers = len(ranges)
+        yielded = 0
+        while remaining_workers:
+            item = pages.get()
+            if item is _DONE:
+                remaining_workers -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            for doc in item:
+                yield doc
+                yielded += 1
+                if yielded >= total_size:
+                    return
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
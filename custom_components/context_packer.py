@@ -0,0 +1,88 @@
+from langflow.custom import Component
+from langflow.io import DataInput, FloatInput, IntInput, MultilineInput, Output, StrInput
+from langflow.schema.message import Message
+
+from custom_components.context_packing import (
+    CONTEXT_ENGAGEMENT_WEIGHT,
+    CONTEXT_MAX_SNIPPET_TOKENS,
+    CONTEXT_TOKEN_BUDGET,
+    pack_context,
+)
+
+
+class ContextPackerComponent(Component):
+    display_name: str = "Context Packer"
+    description: str = ("Drop-in replacement for Parse Data in front of the analysis prompt: renders the same "
+                        "template, but dedupes near-identical posts, trims long ones and fills a token budget "
+                        "by similarity x engagement.")
+    name = "ContextPacker"
+    icon = "braces"
+
+    inputs = [
+        DataInput(
+            name="data",
+            display_name="Data",
+            info="Search results, in result order.",
+            is_list=True,
+        ),
+        MultilineInput(
+            name="template",
+            display_name="Template",
+            info="Same as Parse Data: e.g. '{text}', with the field names of the mapping in braces.",
+            value="{text}",
+        ),
+        MultilineInput(
+            name="field_mapping",
+            display_name="Field Mapping",
+            info="As for the Snippet Formatter: the jq query of the Parse JSON node, whose renames and // defaults "
+                 "apply to raw search results. Leave blank for the TRIBE flow's mapping. Records Parse JSON has "
+                 "already mapped render the same.",
+            advanced=True,
+            value="",
+        ),
+        StrInput(
+            name="sep",
+            display_name="Separator",
+            advanced=True,
+            value="\n",
+        ),
+        IntInput(
+            name="token_budget",
+            display_name="Token Budget",
+            info="Maximum tokens for the packed context (counted with tiktoken when installed).",
+            value=CONTEXT_TOKEN_BUDGET,
+        ),
+        IntInput(
+            name="max_snippet_tokens",
+            display_name="Max Tokens per Post",
+            info="Longer post texts are trimmed to this many tokens.",
+            advanced=True,
+            value=CONTEXT_MAX_SNIPPET_TOKENS,
+        ),
+        FloatInput(
+            name="engagement_weight",
+            display_name="Engagement Weight",
+            info="0 ranks by similarity only; higher values favour liked and shared posts.",
+            advanced=True,
+            value=CONTEXT_ENGAGEMENT_WEIGHT,
+        ),
+    ]
+
+    outputs = [
+        Output(display_name="Text", name="text", method="pack_context"),
+    ]
+
+    def pack_context(self) -> Message:
+        records = [item.data if hasattr(item, "data") else item for item in (self.data or [])]
+        packed = pack_context(
+            records,
+            template=self.template,
+            sep=self.sep,
+            field_mapping=self.field_mapping or None,
+            token_budget=self.token_budget,
+            max_snippet_tokens=self.max_snippet_tokens,
+            engagement_weight=self.engagement_weight,
+        )
+        self.status = (f"{packed.included}/{len(records)} posts, {packed.tokens} tokens "
+                       f"({packed.duplicates} duplicates, {packed.over_budget} over budget, {packed.trimmed} trimmed)")
+        return Message(text=packed.text)
@@ -0,0 +1,169 @@
+"""
+Pack search results into a token budget before they reach the analysis prompt.
+
+ParseData renders every hit through its template (a header line, the post text and a
+stats footer) and the whole block is sent to both analysis LLMs. The packer renders the
+same template through the Snippet Formatter (so with the jq field mapping's defaults,
+from raw search results or ParseJSONData output alike), but drops near-identical posts
+(reposts, copy-pasted comments), trims very long posts, and fills a token budget
+greedily by similarity x engagement, so the prompt carries the most relevant, most
+engaged-with posts and nothing past the budget.
+
+Tokens are counted with tiktoken when it is installed; otherwise a regex estimate that
+errs on the high side is used, so the budget is never exceeded by much.
+"""
+import functools
+import math
+import re
+from typing import Iterable, Mapping, NamedTuple, Optional
+
+from custom_components.snippets import get_snippet_formatter
+
+CONTEXT_TOKEN_BUDGET: int = 6000
+CONTEXT_MAX_SNIPPET_TOKENS: int = 300
+# How much engagement lifts a post: score = similarity * (1 + weight * log1p(engagement))
+CONTEXT_ENGAGEMENT_WEIGHT: float = 0.15
+CONTEXT_TOKENIZER_ENCODING: str = "o200k_base"  # gpt-4o / gpt-4o-mini
+
+TRIM_MARKER = " …"
+
+_ESTIMATE_PIECES = re.compile(r"\w{1,4}|[^\w\s]", re.UNICODE)
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_MENTION = re.compile(r"[@#]\w+")
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class Tokenizer:
+    """tiktoken encoding when available, otherwise a conservative regex estimate."""
+
+    def __init__(self, encoding_name: str = CONTEXT_TOKENIZER_ENCODING):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception:
+            # tiktoken missing, or its encoding files can't be downloaded
+            self._encoding = None
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        # Word pieces of up to 4 characters plus punctuation: over-counts English a little
+        return len(_ESTIMATE_PIECES.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """`text` cut to at most `max_tokens` tokens (marker included), or unchanged if it fits."""
+        keep = max(0, max_tokens - self.count(TRIM_MARKER))
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            head = self._encoding.decode(tokens[:keep])
+        else:
+            pieces = list(_ESTIMATE_PIECES.finditer(text))
+            if len(pieces) <= max_tokens:
+                return text
+            head = text[:pieces[keep - 1].end()] if keep else ""
+        return head.rstrip() + TRIM_MARKER
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(encoding_name: str = CONTEXT_TOKENIZER_ENCODING) -> Tokenizer:
+    return Tokenizer(encoding_name)
+
+
+def fingerprint(text: str) -> str:
+    """Normalised text for duplicate detection: case, links, @/# tags, punctuation and spacing ignored."""
+    text = _MENTION.sub(" ", _URL.sub(" ", text.lower()))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _as_number(value) -> float:
+    # Stats arrive as numbers, numeric strings, or placeholders such as "Not specified"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _NUMBER.search(str(value or ""))
+    return float(match.group()) if match else 0.0
+
+
+def engagement(record: Mapping) -> float:
+    """Likes + comments + 2 x shares, from either the raw metadata or the ParseJSONData field names."""
+    likes = _as_number(record.get("likes_count", record.get("likes")))
+    comments = _as_number(record.get("comments_count", record.get("comments")))
+    shares = _as_number(record.get("shares_count", record.get("shares")))
+    return max(0.0, likes + comments + 2 * shares)
+
+
+def relevance(record: Mapping, rank: int, total: int) -> float:
+    """The search similarity when the record carries it, else a score from its rank in the results."""
+    similarity = record.get("similarity")
+    if isinstance(similarity, (int, float)) and not isinstance(similarity, bool):
+        return float(similarity)
+    return 1.0 - rank / max(total, 1)
+
+
+class PackedContext(NamedTuple):
+    text: str
+    tokens: int
+    included: int
+    duplicates: int
+    over_budget: int
+    trimmed: int
+
+
+def pack_context(records: Iterable[Mapping], template: str = "{text}", sep: str = "\n",
+                 field_mapping: Optional[str] = None,
+                 token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 max_snippet_tokens: int = CONTEXT_MAX_SNIPPET_TOKENS,
+                 engagement_weight: float = CONTEXT_ENGAGEMENT_WEIGHT,
+                 tokenizer: Optional[Tokenizer] = None) -> PackedContext:
+    """
+    Render `records` (search hits, in result order) through `template` within `token_budget`.
+
+    Snippets are rendered by the Snippet Formatter for `template` and `field_mapping`
+    (a jq query as for that component; None for the TRIBE flow's mapping).
+
+    Near-identical posts keep only their best-scoring copy, post text is trimmed to
+    `max_snippet_tokens`, and snippets are taken best score first, skipping any that no
+    longer fit, so a long post near the end of the budget doesn't stop shorter ones.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    formatter = get_snippet_formatter(template, field_mapping)
+    records = list(records)
+    scored = sorted(
+        ((relevance(record, rank, len(records)) * (1 + engagement_weight * math.log1p(engagement(record))), rank, record)
+         for rank, record in enumerate(records)),
+        key=lambda item: (-item[0], item[1]),
+    )
+
+    seen = set()
+    sep_tokens = tokenizer.count(sep)
+    snippets, used = [], 0
+    duplicates = over_budget = trimmed = 0
+    for _, _, record in scored:
+        text = str(record.get("text") or "")
+        key = fingerprint(text)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+
+        short_text = tokenizer.truncate(text, max_snippet_tokens)
+        if short_text is not text:
+            trimmed += 1
+            record = {**record, "text": short_text}
+        snippet = formatter.render(record)
+        cost = tokenizer.count(snippet) + (sep_tokens if snippets else 0)
+        if used + cost > token_budget:
+            over_budget += 1
+            continue
+        snippets.append(snippet)
+        used += cost
+
+    return PackedContext(sep.join(snippets), used, len(snippets), duplicates, over_budget, trimmed)
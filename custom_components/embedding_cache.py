@@ -0,0 +1,171 @@
+"""
+Two-tier cache for query embeddings used by Custom Search.
+
+The sidebar RAG query is almost always the same between turns, so the
+`embed_query` call (100-400 ms to OpenAI) is mostly wasted work. Vectors are kept
+in an in-memory LRU in front of a small SQLite file that survives restarts; both
+tiers are size-bounded and evict least-recently-used entries first.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+from loguru import logger
+
+EMBEDDING_CACHE_PATH: str = os.getenv(
+    "TRIBE_EMBEDDING_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "tribe", "embeddings.sqlite"),
+)
+EMBEDDING_CACHE_MEMORY_ENTRIES: int = 256
+EMBEDDING_CACHE_DISK_ENTRIES: int = 20000
+
+
+def normalize_text(text: str) -> str:
+    # Whitespace and unicode-form differences should not produce a new embedding
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def model_identity(embedding_model) -> tuple[str, Optional[int]]:
+    """(model name, dimensions) for a LangChain embeddings object, e.g. OpenAIEmbeddings."""
+    name = getattr(embedding_model, "model", None) or getattr(embedding_model, "model_name", None)
+    if not name:
+        name = type(embedding_model).__name__
+    return str(name), getattr(embedding_model, "dimensions", None)
+
+
+class EmbeddingCache:
+    def __init__(self,
+                 path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 max_memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+                 max_disk_entries: int = EMBEDDING_CACHE_DISK_ENTRIES):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "  key TEXT PRIMARY KEY,"
+                    "  model TEXT NOT NULL,"
+                    "  vector BLOB NOT NULL,"
+                    "  last_used REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                # A broken disk tier should never break search - fall back to memory only
+                logger.warning(f"Embedding cache disk tier disabled ({path}): {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(model: str, dimensions: Optional[int], text: str) -> str:
+        raw = f"{model}\x1f{dimensions or ''}\x1f{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[list[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, model: str, vector: list[float]):
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                (key, model, array("f", vector).tobytes(), time.time()),
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_disk_entries:
+                overflow = count - self.max_disk_entries
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._db.commit()
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def embed_query(self, embedding_model, text: str) -> list[float]:
+        """Cached stand-in for `embedding_model.embed_query(text)`."""
+        model, dimensions = model_identity(embedding_model)
+        key = self.make_key(model, dimensions, text)
+        vector = self.get(key)
+        if vector is None:
+            vector = embedding_model.embed_query(text)
+            self.put(key, model, vector)
+        return vector
+
+    async def aembed_query(self, embedding_model, text: str) -> list[float]:
+        """Async twin of `embed_query`; misses go through `embedding_model.aembed_query`."""
+        model, dimensions = model_identity(embedding_model)
+        key = self.make_key(model, dimensions, text)
+        vector = self.get(key)
+        if vector is None:
+            vector = await embedding_model.aembed_query(text)
+            self.put(key, model, vector)
+        return vector
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache shared by every Astra component instance."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
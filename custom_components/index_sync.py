@@ -0,0 +1,355 @@
+"""
+Incremental sync of a local mirror of the climate_change collection (see local_index.py).
+
+Instead of re-exporting the collection, each sync pages through the documents created
+after the mirror's watermark, oldest first on (created_at, _id) with the keyset
+pagination of bulk_fetch, and writes them as new LocalIndex segments. The watermark
+(created_at and _id of the last synced document) is committed together with the
+segment list in `mirror.json`, which is replaced atomically. A sync that crashes part
+way therefore resumes after the last committed segment, and segment directories that
+never made it into `mirror.json` are removed on the next run.
+
+Each sync that finds new documents adds segments. Once there are more than
+LOCAL_MIRROR_MAX_SEGMENTS, the smallest are merged in a background thread and swapped
+in with the same atomic commit.
+
+Only new documents are picked up: edits to posts that were already synced, and
+deletions, need a full rebuild (`python -m custom_components.local_index`).
+
+Usage:
+
+    python -m custom_components.index_sync [directory] --watch 300
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterator, NamedTuple, Optional
+
+from loguru import logger
+
+from custom_components.bulk_fetch import DEFAULT_KEY_FIELD, fetch_range
+from custom_components.local_index import MIRROR_STATE_FILE, LocalIndex, build_local_index, local_index_path
+
+LOCAL_MIRROR_BATCH_SIZE: int = 1000
+LOCAL_MIRROR_SEGMENT_SIZE: int = 50000  # documents per segment written by a sync
+LOCAL_MIRROR_MAX_SEGMENTS: int = 8
+LOCAL_MIRROR_PREFETCH_PAGES: int = 2
+
+_DONE = object()
+
+_locks: dict = {}
+_recovered: set = set()
+_compactions: dict = {}
+_registry_lock = threading.Lock()
+
+
+class SyncReport(NamedTuple):
+    documents: int
+    segments: int
+    seconds: float
+    watermark: Optional[list]
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+
+def _lock(root: str) -> threading.Lock:
+    with _registry_lock:
+        return _locks.setdefault(os.path.abspath(root), threading.Lock())
+
+
+def _encode_key(value):
+    # astrapy returns $date fields as datetimes
+    if isinstance(value, datetime):
+        return {"$date": int(value.timestamp() * 1000)}
+    return value
+
+
+def _decode_key(value):
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromtimestamp(value["$date"] / 1000, tz=timezone.utc)
+    return value
+
+
+def _segments_dir(root: str) -> str:
+    return os.path.join(root, "segments")
+
+
+def load_state(root: str) -> dict:
+    try:
+        with open(os.path.join(root, MIRROR_STATE_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"watermark": None, "segments": [], "next_segment": 1, "documents": 0}
+
+
+def _save_state(root: str, state: dict):
+    path = os.path.join(root, MIRROR_STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(state, file, default=str)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def _recover(root: str, state: dict):
+    """Remove segments left behind by a sync or compaction that did not commit."""
+    live = set(state["segments"])
+    for name in os.listdir(_segments_dir(root)):
+        if name not in live:
+            logger.info(f"Local mirror: removing uncommitted segment {name}")
+            shutil.rmtree(os.path.join(_segments_dir(root), name), ignore_errors=True)
+
+
+def _open_mirror(root: str) -> dict:
+    if os.path.exists(os.path.join(root, "manifest.json")):
+        raise ValueError(f"{root} holds a snapshot built by local_index, not a synced mirror")
+    os.makedirs(_segments_dir(root), exist_ok=True)
+    with _lock(root):
+        state = load_state(root)
+        key = os.path.abspath(root)
+        # Only once per process, so an in-flight compaction's segment is never taken for debris
+        if key not in _recovered:
+            _recover(root, state)
+            _recovered.add(key)
+        if not os.path.exists(os.path.join(root, MIRROR_STATE_FILE)):
+            _save_state(root, state)
+        return state
+
+
+def _allocate_segment(root: str) -> str:
+    with _lock(root):
+        state = load_state(root)
+        name = f"{state['next_segment']:06d}"
+        state["next_segment"] += 1
+        _save_state(root, state)
+    return name
+
+
+def _prefetch(pages: Iterator[list[dict]], depth: int) -> Iterator[list[dict]]:
+    """Fetch up to `depth` pages ahead on a thread, so round trips overlap with writing segments."""
+    buffered: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffered.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def worker():
+        try:
+            for page in pages:
+                put(page)
+                if stop.is_set():
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    threading.Thread(target=worker, name="local-mirror-prefetch", daemon=True).start()
+    try:
+        while True:
+            item = buffered.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+class _SegmentBatch:
+    """Documents for one segment, drawn from a shared page iterator."""
+
+    def __init__(self, pages: Iterator[list[dict]], size: int, key_field: str):
+        self.pages = pages
+        self.size = size
+        self.key_field = key_field
+        self.count = 0
+        self.with_vectors = 0
+        self.last = None
+        self.exhausted = True
+
+    def __iter__(self):
+        for page in self.pages:
+            for doc in page:
+                self.with_vectors += "$vector" in doc
+                yield doc
+            self.count += len(page)
+            self.last = page[-1]
+            if self.count >= self.size:
+                self.exhausted = False
+                return
+
+    @property
+    def watermark(self) -> list:
+        key = self.last
+        for part in self.key_field.split("."):
+            key = key.get(part) if isinstance(key, dict) else None
+        return [_encode_key(key), _encode_key(self.last.get("_id"))]
+
+
+def sync_mirror(collection, root: str, key_field: str = DEFAULT_KEY_FIELD,
+                batch_size: int = LOCAL_MIRROR_BATCH_SIZE, segment_size: int = LOCAL_MIRROR_SEGMENT_SIZE,
+                compact: bool = True, **build_options) -> SyncReport:
+    """
+    Append the documents created since the last sync to the mirror at `root`.
+
+    Each `segment_size` documents are committed as they are written, so an interrupted
+    sync keeps its progress. With `compact`, segments are merged in the background
+    once there are too many.
+    """
+    started = time.perf_counter()
+    state = _open_mirror(root)
+    start_after = tuple(_decode_key(value) for value in state["watermark"]) if state["watermark"] else None
+    pages = _prefetch(fetch_range(collection, None, key_field, batch_size=batch_size, newest_first=False,
+                                  start_after=start_after), LOCAL_MIRROR_PREFETCH_PAGES)
+
+    documents = segments = 0
+    while True:
+        batch = _SegmentBatch(pages, segment_size, key_field)
+        name = _allocate_segment(root)
+        try:
+            build_local_index(batch, os.path.join(_segments_dir(root), name), **build_options)
+        except ValueError:
+            # No vectors in this batch (possibly no documents at all): nothing to index
+            if batch.with_vectors:
+                raise
+        if batch.count == 0:
+            break
+        with _lock(root):
+            state = load_state(root)
+            if batch.with_vectors:
+                state["segments"].append(name)
+            state["watermark"] = batch.watermark
+            state["documents"] += batch.with_vectors
+            _save_state(root, state)
+        documents += batch.count
+        segments += bool(batch.with_vectors)
+        logger.info(f"Local mirror: committed {batch.count} documents up to {state['watermark']}")
+        if batch.exhausted:
+            break
+
+    if compact and len(load_state(root)["segments"]) > LOCAL_MIRROR_MAX_SEGMENTS:
+        compact_in_background(root, **build_options)
+    report = SyncReport(documents, segments, time.perf_counter() - started, state["watermark"])
+    logger.info(f"Local mirror: synced {report.documents} documents into {report.segments} segments "
+                f"({report.docs_per_second:.0f} docs/sec)")
+    return report
+
+
+def _merged_documents(paths: list[str]) -> Iterator[dict]:
+    # Newest segment first, so a post synced twice keeps its latest copy
+    seen = set()
+    for path in reversed(paths):
+        index = LocalIndex(path)
+        try:
+            for row in range(index.count):
+                doc = index.document(row)
+                if doc.get("_id") in seen:
+                    continue
+                seen.add(doc.get("_id"))
+                doc["$vector"] = index.vectors[row]
+                yield doc
+        finally:
+            index.close()
+
+
+def compact_mirror(root: str, max_segments: int = LOCAL_MIRROR_MAX_SEGMENTS, **build_options) -> Optional[str]:
+    """
+    Merge the smallest segments of the mirror at `root` until at most half of
+    `max_segments` are left, if it has more than `max_segments`. Returns the new
+    segment's name, if any.
+    """
+    state = _open_mirror(root)
+    if len(state["segments"]) <= max_segments:
+        return None
+    sizes = {}
+    for name in state["segments"]:
+        with open(os.path.join(_segments_dir(root), name, "manifest.json"), "r", encoding="utf-8") as file:
+            sizes[name] = json.load(file)["count"]
+    smallest = set(sorted(state["segments"], key=sizes.get)[:len(state["segments"]) - max_segments // 2 + 1])
+    chosen = [name for name in state["segments"] if name in smallest]
+
+    started = time.perf_counter()
+    merged = _allocate_segment(root)
+    merged_path = os.path.join(_segments_dir(root), merged)
+    build_local_index(_merged_documents([os.path.join(_segments_dir(root), name) for name in chosen]),
+                      merged_path, **build_options)
+
+    with _lock(root):
+        state = load_state(root)
+        if not smallest.issubset(state["segments"]):
+            shutil.rmtree(merged_path, ignore_errors=True)
+            logger.warning("Local mirror: segments changed during compaction; discarding the merge")
+            return None
+        first = min(state["segments"].index(name) for name in chosen)
+        remaining = [name for name in state["segments"] if name not in smallest]
+        state["segments"] = remaining[:first] + [merged] + remaining[first:]
+        _save_state(root, state)
+    # Searches still holding the old segments keep their open maps; the files go with them
+    for name in chosen:
+        shutil.rmtree(os.path.join(_segments_dir(root), name), ignore_errors=True)
+    logger.info(f"Local mirror: merged {len(chosen)} segments ({sum(sizes[name] for name in chosen)} documents) "
+                f"into {merged} in {time.perf_counter() - started:.1f} s")
+    return merged
+
+
+def compact_in_background(root: str, **build_options) -> threading.Thread:
+    """Start `compact_mirror` on a daemon thread, unless one is already running for `root`."""
+    key = os.path.abspath(root)
+    with _registry_lock:
+        thread = _compactions.get(key)
+        if thread is not None and thread.is_alive():
+            return thread
+
+        def run():
+            try:
+                compact_mirror(root, **build_options)
+            except Exception as e:
+                logger.error(f"Local mirror: compaction failed: {e}")
+
+        thread = threading.Thread(target=run, name="local-mirror-compaction", daemon=True)
+        _compactions[key] = thread
+        thread.start()
+        return thread
+
+
+def main():
+    from custom_components.astra_pool import get_collection
+
+    parser = argparse.ArgumentParser(description="Keep a local mirror of an Astra DB collection up to date.")
+    parser.add_argument("path", nargs="?", help="Mirror directory (default: the Local Index path for the collection)")
+    parser.add_argument("--collection", default="climate_change")
+    parser.add_argument("--api-endpoint", default=os.getenv("ASTRA_DB_API_ENDPOINT"))
+    parser.add_argument("--namespace", default=None)
+    parser.add_argument("--segment-size", type=int, default=LOCAL_MIRROR_SEGMENT_SIZE)
+    parser.add_argument("--watch", type=float, default=0, help="Sync again every WATCH seconds")
+    args = parser.parse_args()
+
+    token = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
+    if not token or not args.api_endpoint:
+        parser.error("ASTRA_DB_APPLICATION_TOKEN and --api-endpoint (or ASTRA_DB_API_ENDPOINT) are required")
+    collection = get_collection(token, args.api_endpoint, args.collection, namespace=args.namespace)
+    root = args.path or local_index_path(args.collection)
+    while True:
+        sync_mirror(collection, root, segment_size=args.segment_size, compact=bool(args.watch))
+        if not args.watch:
+            compact_mirror(root)
+            return
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
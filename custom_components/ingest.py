@@ -0,0 +1,297 @@
+"""
+Streaming ingestion of social-media exports (JSONL or CSV) into the climate_change collection.
+
+`_add_documents_to_vector_store` needs every post as a `Document` in memory before a
+single `add_documents` call. Here the export is read as a generator, posts are
+deduplicated by a hash of their normalised text, and batches of `batch_size` texts are
+embedded with one `embed_documents` call each (or left to Astra Vectorize when no
+embedding model is given) and inserted with `insert_many`. At most `concurrency`
+batches are in flight; reading the file waits until one finishes, so memory stays at
+about `concurrency` batches whatever the size of the export (plus 8 bytes of hash,
+about 70 bytes as a Python set entry, per distinct post).
+
+Documents are written the way `AstraDBVectorStore.add_documents` writes them:
+`content` and `$vector` with an embedding model, `$vectorize` with Astra Vectorize,
+and every other field of the export under `metadata`. `_id` is the export's id field,
+or the content hash, so re-ingesting a post replaces it rather than inserting it twice.
+`created_at` is taken from the export, or set to the ingestion time.
+
+With the ingestion manifest (ingest_manifest.py, on by default for the CLI), posts
+that were already written unchanged are skipped before anything is embedded.
+
+With a stats cube (stats_cube.py, on by default for the CLI), the segment counts and
+engagement shown in the app sidebar are brought up to date with every post of the
+export once it is written, skipped ones included.
+
+Usage:
+
+    python -m custom_components.ingest posts.jsonl --text-field text --embedding-model text-embedding-3-large
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from loguru import logger
+
+from custom_components.ingest_manifest import (
+    IngestManifest,
+    ManifestEntry,
+    ManifestPlan,
+    embedding_version,
+    get_ingest_manifest,
+    metadata_hash,
+    text_hash,
+)
+from custom_components.result_cache import collection_id
+
+INGEST_BATCH_SIZE: int = 256  # texts per embedding call
+INGEST_INSERT_CHUNK_SIZE: int = 50  # documents per insertMany request
+INGEST_CONCURRENCY: int = 4  # batches embedded/inserted at once
+
+_INTEGER = re.compile(r"-?\d+")
+_DECIMAL = re.compile(r"-?\d*\.\d+(?:[eE][-+]?\d+)?")
+
+
+class IngestReport(NamedTuple):
+    read: int
+    duplicates: int  # reposts within the export
+    without_text: int
+    embedded: int
+    inserted: int
+    updated: int  # replaced, or metadata rewritten
+    skipped: int  # already in the collection, unchanged (per the manifest)
+    seconds: float
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _csv_value(value: str):
+    # CSV has no types; numbers must be numbers for range filters such as likes >= 100
+    if value == "":
+        return None
+    if _INTEGER.fullmatch(value):
+        return int(value)
+    if _DECIMAL.fullmatch(value):
+        return float(value)
+    return value
+
+
+def read_export(path: str) -> Iterator[dict]:
+    """Records of a JSONL or CSV export (optionally gzipped), one at a time."""
+    is_csv = path.removesuffix(".gz").endswith(".csv")
+    with _open_text(path) as file:
+        if is_csv:
+            for row in csv.DictReader(file):
+                yield {key: _csv_value(value) for key, value in row.items()}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_document(record: dict, text_field: str = "text", id_field: Optional[str] = None) -> Optional[dict]:
+    """Collection document (without vector) for an export record, or None if it has no text."""
+    text = record.get(text_field)
+    if not isinstance(text, str) or not text.strip():
+        return None
+    metadata = {key: value for key, value in record.items()
+                if key not in (text_field, id_field, "created_at") and value is not None}
+    doc_hash = text_hash(text)
+    record_id = record.get(id_field) if id_field else None
+    return {
+        "_id": str(record_id) if record_id is not None else doc_hash,
+        "text": text,
+        "content_hash": doc_hash,
+        "created_at": record.get("created_at") or int(time.time()),
+        "metadata": metadata,
+    }
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _insert(collection, docs: list[dict]) -> list[dict]:
+    """Insert `docs`, returning the ones whose id was already taken."""
+    from astrapy.exceptions import InsertManyException
+
+    if not docs:
+        return []
+    try:
+        collection.insert_many(docs, ordered=False, chunk_size=INGEST_INSERT_CHUNK_SIZE, concurrency=1)
+        return []
+    except InsertManyException as e:
+        codes = {descriptor.error_code for descriptor in e.error_descriptors}
+        if codes - {"DOCUMENT_ALREADY_EXISTS"}:
+            raise
+        inserted = set(e.partial_result.inserted_ids)
+        return [doc for doc in docs if doc["_id"] not in inserted]
+
+
+def _embed(embedding_model, docs: list[dict]):
+    texts = [doc.pop("text") for doc in docs]
+    if embedding_model is None:
+        for doc, text in zip(docs, texts):
+            doc["$vectorize"] = text
+    elif texts:
+        for doc, text, vector in zip(docs, texts, embedding_model.embed_documents(texts)):
+            doc["content"] = text
+            doc["$vector"] = vector
+
+
+def _store_batch(collection, embedding_model, docs: list[dict], manifest: Optional[IngestManifest],
+                 collection_key: str, model: str, stats_cube=None) -> dict:
+    entries = [ManifestEntry(doc["_id"], doc["content_hash"], metadata_hash(doc["metadata"])) for doc in docs]
+    if manifest is None:
+        plan = ManifestPlan(list(range(len(docs))), [], [], [])
+    else:
+        plan = manifest.plan(collection_key, model, entries)
+
+    to_embed = [docs[i] for i in plan.new + plan.changed]
+    _embed(embedding_model, to_embed)
+    # Ids that turn out to exist already (e.g. written before the manifest was) are replaced
+    to_replace = _insert(collection, [docs[i] for i in plan.new]) + [docs[i] for i in plan.changed]
+    for doc in to_replace:
+        collection.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    for i in plan.metadata_only:
+        collection.update_one({"_id": docs[i]["_id"]}, {"$set": {"metadata": docs[i]["metadata"]}})
+
+    if manifest is not None:
+        manifest.record(collection_key, model, [entries[i] for i in plan.new + plan.changed + plan.metadata_only])
+    if stats_cube is not None:
+        # Unchanged posts too: the cube may be newer than the manifest, and updates are idempotent
+        stats_cube.update(docs)
+    replaced_new = len(to_replace) - len(plan.changed)
+    return {
+        "embedded": len(to_embed),
+        "inserted": len(plan.new) - replaced_new,
+        "updated": len(to_replace) + len(plan.metadata_only),
+        "skipped": len(plan.unchanged),
+    }
+
+
+def ingest(records: Iterable[dict], collection, embedding_model=None, text_field: str = "text",
+           id_field: Optional[str] = None, batch_size: int = INGEST_BATCH_SIZE,
+           concurrency: int = INGEST_CONCURRENCY, seen_hashes: Optional[set] = None,
+           manifest: Optional[IngestManifest] = None, stats_cube=None) -> IngestReport:
+    """
+    Embed and write `records` (dicts from `read_export`) to `collection`.
+
+    `embedding_model` is a LangChain `Embeddings`; None leaves embedding to Astra Vectorize.
+    With a `manifest`, posts already written with the same text, metadata and model are
+    skipped, and only the metadata of posts whose text is unchanged is rewritten.
+    With a `stats_cube` (a `StatsCube`), every written post is counted and the cube
+    saved at the end.
+    """
+    started = time.perf_counter()
+    seen = set() if seen_hashes is None else seen_hashes
+    collection_key = collection_id(collection.database.api_endpoint, collection.keyspace, collection.name)
+    model = embedding_version(embedding_model)
+    counts = {"read": 0, "duplicates": 0, "without_text": 0, "embedded": 0, "inserted": 0, "updated": 0,
+              "skipped": 0}
+
+    def unique_documents():
+        for record in records:
+            counts["read"] += 1
+            doc = to_document(record, text_field, id_field)
+            if doc is None:
+                counts["without_text"] += 1
+                continue
+            # Keep 8 bytes of the hash in memory: plenty to tell apart posts within one export
+            key = int(doc["content_hash"][:16], 16)
+            if key in seen:
+                counts["duplicates"] += 1
+                continue
+            seen.add(key)
+            yield doc
+
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="ingest") as executor:
+        def collect(done):
+            for future in done:
+                for key, value in future.result().items():
+                    counts[key] += value
+
+        for batch in _batches(unique_documents(), batch_size):
+            # Backpressure: stop reading until a slot in the window frees up
+            while len(in_flight) >= max(1, concurrency):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(executor.submit(_store_batch, collection, embedding_model, batch, manifest,
+                                          collection_key, model, stats_cube))
+        done, _ = wait(in_flight)
+        collect(done)
+
+    if stats_cube is not None:
+        cube_started = time.perf_counter()
+        cube = stats_cube.save()
+        logger.info(f"Stats cube: {cube.num_rows} segments saved to {stats_cube.path} "
+                    f"in {time.perf_counter() - cube_started:.2f}s")
+    report = IngestReport(**counts, seconds=time.perf_counter() - started)
+    logger.info(f"Ingested {report.read} records: {report.embedded} embedded, {report.inserted} inserted, "
+                f"{report.updated} updated, {report.skipped} skipped as unchanged, {report.duplicates} duplicates, "
+                f"{report.without_text} without text ({report.docs_per_second:.0f} docs/sec)")
+    return report
+
+
+def main():
+    from custom_components.astra_pool import get_collection
+
+    parser = argparse.ArgumentParser(description="Stream a JSONL/CSV export of posts into an Astra DB collection.")
+    parser.add_argument("paths", nargs="+", help="Export files (.jsonl, .csv, optionally .gz)")
+    parser.add_argument("--collection", default="climate_change")
+    parser.add_argument("--api-endpoint", default=os.getenv("ASTRA_DB_API_ENDPOINT"))
+    parser.add_argument("--namespace", default=None)
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default=None)
+    parser.add_argument("--embedding-model", default=None,
+                        help="OpenAI embedding model, e.g. text-embedding-3-large. Omit to use Astra Vectorize.")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    parser.add_argument("--no-manifest", action="store_true",
+                        help="Write every post, ignoring (and not updating) the local manifest")
+    parser.add_argument("--no-stats-cube", action="store_true",
+                        help="Do not update the segment statistics shown in the app sidebar")
+    args = parser.parse_args()
+
+    token = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
+    if not token or not args.api_endpoint:
+        parser.error("ASTRA_DB_APPLICATION_TOKEN and --api-endpoint (or ASTRA_DB_API_ENDPOINT) are required")
+    embedding_model = None
+    if args.embedding_model:
+        from langchain_openai import OpenAIEmbeddings
+
+        embedding_model = OpenAIEmbeddings(model=args.embedding_model)
+    collection = get_collection(token, args.api_endpoint, args.collection, namespace=args.namespace)
+    stats_cube = None
+    if not args.no_stats_cube:
+        from custom_components.stats_cube import StatsCube, stats_cube_path
+
+        stats_cube = StatsCube(stats_cube_path(args.collection))
+    # Shared across files, so a post exported twice is only ingested once
+    seen = set()
+    for path in args.paths:
+        ingest(read_export(path), collection, embedding_model, text_field=args.text_field, id_field=args.id_field,
+               batch_size=args.batch_size, concurrency=args.concurrency, seen_hashes=seen,
+               manifest=None if args.no_manifest else get_ingest_manifest(), stats_cube=stats_cube)
+
+
+if __name__ == "__main__":
+    main()
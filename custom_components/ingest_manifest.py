@@ -0,0 +1,147 @@
+"""
+Local manifest of what has already been embedded and written to a collection.
+
+Re-running ingestion on the same export used to embed every post again with
+text-embedding-3-large and re-insert it. The manifest remembers, per collection and
+document id, a hash of the post's text, a hash of its metadata and the embedding model
+it was embedded with. Before a batch is written it is split into:
+
+- new: id not in the manifest, embed and insert;
+- changed: different text or embedding model, embed again and replace;
+- metadata only: same text and model, so the stored vector is still valid, and
+  only the metadata is rewritten;
+- unchanged: skipped.
+
+Entries are recorded only after the write succeeds, so an interrupted run redoes at
+most its unfinished batches. The manifest is a SQLite file next to the embedding
+cache, and lookups are batched, so an unchanged 100k-post export is checked in
+seconds without a network call.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterable, NamedTuple, Optional
+
+from custom_components.embedding_cache import model_identity, normalize_text
+
+INGEST_MANIFEST_PATH: str = os.getenv(
+    "TRIBE_INGEST_MANIFEST",
+    os.path.join(os.path.expanduser("~"), ".cache", "tribe", "ingest_manifest.sqlite"),
+)
+
+# SQLite's default limit on bound parameters per statement is 999
+_LOOKUP_CHUNK = 900
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(normalize_text(text).lower().encode("utf-8"), digest_size=16).hexdigest()
+
+
+def metadata_hash(metadata: dict) -> str:
+    raw = json.dumps(metadata, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def embedding_version(embedding) -> str:
+    """Identity of the embedding model: a LangChain Embeddings, an Astra Vectorize dict, or None (Vectorize)."""
+    if embedding is None:
+        return "astra-vectorize"
+    if isinstance(embedding, dict):
+        options = embedding.get("collection_vector_service_options") or {}
+        return f"astra-vectorize:{options.get('provider', '')}/{options.get('modelName', '')}"
+    name, dimensions = model_identity(embedding)
+    return f"{name}:{dimensions or ''}"
+
+
+class ManifestEntry(NamedTuple):
+    doc_id: str
+    text_hash: str
+    metadata_hash: str
+
+
+class ManifestPlan(NamedTuple):
+    new: list
+    changed: list
+    metadata_only: list
+    unchanged: list
+
+
+class IngestManifest:
+    def __init__(self, path: Optional[str] = INGEST_MANIFEST_PATH):
+        self._lock = threading.Lock()
+        if path and path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "  collection TEXT NOT NULL,"
+            "  doc_id TEXT NOT NULL,"
+            "  text_hash TEXT NOT NULL,"
+            "  metadata_hash TEXT NOT NULL,"
+            "  model TEXT NOT NULL,"
+            "  PRIMARY KEY (collection, doc_id))"
+        )
+        self._db.commit()
+
+    def plan(self, collection: str, model: str, entries: list[ManifestEntry]) -> ManifestPlan:
+        """Positions in `entries` that are new / changed / metadata-only / unchanged."""
+        known = {}
+        with self._lock:
+            for start in range(0, len(entries), _LOOKUP_CHUNK):
+                ids = [entry.doc_id for entry in entries[start:start + _LOOKUP_CHUNK]]
+                rows = self._db.execute(
+                    f"SELECT doc_id, text_hash, metadata_hash, model FROM documents "
+                    f"WHERE collection = ? AND doc_id IN ({','.join('?' * len(ids))})",
+                    (collection, *ids),
+                )
+                known.update((row[0], row[1:]) for row in rows)
+
+        plan = ManifestPlan([], [], [], [])
+        for position, entry in enumerate(entries):
+            stored = known.get(entry.doc_id)
+            if stored is None:
+                plan.new.append(position)
+            elif stored[0] != entry.text_hash or stored[2] != model:
+                plan.changed.append(position)
+            elif stored[1] != entry.metadata_hash:
+                plan.metadata_only.append(position)
+            else:
+                plan.unchanged.append(position)
+        return plan
+
+    def record(self, collection: str, model: str, entries: Iterable[ManifestEntry]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents (collection, doc_id, text_hash, metadata_hash, model) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((collection, entry.doc_id, entry.text_hash, entry.metadata_hash, model) for entry in entries),
+            )
+            self._db.commit()
+
+    def forget(self, collection: str):
+        """Drop every entry for `collection`, e.g. after it was deleted or recreated."""
+        with self._lock:
+            self._db.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+            self._db.commit()
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM documents WHERE collection = ?",
+                                        (collection,)).fetchone()
+        return count
+
+
+_shared_manifest: Optional[IngestManifest] = None
+_shared_manifest_lock = threading.Lock()
+
+
+def get_ingest_manifest() -> IngestManifest:
+    """Process-wide manifest shared by the ingestion CLI and every Astra component instance."""
+    global _shared_manifest
+    with _shared_manifest_lock:
+        if _shared_manifest is None:
+            _shared_manifest = IngestManifest()
+        return _shared_manifest
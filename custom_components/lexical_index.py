@@ -0,0 +1,329 @@
+"""
+BM25 over the post texts of a local index snapshot, for hybrid (lexical + vector) search.
+
+Dense retrieval with text-embedding-3-large is good at topics but misses the exact
+brands and hashtags analysts ask about ("#greenwashing", "shell"). Every local index
+snapshot and sync segment (local_index.py) also stores an inverted index of its
+`$vectorize` texts, in compressed sparse row form so it can be memory-mapped:
+
+    lexical.terms.npy      (terms,) uint64 term hashes, sorted
+    lexical.offsets.npy    (terms + 1,) postings of term i are [offsets[i], offsets[i + 1])
+    lexical.rows.npy       (postings,) int32 rows of the index, ascending within a term
+    lexical.tf.npy         (postings,) uint16 term frequencies
+    lexical.lengths.npy    (count,) int32 tokens per row
+    lexical.max_tf.npy     (terms,) uint16 highest term frequency of each term
+    lexical.min_length.npy (terms,) int32 shortest row containing each term
+
+A query looks its terms up by hash with a binary search, scores their postings with
+numpy and keeps the best k rows: no per-post Python work at query time, and posting
+lists of common words are skipped when they cannot change the top k (MaxScore). Document
+frequencies and the average length are summed over the segments of a mirror, so scores
+are comparable across segments.
+
+Hybrid search fuses the BM25 ranking with the vector `find` ranking by reciprocal-rank
+fusion: each post scores sum(1 / (HYBRID_RRF_K + rank)) over the lists it appears in.
+"""
+import hashlib
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Hashable, Optional, Sequence
+
+import numpy as np
+
+LEXICAL_K1: float = 1.2
+LEXICAL_B: float = 0.75
+# Reciprocal-rank fusion constant; 60 as in the original RRF paper
+HYBRID_RRF_K: int = 60
+# Candidates taken from each ranking per result, before fusion
+HYBRID_CANDIDATES_FACTOR: int = 4
+
+# Probing a posting list for one row costs about as much as scoring this many postings
+_PROBE_COST = 16
+# tf / (tf + norm) of the postings of common terms is kept between queries, up to this many postings
+LEXICAL_IMPACT_CACHE_POSTINGS: int = 8_000_000
+_IMPACT_CACHE_MIN_POSTINGS = 10_000
+
+_TOKEN = re.compile(r"[#@]?\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he i in is it its of on or she so that the their them "
+    "there they this to was we were what when which who will with you your our not no do does did just "
+    "than then too very can could would should been being into about over also more most http https www co"
+    .split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lower-cased word tokens without stopwords. Hashtags and mentions count both as
+    themselves and as the bare word, so "#COP28" matches "cop28" and "#cop28" queries.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token[0] in "#@":
+            if len(token) > 2:
+                tokens.append(token)
+            token = token[1:]
+        if len(token) > 1 and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def term_hashes(terms: Sequence[str]) -> np.ndarray:
+    return np.array([int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+                     for term in terms], dtype=np.uint64)
+
+
+def bm25_idf(count: int, document_frequencies: np.ndarray) -> np.ndarray:
+    df = document_frequencies.astype(np.float64)
+    return np.log1p((count - df + 0.5) / (df + 0.5))
+
+
+def top_k(rows: np.ndarray, scores: np.ndarray, k: int, copies: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The `k` best (rows, scores), best first. A row may be listed up to `copies` times
+    (with the same score); it is returned once.
+    """
+    if len(rows) > k * copies:
+        best = np.argpartition(-scores, k * copies - 1)[:k * copies]
+        rows, scores = rows[best], scores[best]
+    if copies > 1:
+        rows, first = np.unique(rows, return_index=True)
+        scores = scores[first]
+    order = np.argsort(-scores, kind="stable")[:k]
+    return rows[order], scores[order]
+
+
+class LexicalIndexWriter:
+    """Accumulates postings while a snapshot is built; rows are numbered in the order texts are added."""
+
+    def __init__(self):
+        self._vocabulary: dict[str, int] = {}
+        self._term_ids = array("I")
+        self._rows = array("I")
+        self._tfs = array("H")
+        self._lengths = array("i")
+
+    def add(self, text: Optional[str]):
+        row = len(self._lengths)
+        tokens = tokenize(text or "")
+        self._lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_id = self._vocabulary.setdefault(term, len(self._vocabulary))
+            self._term_ids.append(term_id)
+            self._rows.append(row)
+            self._tfs.append(min(tf, 65535))
+
+    def write(self, directory: str, order: Optional[np.ndarray] = None) -> dict:
+        """
+        Write the index files to `directory`. `order` is the permutation the snapshot
+        stores its rows in (row i holds the i-th added text's row `order[i]`).
+        """
+        count = len(self._lengths)
+        lengths = np.frombuffer(self._lengths, dtype=np.int32) if count else np.zeros(0, dtype=np.int32)
+        rows = np.frombuffer(self._rows, dtype=np.uint32).astype(np.int32) if len(self._rows) else \
+            np.zeros(0, dtype=np.int32)
+        if order is not None:
+            position = np.empty(count, dtype=np.int32)
+            position[order] = np.arange(count, dtype=np.int32)
+            rows = position[rows]
+            lengths = lengths[order]
+
+        hashes = term_hashes(list(self._vocabulary))
+        hash_order = np.argsort(hashes, kind="stable")
+        rank = np.empty(len(hashes), dtype=np.int64)
+        rank[hash_order] = np.arange(len(hashes))
+        term_ranks = rank[np.frombuffer(self._term_ids, dtype=np.uint32)] if len(self._term_ids) else \
+            np.zeros(0, dtype=np.int64)
+        postings = np.lexsort((rows, term_ranks))
+
+        offsets = np.zeros(len(hashes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ranks, minlength=len(hashes)), out=offsets[1:])
+        rows = rows[postings]
+        tf = np.frombuffer(self._tfs, dtype=np.uint16)[postings] if len(self._tfs) else np.zeros(0, dtype=np.uint16)
+        # Every term has postings, so each reduceat segment is non-empty
+        starts = offsets[:-1]
+        max_tf = np.maximum.reduceat(tf, starts) if len(hashes) else np.zeros(0, dtype=np.uint16)
+        min_length = np.minimum.reduceat(lengths[rows], starts) if len(hashes) else np.zeros(0, dtype=np.int32)
+        np.save(os.path.join(directory, "lexical.terms.npy"), hashes[hash_order])
+        np.save(os.path.join(directory, "lexical.offsets.npy"), offsets)
+        np.save(os.path.join(directory, "lexical.rows.npy"), rows)
+        np.save(os.path.join(directory, "lexical.tf.npy"), tf)
+        np.save(os.path.join(directory, "lexical.lengths.npy"), lengths)
+        np.save(os.path.join(directory, "lexical.max_tf.npy"), max_tf)
+        np.save(os.path.join(directory, "lexical.min_length.npy"), min_length)
+        return {"terms": len(hashes), "postings": int(len(postings)), "total_length": int(lengths.sum())}
+
+
+class LexicalIndex:
+    """The memory-mapped inverted index of one snapshot or segment."""
+
+    def __init__(self, path: str, description: dict):
+        self.terms = np.load(os.path.join(path, "lexical.terms.npy"))
+        self.offsets = np.load(os.path.join(path, "lexical.offsets.npy"))
+        self.rows = np.load(os.path.join(path, "lexical.rows.npy"), mmap_mode="r")
+        self.tf = np.load(os.path.join(path, "lexical.tf.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(path, "lexical.lengths.npy"), mmap_mode="r")
+        self.max_tf = np.load(os.path.join(path, "lexical.max_tf.npy"))
+        self.min_length = np.load(os.path.join(path, "lexical.min_length.npy"))
+        self.total_length = description["total_length"]
+        self._length_norm = (None, None)
+        # (the length norm they were computed with, term position -> impacts)
+        self._impacts: tuple[Optional[np.ndarray], dict] = (None, {})
+        self._impacts_lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return len(self.lengths)
+
+    def lookup(self, hashes: np.ndarray) -> np.ndarray:
+        """Term positions for `hashes`, -1 for terms not in this index."""
+        positions = np.searchsorted(self.terms, hashes)
+        found = positions < len(self.terms)
+        found[found] = self.terms[positions[found]] == hashes[found]
+        return np.where(found, positions, -1)
+
+    def document_frequencies(self, positions: np.ndarray) -> np.ndarray:
+        known = positions >= 0
+        df = np.zeros(len(positions), dtype=np.int64)
+        df[known] = self.offsets[positions[known] + 1] - self.offsets[positions[known]]
+        return df
+
+    def term_bounds(self, positions: np.ndarray, idf: np.ndarray, average_length: float) -> np.ndarray:
+        """The most each term can add to a row's score: its highest tf in its shortest row."""
+        max_tf = self.max_tf[positions].astype(np.float64)
+        norm = LEXICAL_K1 * (1 - LEXICAL_B + LEXICAL_B * self.min_length[positions] / max(average_length, 1e-9))
+        return idf * (LEXICAL_K1 + 1) * max_tf / (max_tf + norm)
+
+    def length_norm(self, average_length: float) -> np.ndarray:
+        """k1 * (1 - b + b * length / average length) per row, kept until the average changes."""
+        cached_average, norm = self._length_norm
+        if cached_average != average_length:
+            norm = (LEXICAL_K1 * (1 - LEXICAL_B + LEXICAL_B * np.asarray(self.lengths, dtype=np.float32)
+                                  / max(average_length, 1e-9))).astype(np.float32)
+            self._length_norm = (average_length, norm)
+            self._impacts = (norm, {})
+        return norm
+
+    def search(self, positions: np.ndarray, idf: np.ndarray, average_length: float, k: int,
+               mask: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The best `k` (rows, BM25 scores) among the rows in `mask` (all if None), best first.
+
+        Terms are scored rarest first. Once the k-th best score so far is at least the
+        most the remaining terms could add together (MaxScore), no other row can make
+        the top k: the remaining posting lists, the long ones of common words, are then
+        only probed for the rows already found that can still get there, instead of
+        scored in full.
+        """
+        norm = self.length_norm(average_length)
+        known = positions >= 0
+        order = np.argsort(-idf[known], kind="stable")
+        positions, idf = positions[known][order], idf[known][order]
+        # remaining[i]: upper bound on what terms i.. add to a row
+        remaining = np.append(np.cumsum(self.term_bounds(positions, idf, average_length)[::-1])[::-1], 0.0)
+        lengths = np.diff(self.offsets)[positions] if len(positions) else np.zeros(0, dtype=np.int64)
+
+        # Scores summed over the terms, when there is more than one; rows are unique within a term,
+        # and adding into a dense array is cheaper than sorting the union by row
+        totals = np.zeros(self.count, dtype=np.float32) if len(positions) > 1 else None
+        scored = []
+        # Lower bound on the k-th best score: k rows of a single term already reach it
+        kth = -np.inf
+        cut = len(positions)
+        for i, (position, weight) in enumerate(zip(positions.tolist(), idf.tolist())):
+            if kth >= remaining[i]:
+                cut = i
+                break
+            scored.append(self._term_scores(position, weight, norm, mask, totals))
+            term_rows, term_scores = scored[-1]
+            if len(term_rows) >= k:
+                kth = max(kth, np.partition(term_scores, len(term_rows) - k)[len(term_rows) - k])
+        rows, scores, copies = _candidates(scored, totals)
+
+        if cut < len(positions):
+            # The k*copies-th entry is a lower bound on the k-th best row too
+            if len(rows) >= k * copies:
+                kth = max(kth, np.partition(scores, len(rows) - k * copies)[len(rows) - k * copies])
+            # Rows that stay under the k-th best even with every remaining term cannot make it either
+            keep = scores + remaining[cut] >= kth
+            # Probing is a binary search per row and term: only worth it for few rows
+            if np.count_nonzero(keep) * _PROBE_COST < lengths[cut:].sum():
+                rows, first = np.unique(rows[keep], return_index=True)
+                scores, copies = scores[keep][first], 1
+                scores = scores + self._probe(positions[cut:], idf[cut:], rows, norm)
+            else:
+                for position, weight in zip(positions[cut:].tolist(), idf[cut:].tolist()):
+                    scored.append(self._term_scores(position, weight, norm, mask, totals))
+                rows, scores, copies = _candidates(scored, totals)
+        if len(rows) == 0:
+            return rows, scores
+        return top_k(rows, scores, k, copies)
+
+    def _term_scores(self, position: int, weight: float, norm: np.ndarray, mask: Optional[np.ndarray],
+                     totals: Optional[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of one term, also added to `totals`."""
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        rows = np.asarray(self.rows[start:end])
+        cached_norm, cached = self._impacts
+        impacts = cached.get(position) if cached_norm is norm else None
+        if impacts is None:
+            tf = np.asarray(self.tf[start:end], dtype=np.float32)
+            impacts = tf / (tf + norm[rows])
+            if cached_norm is norm and end - start >= _IMPACT_CACHE_MIN_POSTINGS:
+                with self._impacts_lock:
+                    if sum(map(len, cached.values())) + len(impacts) <= LEXICAL_IMPACT_CACHE_POSTINGS:
+                        cached[position] = impacts
+        if mask is not None:
+            keep = mask[rows]
+            rows, impacts = rows[keep], impacts[keep]
+        scores = np.float32(weight * (LEXICAL_K1 + 1)) * impacts
+        if totals is not None:
+            totals[rows] += scores
+        return rows, scores
+
+    def _probe(self, positions: np.ndarray, idf: np.ndarray, rows: np.ndarray, norm: np.ndarray) -> np.ndarray:
+        """What the terms add to the scores of `rows`, by binary search in their posting lists."""
+        extra = np.zeros(len(rows), dtype=np.float32)
+        for position, weight in zip(positions.tolist(), idf.tolist()):
+            start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+            term_rows = self.rows[start:end]
+            at = np.minimum(np.searchsorted(term_rows, rows), end - start - 1)
+            found = np.asarray(term_rows[at]) == rows
+            tf = np.asarray(self.tf[start:end][at[found]], dtype=np.float32)
+            extra[found] += np.float32(weight * (LEXICAL_K1 + 1)) * tf / (tf + norm[rows[found]])
+        return extra
+
+
+def _candidates(scored: list[tuple[np.ndarray, np.ndarray]],
+                totals: Optional[np.ndarray]) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    (rows, scores, copies): the rows of all the terms with their summed scores. A row is
+    listed once per term it has, so up to `copies` times.
+    """
+    if not scored:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32), 1
+    if len(scored) == 1:
+        return scored[0][0], scored[0][1], 1
+    rows = np.concatenate([rows for rows, _ in scored])
+    return rows, totals[rows], len(scored)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], rrf_k: int = HYBRID_RRF_K,
+                           normalize: bool = False) -> list[tuple[Hashable, float]]:
+    """
+    (key, fused score) over all keys in `rankings` (each best first), best first.
+
+    With `normalize`, scores are divided by the best possible one (first in every
+    ranking), so they fall in (0, 1] like a similarity.
+    """
+    scores: dict = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    if normalize and rankings:
+        best = len(rankings) / (rrf_k + 1)
+        scores = {key: score / best for key, score in scores.items()}
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,598 @@
+"""
+Offline mirror of the climate_change collection as a memory-mapped IVF vector index.
+
+Every analyst query otherwise goes to the remote collection (with a timeout of up to
+10 s). A snapshot of the collection's vectors and metadata is written to a directory
+once, and the "Local Index" search type answers from it in milliseconds: the query
+is compared with the IVF list centroids, and only the closest `nprobe` lists are
+scanned. Vector rows are stored grouped by list, so each probe reads one contiguous
+range of the memory-mapped file. `nprobe` is set for a top-25; a larger k probes
+more lists (see `probes_for_k`), since its results span more of them.
+
+Filterable metadata (tribe, country, platform, likes, age...) is also stored
+column-wise, so a Data API style filter becomes a boolean mask over all rows before
+any vector is read. Filtered searches probe proportionally more lists, and when that
+would read more than the matching rows themselves, those rows are scanned exactly,
+so filters don't cost recall.
+
+Layout of an index directory:
+
+    manifest.json          dim, count, nlist, metric and the metadata columns
+    vectors.f32            (count, dim) float32, L2-normalised, rows grouped by list
+    centroids.npy          (nlist, dim) float32
+    list_offsets.npy       (nlist + 1,) rows of list i are [offsets[i], offsets[i + 1])
+    column.<field>.npy     float64 (NaN = missing) or int32 codes (-1 = missing)
+    documents.jsonl        the documents (without vectors), one per row, same order
+    document_offsets.npy   (count + 1,) byte offsets into documents.jsonl
+    lexical.*.npy          BM25 inverted index of the texts, for hybrid search (lexical_index.py)
+
+Build one with `python -m custom_components.local_index <directory>`, or keep a mirror
+of segments up to date with `python -m custom_components.index_sync <directory>`.
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import shutil
+import threading
+import time
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from custom_components.lexical_index import (
+    LexicalIndex,
+    LexicalIndexWriter,
+    bm25_idf,
+    term_hashes,
+    tokenize,
+)
+
+LOCAL_INDEX_DIR: str = os.getenv(
+    "TRIBE_LOCAL_INDEX_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "tribe", "local_index"),
+)
+LOCAL_INDEX_FIELDS = ("tribe", "country", "platform", "age", "gender", "likes", "shares", "comments",
+                      "follower_count")
+# Lists probed for a top-k of up to LOCAL_INDEX_NPROBE_K; more for a larger k or a
+# narrower filter. On the 1.7 notebook's 100k posts this keeps recall@k at 0.9 or more
+# for k = 10 to 100, unfiltered and filtered, at about 1 ms per unfiltered query for
+# k <= 25 and 5-6 ms for k = 100 (exact scan: 12 ms)
+LOCAL_INDEX_NPROBE: int = 16
+LOCAL_INDEX_NPROBE_K: int = 25
+LOCAL_INDEX_NPROBE_K_EXPONENT: float = 1.5
+LOCAL_INDEX_KMEANS_ITERATIONS: int = 10
+LOCAL_INDEX_KMEANS_SAMPLE_PER_LIST: int = 64
+
+# Present in directories maintained by index_sync instead of manifest.json
+MIRROR_STATE_FILE = "mirror.json"
+
+_SCAN_CHUNK_ROWS = 65536
+# Reading scattered rows costs about this many times a row in a contiguous scan
+_GATHER_COST = 3
+
+
+def probes_for_k(nprobe: int, k: float) -> int:
+    """
+    Lists to probe for a top-k, given `nprobe` for a top-LOCAL_INDEX_NPROBE_K.
+
+    The k best matches sit in more lists the larger k is, and faster than linearly
+    (a top-100 reaches past the query's own topic), so the lists probed grow with
+    k ** LOCAL_INDEX_NPROBE_K_EXPONENT.
+    """
+    if k <= LOCAL_INDEX_NPROBE_K:
+        return nprobe
+    return math.ceil(nprobe * (k / LOCAL_INDEX_NPROBE_K) ** LOCAL_INDEX_NPROBE_K_EXPONENT)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class LocalIndex:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        self.count = self.manifest["count"]
+        self.dim = self.manifest["dim"]
+        self.columns = self.manifest["columns"]
+        self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r",
+                                 shape=(self.count, self.dim))
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        self._column_data = {field: np.load(os.path.join(path, f"column.{field}.npy"), mmap_mode="r")
+                             for field in self.columns}
+        self._document_offsets = np.load(os.path.join(path, "document_offsets.npy"), mmap_mode="r")
+        self._documents_file = open(os.path.join(path, "documents.jsonl"), "rb")
+        self._documents = mmap.mmap(self._documents_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._lexical = None
+
+    def close(self):
+        self._documents.close()
+        self._documents_file.close()
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def document(self, row: int) -> dict:
+        start, end = int(self._document_offsets[row]), int(self._document_offsets[row + 1])
+        return json.loads(self._documents[start:end])
+
+    @property
+    def lexical(self) -> LexicalIndex:
+        if self._lexical is None:
+            if "lexical" not in self.manifest:
+                raise ValueError(f"The local index at {self.path} has no lexical index; rebuild it for hybrid search")
+            self._lexical = LexicalIndex(self.path, self.manifest["lexical"])
+        return self._lexical
+
+    # Filters
+
+    def filter_mask(self, filter_dict: Optional[dict]) -> Optional[np.ndarray]:
+        """Rows matching a Data API style filter ("metadata." prefixes optional), or None for no filter."""
+        if not filter_dict:
+            return None
+        return self._condition_mask(filter_dict)
+
+    def _condition_mask(self, condition: dict) -> np.ndarray:
+        mask = np.ones(self.count, dtype=bool)
+        for key, value in condition.items():
+            if key == "$and":
+                for sub_condition in value:
+                    mask &= self._condition_mask(sub_condition)
+            elif key == "$or":
+                any_mask = np.zeros(self.count, dtype=bool)
+                for sub_condition in value:
+                    any_mask |= self._condition_mask(sub_condition)
+                mask &= any_mask
+            elif key == "$not":
+                mask &= ~self._condition_mask(value)
+            else:
+                mask &= self._field_mask(key, value)
+        return mask
+
+    def _field_mask(self, field: str, value) -> np.ndarray:
+        name = field[len("metadata."):] if field.startswith("metadata.") else field
+        if name not in self.columns:
+            raise ValueError(f"Field {field!r} is not in the local index (indexed: {', '.join(self.columns)})")
+        column = self._column_data[name]
+        kind = self.columns[name]["kind"]
+        if not (isinstance(value, dict) and value and all(key.startswith("$") for key in value)):
+            return self._compare(column, kind, name, "$eq", value)
+        mask = np.ones(self.count, dtype=bool)
+        for operator, operand in value.items():
+            mask &= self._compare(column, kind, name, operator, operand)
+        return mask
+
+    def _compare(self, column, kind: str, name: str, operator: str, operand) -> np.ndarray:
+        present = ~np.isnan(column) if kind == "number" else column >= 0
+        if operator == "$exists":
+            return present if operand else ~present
+        if operator in ("$in", "$nin"):
+            mask = np.zeros(self.count, dtype=bool)
+            for item in operand:
+                mask |= self._compare(column, kind, name, "$eq", item)
+            return mask if operator == "$in" else ~mask
+        if operator == "$ne":
+            return ~self._compare(column, kind, name, "$eq", operand)
+
+        # Like the Data API, comparisons only match values of the same type
+        if kind == "number":
+            if not _is_number(operand):
+                return np.zeros(self.count, dtype=bool)
+            operand = float(operand)
+            values = column
+        else:
+            if not isinstance(operand, str):
+                return np.zeros(self.count, dtype=bool)
+            # The vocabulary is sorted, so codes compare in the same order as the strings
+            vocabulary = self.columns[name]["vocabulary"]
+            position = int(np.searchsorted(vocabulary, operand))
+            found = position < len(vocabulary) and vocabulary[position] == operand
+            if operator == "$eq":
+                return column == position if found else np.zeros(self.count, dtype=bool)
+            values = np.where(present, column, -1)
+            operand = position if found else position - 0.5
+            if operator in ("$gt", "$gte"):
+                return present & (values > operand if operator == "$gt" else values >= operand)
+        if operator == "$eq":
+            return values == operand
+        if operator == "$gt":
+            return values > operand
+        if operator == "$gte":
+            return values >= operand
+        if operator == "$lt":
+            return present & (values < operand)
+        if operator == "$lte":
+            return present & (values <= operand)
+        raise ValueError(f"Unsupported filter operator {operator!r} for the local index")
+
+    # Search
+
+    def _probe_rows(self, query: np.ndarray, nprobe: int) -> list[tuple[int, int]]:
+        nprobe = min(nprobe, self.nlist)
+        closeness = self.centroids @ query
+        lists = np.argpartition(-closeness, nprobe - 1)[:nprobe] if nprobe < self.nlist else range(self.nlist)
+        return [(int(self.list_offsets[i]), int(self.list_offsets[i + 1])) for i in lists]
+
+    def lists_to_probe(self, matching: int, nprobe: int, k: int = LOCAL_INDEX_NPROBE_K) -> Optional[int]:
+        """
+        Lists to probe for a top-k when `matching` rows pass the filter, or None when
+        scanning those rows exactly is cheaper.
+
+        A filter keeping a fraction of the rows also thins out every list, so it probes
+        proportionally more lists to compare the query with as many candidates; and the
+        top k of those rows are spread over about as many lists as the top
+        k * count / matching of all rows, which sets the lists for a large k.
+        """
+        scale = self.count / max(1, matching)
+        nprobe = max(math.ceil(nprobe * scale), probes_for_k(nprobe, k * scale))
+        if nprobe >= self.nlist or nprobe * self.count / self.nlist >= matching * _GATHER_COST:
+            return None
+        return nprobe
+
+    def _scan(self, query: np.ndarray, ranges: Sequence[tuple[int, int]],
+              mask: Optional[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        rows, scores = [], []
+        for start, end in ranges:
+            for chunk_start in range(start, end, _SCAN_CHUNK_ROWS):
+                chunk_end = min(end, chunk_start + _SCAN_CHUNK_ROWS)
+                chunk_scores = self.vectors[chunk_start:chunk_end] @ query
+                if mask is None:
+                    rows.append(np.arange(chunk_start, chunk_end))
+                else:
+                    keep = np.flatnonzero(mask[chunk_start:chunk_end])
+                    rows.append(keep + chunk_start)
+                    chunk_scores = chunk_scores[keep]
+                scores.append(chunk_scores)
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(scores)
+
+    def search_rows(self, query_vector: Sequence[float], k: int, filter_dict: Optional[dict] = None,
+                    nprobe: int = LOCAL_INDEX_NPROBE, exact: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, cosine similarities) of the best `k` matches, best first; `nprobe` as for `probes_for_k`."""
+        query = _normalize(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+        mask = self.filter_mask(filter_dict)
+        matching = self.count if mask is None else int(mask.sum())
+        if matching == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        nprobe = None if exact else self.lists_to_probe(matching, nprobe, k)
+        if nprobe is None:
+            if mask is None or matching * _GATHER_COST >= self.count:
+                rows, scores = self._scan(query, [(0, self.count)], mask)
+            else:
+                rows = np.flatnonzero(mask)
+                scores = self.vectors[rows] @ query
+        else:
+            # Probe more lists until the filter leaves at least k rows (or everything is scanned)
+            while True:
+                rows, scores = self._scan(query, self._probe_rows(query, nprobe), mask)
+                if len(rows) >= k or nprobe >= self.nlist:
+                    break
+                nprobe *= 2
+
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def search(self, query_vector: Sequence[float], k: int, filter_dict: Optional[dict] = None,
+               nprobe: int = LOCAL_INDEX_NPROBE, exact: bool = False) -> list[dict]:
+        """
+        The best `k` documents, shaped like Data API `find` results.
+
+        `$similarity` uses the Data API's cosine scale, (1 + cos) / 2, so score
+        thresholds mean the same locally and remotely; `$vector` is the stored
+        (normalised) row.
+        """
+        rows, scores = self.search_rows(query_vector, k, filter_dict, nprobe=nprobe, exact=exact)
+        return [self.result(row, score) for row, score in zip(rows.tolist(), scores.tolist())]
+
+    def result(self, row: int, score: float) -> dict:
+        doc = self.document(row)
+        doc["$similarity"] = (1 + score) / 2
+        doc["$vector"] = self.vectors[row]
+        return doc
+
+    # Lexical search
+
+    def lexical_statistics(self, hashes: np.ndarray) -> tuple[int, int, np.ndarray]:
+        """(rows, total tokens, document frequency of each term) for BM25."""
+        lexical = self.lexical
+        return self.count, lexical.total_length, lexical.document_frequencies(lexical.lookup(hashes))
+
+    def lexical_rows(self, hashes: np.ndarray, k: int, filter_dict: Optional[dict] = None,
+                     statistics: Optional[tuple[int, int, np.ndarray]] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, BM25 scores) of the best `k` matches for the query terms `hashes`, best first.
+
+        `statistics` (as from `lexical_statistics`, summed over segments) defaults to this index's own.
+        """
+        count, total_length, df = statistics or self.lexical_statistics(hashes)
+        lexical = self.lexical
+        return lexical.search(lexical.lookup(hashes), bm25_idf(count, df), total_length / max(count, 1), k,
+                              mask=self.filter_mask(filter_dict))
+
+    def lexical_search(self, query: str, k: int, filter_dict: Optional[dict] = None) -> list[dict]:
+        """The best `k` documents for `query` by BM25, with the score in `$lexical_score`."""
+        hashes = term_hashes(sorted(set(tokenize(query))))
+        rows, scores = self.lexical_rows(hashes, k, filter_dict)
+        return [self.lexical_result(row, score) for row, score in zip(rows.tolist(), scores.tolist())]
+
+    def lexical_result(self, row: int, score: float) -> dict:
+        doc = self.document(row)
+        doc["$lexical_score"] = score
+        return doc
+
+
+class SegmentedIndex:
+    """
+    A mirror kept up to date by `index_sync`: one LocalIndex segment per sync (until
+    compacted), searched together. `mirror.json` lists the live segments.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MIRROR_STATE_FILE), "r", encoding="utf-8") as file:
+            self.state = json.load(file)
+        self.segments = [get_local_index(os.path.join(path, "segments", name)) for name in self.state["segments"]]
+
+    @property
+    def count(self) -> int:
+        return sum(segment.count for segment in self.segments)
+
+    def search(self, query_vector: Sequence[float], k: int, filter_dict: Optional[dict] = None,
+               nprobe: int = LOCAL_INDEX_NPROBE, exact: bool = False) -> list[dict]:
+        """The best `k` documents over all segments, as `LocalIndex.search`."""
+        candidates = []
+        for segment in self.segments:
+            rows, scores = segment.search_rows(query_vector, k, filter_dict, nprobe=nprobe, exact=exact)
+            candidates.extend((score, segment, row) for row, score in zip(rows.tolist(), scores.tolist()))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        results, seen = [], set()
+        for score, segment, row in candidates:
+            doc = segment.result(row, score)
+            # A post re-synced after a crash can be in two segments until they are compacted
+            if doc.get("_id") in seen:
+                continue
+            seen.add(doc.get("_id"))
+            results.append(doc)
+            if len(results) == k:
+                break
+        return results
+
+    def lexical_search(self, query: str, k: int, filter_dict: Optional[dict] = None) -> list[dict]:
+        """The best `k` documents over all segments by BM25, as `LocalIndex.lexical_search`."""
+        hashes = term_hashes(sorted(set(tokenize(query))))
+        count, total_length, df = 0, 0, np.zeros(len(hashes), dtype=np.int64)
+        for segment in self.segments:
+            segment_count, segment_length, segment_df = segment.lexical_statistics(hashes)
+            count, total_length, df = count + segment_count, total_length + segment_length, df + segment_df
+
+        candidates = []
+        for segment in self.segments:
+            rows, scores = segment.lexical_rows(hashes, k, filter_dict, statistics=(count, total_length, df))
+            candidates.extend((score, segment, row) for row, score in zip(rows.tolist(), scores.tolist()))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        results, seen = [], set()
+        for score, segment, row in candidates:
+            doc = segment.lexical_result(row, score)
+            if doc.get("_id") in seen:
+                continue
+            seen.add(doc.get("_id"))
+            results.append(doc)
+            if len(results) == k:
+                break
+        return results
+
+
+_indexes: dict = {}
+_indexes_lock = threading.RLock()
+
+
+def get_local_index(path: str):
+    """
+    Process-wide open index for `path` (a snapshot or a synced mirror), reopened when it
+    is rebuilt or synced.
+    """
+    is_mirror = os.path.exists(os.path.join(path, MIRROR_STATE_FILE))
+    version = os.stat(os.path.join(path, MIRROR_STATE_FILE if is_mirror else "manifest.json")).st_mtime_ns
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = SegmentedIndex(path) if is_mirror else LocalIndex(path)
+        _indexes[path] = (version, index)
+        # The replaced index may still be in use by a running search; its maps are freed with it
+        return index
+
+
+def local_index_path(collection_name: str) -> str:
+    return os.path.join(LOCAL_INDEX_DIR, collection_name)
+
+
+# Building
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int, sample_size: int,
+                      rng: np.random.Generator) -> np.ndarray:
+    count = len(vectors)
+    sample_rows = np.sort(rng.choice(count, size=min(count, sample_size), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        sizes = np.bincount(assignment, minlength=nlist)
+        empty = sizes == 0
+        # Re-seed empty lists from random sample points
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _encode_column(values: list) -> tuple[np.ndarray, dict]:
+    present = [value for value in values if value is not None]
+    if all(_is_number(value) for value in present):
+        column = np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+        return column, {"kind": "number"}
+    # Mixed or text fields are stored as text
+    vocabulary = sorted({str(value) for value in present})
+    codes = {value: code for code, value in enumerate(vocabulary)}
+    column = np.array([-1 if value is None else codes[str(value)] for value in values], dtype=np.int32)
+    return column, {"kind": "text", "vocabulary": vocabulary}
+
+
+def _replace_directory(source: str, target: str):
+    previous = target + ".previous"
+    if os.path.exists(previous):
+        shutil.rmtree(previous)
+    if os.path.exists(target):
+        os.replace(target, previous)
+    os.replace(source, target)
+    if os.path.exists(previous):
+        shutil.rmtree(previous)
+
+
+def build_local_index(documents: Iterable[dict], path: str, nlist: Optional[int] = None,
+                      fields: Sequence[str] = LOCAL_INDEX_FIELDS,
+                      kmeans_iterations: int = LOCAL_INDEX_KMEANS_ITERATIONS, seed: int = 0,
+                      lexical: bool = True) -> dict:
+    """
+    Write a local index of `documents` (Data API documents with `$vector`) to `path`.
+
+    Documents are streamed to disk as they arrive, so the collection never has to fit
+    in memory; the new snapshot replaces any existing one at `path` only once complete.
+    With `lexical`, the BM25 index of the `$vectorize` texts is built alongside.
+    """
+    started = time.perf_counter()
+    building = path + ".building"
+    if os.path.exists(building):
+        shutil.rmtree(building)
+    os.makedirs(building)
+
+    unsorted_vectors_path = os.path.join(building, "vectors.unsorted")
+    unsorted_documents_path = os.path.join(building, "documents.unsorted")
+    dim = None
+    count = 0
+    offsets = [0]
+    field_values = {field: [] for field in fields}
+    lexical_writer = LexicalIndexWriter() if lexical else None
+    with open(unsorted_vectors_path, "wb") as vectors_file, open(unsorted_documents_path, "wb") as documents_file:
+        for doc in documents:
+            vector = doc.get("$vector")
+            if vector is None:
+                continue
+            vector = np.asarray(vector, dtype=np.float32)
+            if dim is None:
+                dim = len(vector)
+            elif len(vector) != dim:
+                raise ValueError(f"Document {doc.get('_id')} has a {len(vector)}-d vector, expected {dim}")
+            vectors_file.write(_normalize(vector[None, :]).tobytes())
+
+            stored = {key: value for key, value in doc.items() if key not in ("$vector", "$similarity")}
+            line = json.dumps(stored, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+            documents_file.write(line + b"\n")
+            offsets.append(offsets[-1] + len(line) + 1)
+
+            metadata = doc.get("metadata") or {}
+            for field in fields:
+                field_values[field].append(metadata.get(field))
+            if lexical_writer is not None:
+                lexical_writer.add(doc.get("$vectorize") or doc.get("content"))
+            count += 1
+    if count == 0:
+        shutil.rmtree(building)
+        raise ValueError("No documents with vectors to index")
+
+    vectors = np.memmap(unsorted_vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+    nlist = max(1, min(count, nlist or int(round(np.sqrt(count)))))
+    rng = np.random.default_rng(seed)
+    centroids = _spherical_kmeans(vectors, nlist, kmeans_iterations, nlist * LOCAL_INDEX_KMEANS_SAMPLE_PER_LIST, rng)
+
+    assignment = np.empty(count, dtype=np.int32)
+    for start in range(0, count, _SCAN_CHUNK_ROWS):
+        assignment[start:start + _SCAN_CHUNK_ROWS] = np.argmax(vectors[start:start + _SCAN_CHUNK_ROWS] @ centroids.T, axis=1)
+    order = np.argsort(assignment, kind="stable")
+    list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=nlist)))).astype(np.int64)
+
+    sorted_vectors = np.memmap(os.path.join(building, "vectors.f32"), dtype=np.float32, mode="w+", shape=(count, dim))
+    for start in range(0, count, _SCAN_CHUNK_ROWS):
+        sorted_vectors[start:start + _SCAN_CHUNK_ROWS] = vectors[order[start:start + _SCAN_CHUNK_ROWS]]
+    sorted_vectors.flush()
+    del sorted_vectors, vectors
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sorted_offsets = [0]
+    with open(unsorted_documents_path, "rb") as source, open(os.path.join(building, "documents.jsonl"), "wb") as target:
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as unsorted:
+            for row in order.tolist():
+                line = unsorted[offsets[row]:offsets[row + 1]]
+                target.write(line)
+                sorted_offsets.append(sorted_offsets[-1] + len(line))
+    np.save(os.path.join(building, "document_offsets.npy"), np.asarray(sorted_offsets, dtype=np.int64))
+    os.remove(unsorted_vectors_path)
+    os.remove(unsorted_documents_path)
+
+    columns = {}
+    for field in fields:
+        column, description = _encode_column(field_values[field])
+        np.save(os.path.join(building, f"column.{field}.npy"), column[order])
+        columns[field] = description
+    np.save(os.path.join(building, "centroids.npy"), centroids)
+    np.save(os.path.join(building, "list_offsets.npy"), list_offsets)
+
+    manifest = {
+        "count": count,
+        "dim": dim,
+        "nlist": nlist,
+        "metric": "cosine",
+        "columns": columns,
+        "built_at": time.time(),
+    }
+    if lexical_writer is not None:
+        manifest["lexical"] = lexical_writer.write(building, order)
+    with open(os.path.join(building, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    _replace_directory(building, path)
+    logger.info(f"Local index: {count} documents, {nlist} lists, built in {time.perf_counter() - started:.1f} s")
+    return manifest
+
+
+def main():
+    from custom_components.astra_pool import get_collection
+    from custom_components.bulk_fetch import fetch_range
+
+    parser = argparse.ArgumentParser(description="Snapshot an Astra DB collection into a local index.")
+    parser.add_argument("path", nargs="?", help=f"Index directory (default {LOCAL_INDEX_DIR}/<collection>)")
+    parser.add_argument("--collection", default="climate_change")
+    parser.add_argument("--api-endpoint", default=os.getenv("ASTRA_DB_API_ENDPOINT"))
+    parser.add_argument("--namespace", default=None)
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+
+    token = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
+    if not token or not args.api_endpoint:
+        parser.error("ASTRA_DB_APPLICATION_TOKEN and --api-endpoint (or ASTRA_DB_API_ENDPOINT) are required")
+    collection = get_collection(token, args.api_endpoint, args.collection, namespace=args.namespace)
+    documents = (doc for page in fetch_range(collection, None, batch_size=1000) for doc in page)
+    build_local_index(documents, args.path or local_index_path(args.collection), nlist=args.nlist)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Maximal marginal relevance over the vectors returned with Custom Search results.
+
+The `mmr` search type goes through `vector_store.max_marginal_relevance_search`, which
+embeds the query again and makes its own fetch. Custom Search already has the query
+vector, and asking the Data API for `$vector` gives the candidate matrix in the same
+`find`, so the rerank runs here with numpy: candidate/query similarities once, then
+one matrix-vector product per pick to update each candidate's similarity to the
+closest already-picked result.
+"""
+from typing import Sequence
+
+import numpy as np
+
+MMR_LAMBDA: float = 0.5  # 1 = pure relevance, 0 = pure diversity
+MMR_FETCH_K_FACTOR: int = 4  # candidates fetched per result when Fetch K is left at 0
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def vector_matrix(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    """float32 (n, dim) matrix from the `$vector` lists of a `find` response."""
+    if not len(vectors):
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.array(vectors, dtype=np.float32)
+
+
+def maximal_marginal_relevance(query_vector: Sequence[float], candidates: np.ndarray, k: int,
+                               lambda_mult: float = MMR_LAMBDA) -> list[int]:
+    """
+    Indices of up to `k` rows of `candidates`, in pick order.
+
+    Each pick maximises `lambda_mult * sim(query, c) - (1 - lambda_mult) * max sim(c, picked)`
+    with cosine similarity, as in LangChain's `maximal_marginal_relevance`.
+    """
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    candidates = _normalize_rows(np.asarray(candidates, dtype=np.float32))
+    query = _normalize_rows(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+
+    relevance = candidates @ query
+    weighted_relevance = lambda_mult * relevance
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    picked = [int(np.argmax(relevance))]
+    available[picked[0]] = False
+    while len(picked) < min(k, n):
+        np.maximum(redundancy, candidates @ candidates[picked[-1]], out=redundancy)
+        scores = np.where(available, weighted_relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+    return picked
@@ -0,0 +1,123 @@
+"""
+Near-duplicate suppression for Custom Search results.
+
+Viral posts come back many times in one top-k: reposts, quote-tweets and the same clip
+on TikTok and YouTube, differing only in hashtags, links or a word or two. Each result
+gets a 64-bit SimHash of its normalised text (word unigrams and bigrams). The hashing,
+bit voting and pairwise Hamming distances are done as numpy batches. Results within
+`max_distance` bits of each other are collapsed, and each cluster is represented by its
+most engaged-with member.
+"""
+import zlib
+from typing import Optional, Sequence
+
+import numpy as np
+
+from custom_components.context_packing import engagement, fingerprint
+
+# Bits two SimHashes may differ by and still count as the same post
+NEAR_DUPLICATE_MAX_DISTANCE: int = 6
+# How many extra results to fetch up front so k survive deduplication
+NEAR_DUPLICATE_OVERFETCH: float = 1.5
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    # splitmix64 finaliser: spreads a 32-bit feature hash over all 64 SimHash bits
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def simhash_signatures(texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """(uint64 SimHash per text, bool mask of texts that had any words to hash)."""
+    # Each distinct word is hashed once per batch; bigram hashes are derived from word hashes
+    vocabulary = {}
+    word_ids, lengths = [], []
+    for text in texts:
+        words = fingerprint(text or "").split()
+        word_ids.extend(vocabulary.setdefault(word, len(vocabulary)) for word in words)
+        lengths.append(len(words))
+    lengths = np.asarray(lengths, dtype=np.int64)
+    has_features = lengths > 0
+    signatures = np.zeros(len(texts), dtype=np.uint64)
+    if not has_features.any():
+        return signatures, has_features
+
+    word_hashes = _mix64(np.fromiter((zlib.crc32(word.encode("utf-8")) for word in vocabulary),
+                                     dtype=np.uint32, count=len(vocabulary)))
+    unigrams = word_hashes[np.asarray(word_ids, dtype=np.int64)]
+    # Bigrams: consecutive words within a text (pairs spanning two texts are dropped)
+    doc_of_word = np.repeat(np.arange(len(texts)), lengths)
+    same_doc = doc_of_word[1:] == doc_of_word[:-1]
+    bigrams = _mix64(unigrams[:-1] * np.uint64(31) ^ unigrams[1:])[same_doc]
+
+    features = np.concatenate((unigrams, bigrams))
+    feature_doc = np.concatenate((doc_of_word, doc_of_word[:-1][same_doc]))
+    order = np.argsort(feature_doc, kind="stable")
+    feature_counts = np.bincount(feature_doc, minlength=len(texts))
+
+    # One row of 64 bits per feature (bit 0 = least significant); a bit is set in the
+    # signature when it is set in more than half of the text's features
+    bits = np.unpackbits(features[order].view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    offsets = np.concatenate(([0], np.cumsum(feature_counts[has_features])[:-1]))
+    ones = np.add.reduceat(bits, offsets, axis=0, dtype=np.uint16)
+    packed = np.packbits(2 * ones > feature_counts[has_features, None], axis=1, bitorder="little")
+    signatures[has_features] = packed.view(np.uint64).reshape(-1)
+    return signatures, has_features
+
+
+def hamming_distances(signatures: np.ndarray) -> np.ndarray:
+    """Pairwise Hamming distances between uint64 signatures, as an (n, n) matrix."""
+    xor = signatures[:, None] ^ signatures[None, :]
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor)
+    return _POPCOUNT8[xor.view(np.uint8)].reshape(xor.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def cluster_labels(signatures: np.ndarray, has_features: np.ndarray, max_distance: int) -> np.ndarray:
+    """Cluster id per signature: connected components of the "within max_distance" graph."""
+    n = len(signatures)
+    parent = np.arange(n)
+    close = hamming_distances(signatures) <= max_distance
+    # Texts with no words are never duplicates of anything
+    close &= has_features[:, None] & has_features[None, :]
+    for i, j in zip(*np.nonzero(np.triu(close, 1))):
+        root_i, root_j = i, j
+        while parent[root_i] != root_i:
+            root_i = parent[root_i]
+        while parent[root_j] != root_j:
+            root_j = parent[root_j]
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    for i in range(n):
+        while parent[i] != parent[parent[i]]:
+            parent[i] = parent[parent[i]]
+    return parent
+
+
+def collapse_near_duplicates(docs: Sequence[dict], max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+                             text_field: str = "$vectorize",
+                             engagements: Optional[Sequence[float]] = None) -> list[int]:
+    """
+    Indices into `docs` (Data API documents, best match first) with near-duplicates collapsed.
+
+    Each cluster is represented by its most engaged-with member (likes, comments and
+    shares from `metadata`), placed at the rank of the cluster's best match.
+    """
+    if not docs:
+        return []
+    signatures, has_features = simhash_signatures([doc.get(text_field) or "" for doc in docs])
+    labels = cluster_labels(signatures, has_features, max_distance)
+    if engagements is None:
+        engagements = [engagement(doc.get("metadata") or {}) for doc in docs]
+
+    representative = {}
+    for index, label in enumerate(labels.tolist()):
+        best = representative.get(label)
+        if best is None or engagements[index] > engagements[best]:
+            representative[label] = index
+    # Labels are the lowest index in each cluster, i.e. its best-ranked member
+    return [representative[label] for label in sorted(representative)]
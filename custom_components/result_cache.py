@@ -0,0 +1,126 @@
+"""
+TTL + LRU cache for Custom Search results.
+
+Analysts keep sending the same tribe/country/platform combination with the same RAG
+query, so identical `collection.find(..., sort={"$vector": ...})` calls are common.
+Entries are keyed on the canonicalised Astra filter, a quantised hash of the query
+vector, k and the score threshold. Ingesting into a collection bumps its generation,
+which invalidates every cached result for it at once. A search takes the generation
+when it misses and hands it back to `put`, so results fetched before an ingestion
+that finished mid-search are not stored as fresh.
+"""
+import hashlib
+import json
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Optional
+
+RESULT_CACHE_MAX_ENTRIES: int = 512
+RESULT_CACHE_TTL_S: float = 300.0
+
+# Query vectors are hashed at int16 resolution so float noise in the embedding call
+# (e.g. across client versions) still maps to the same entry
+VECTOR_QUANTIZATION_SCALE: int = 4096
+
+
+def canonical_filter(filter_dict: Any) -> Any:
+    """Order-insensitive form of an Astra filter: sorted keys and sorted $and/$or operands."""
+    if isinstance(filter_dict, dict):
+        return {key: canonical_filter(filter_dict[key]) for key in sorted(filter_dict)}
+    if isinstance(filter_dict, list):
+        items = [canonical_filter(item) for item in filter_dict]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True, default=str))
+    return filter_dict
+
+
+def quantized_vector_digest(vector: list[float]) -> str:
+    scale = VECTOR_QUANTIZATION_SCALE
+    quantized = array("h", (max(-32768, min(32767, round(x * scale))) for x in vector))
+    return hashlib.sha1(quantized.tobytes()).hexdigest()
+
+
+class SearchResultCache:
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl_s: float = RESULT_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[tuple, tuple[float, tuple, list]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        # Bumped by invalidate() without a collection id, so no generation taken before it is current
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(collection_id: str,
+                 filter_dict: Optional[dict],
+                 query_vector: list[float],
+                 k: int,
+                 score_threshold: Optional[float],
+                 variant=None) -> tuple:
+        # `variant` separates result sets post-processed differently (e.g. near-duplicate collapsing)
+        filter_json = json.dumps(canonical_filter(filter_dict or {}), sort_keys=True, separators=(",", ":"), default=str)
+        return collection_id, filter_json, quantized_vector_digest(query_vector), k, score_threshold, variant
+
+    def _generation(self, collection_id: str) -> tuple:
+        return self._epoch, self._generations.get(collection_id, 0)
+
+    def generation(self, collection_id: str) -> tuple:
+        """The collection's current generation; take it on a miss, before searching, and pass it to `put`."""
+        with self._lock:
+            return self._generation(collection_id)
+
+    def get(self, key: tuple) -> Optional[list]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, generation, results = entry
+                if expires_at >= time.monotonic() and generation == self._generation(key[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(results)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, results: list, generation: Optional[tuple] = None):
+        """
+        Store `results`, unless the collection was invalidated since `generation` was taken.
+
+        Without `generation` the results are taken to be current.
+        """
+        with self._lock:
+            current = self._generation(key[0])
+            if generation is not None and generation != current:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_s, current, list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection_id: Optional[str] = None):
+        """Drop cached results for one collection, or for everything when no id is given."""
+        with self._lock:
+            if collection_id is None:
+                self._entries.clear()
+                self._generations.clear()
+                self._epoch += 1
+            else:
+                self._generations[collection_id] = self._generations.get(collection_id, 0) + 1
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def collection_id(api_endpoint: str, namespace: Optional[str], collection_name: str) -> str:
+    return f"{(api_endpoint or '').rstrip('/')}/{namespace or ''}/{collection_name}"
+
+
+_shared_cache = SearchResultCache()
+
+
+def get_result_cache() -> SearchResultCache:
+    return _shared_cache
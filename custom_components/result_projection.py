@@ -0,0 +1,115 @@
+"""
+Which fields Custom Search fetches, and the record each result is decoded into.
+
+Custom Search used to `find` with `projection={"*": True}`: every field of every
+result, including the 3072 floats of `$vector` (about 60 KB of JSON per post) that
+nothing downstream reads. Each result then became a LangChain `Document`, a `Data`,
+and was cut down to a dozen fields by the jq query of ParseJSONData-eeEA0.
+
+`plan_projection` asks only for what the results are rendered with: `$vectorize` and
+the metadata keys the Parse Data template uses, looked up through the jq field
+mapping (`{user_country}` is the post's `country`), plus the engagement counts
+near-duplicate collapsing and the Context Packer rank by. `$vector` is only
+requested when the MMR rerank needs it.
+
+Results are decoded into `SearchHit`, a `__slots__` record that quacks like a
+`Document` for `docs_to_data`, instead of a pydantic model per post.
+"""
+import functools
+import string
+from typing import Optional
+
+# Parse Data template the search results are rendered with (ParseData-obnZv)
+SNIPPET_TEMPLATE: str = (
+    "By a {user_age_group_years} {user_gender} user in {user_country} on {platform}:\\n\n{text}\\n\n"
+    "(stats: {likes_count} likes, {shares_count} shares, created at: {create_time})\\n\n"
+    "------------------------------------------\\n"
+)
+
+# The jq mapping of ParseJSONData-eeEA0: snippet field -> (search result field, default)
+SNIPPET_FIELDS: dict[str, tuple[str, Optional[str]]] = {
+    "text": ("text", None),
+    "likes_count": ("likes", "0"),
+    "comments_count": ("comments", "0"),
+    "shares_count": ("shares", "0"),
+    "create_time": ("create_time", "Not specified"),
+    "user_age_group_years": ("age", "Not specified"),
+    "user_gender": ("gender", "Not Specified"),
+    "user_country": ("country", "Unknown"),
+    "user_follower_count": ("follower_count", "Not specified"),
+    "platform": ("platform", None),
+    "similarity": ("similarity", None),
+}
+
+# Always fetched: near-duplicate collapsing and the Context Packer rank by engagement
+ENGAGEMENT_FIELDS = ("likes", "comments", "shares")
+
+# Result fields that are not metadata keys
+_RESULT_FIELDS = ("text", "similarity")
+
+
+def template_fields(template: str) -> list[str]:
+    """Names of the fields a str.format template uses, e.g. ["platform", "text"]."""
+    names = []
+    for _, field_name, _, _ in string.Formatter().parse(template):
+        if field_name:
+            name = field_name.split(".", 1)[0].split("[", 1)[0]
+            if name not in names:
+                names.append(name)
+    return names
+
+
+@functools.lru_cache(maxsize=64)
+def plan_projection(template: Optional[str] = SNIPPET_TEMPLATE, include_vector: bool = False) -> dict:
+    """
+    Data API projection for Custom Search results rendered with `template`.
+
+    An empty (or unparseable) template fetches all metadata. The returned dict is
+    shared between calls and must not be modified.
+    """
+    projection = {"$vectorize": True}
+    if include_vector:
+        projection["$vector"] = True
+    try:
+        names = template_fields(template) if template and template.strip() else None
+    except ValueError:
+        names = None
+    if names is None:
+        projection["metadata"] = True
+        return projection
+    keys = set(ENGAGEMENT_FIELDS)
+    for name in names:
+        source = SNIPPET_FIELDS.get(name, (name, None))[0]
+        if source not in _RESULT_FIELDS:
+            keys.add(source)
+    projection.update((f"metadata.{key}", True) for key in sorted(keys))
+    return projection
+
+
+class SearchHit:
+    """One Custom Search result, with the `page_content` and `metadata` `docs_to_data` reads."""
+    __slots__ = ("id", "text", "similarity", "fields")
+
+    def __init__(self, id, text: str, similarity: Optional[float], fields: dict):
+        self.id = id
+        self.text = text
+        self.similarity = similarity
+        self.fields = fields
+
+    @classmethod
+    def from_result(cls, doc: dict) -> "SearchHit":
+        """Decode a Data API result; `$vector` and anything else not rendered is dropped."""
+        return cls(doc.get("_id"), doc.get("$vectorize") or "", doc.get("$similarity"), doc.get("metadata") or {})
+
+    @property
+    def page_content(self) -> str:
+        return self.text
+
+    @property
+    def metadata(self) -> dict:
+        # A new dict on every call: Data.from_document adds "text" to the one it gets.
+        # Similarity rides along so downstream ranking (Context Packer) can use it
+        return {**self.fields, "similarity": self.similarity}
+
+    def __repr__(self) -> str:
+        return f"SearchHit(id={self.id!r}, similarity={self.similarity!r}, text={self.text[:40]!r})"
@@ -0,0 +1,185 @@
+"""
+Compiles the Astra DB component's `search_filter` JSON into Data API filters, once.
+
+The constructor sends the filter as a JSON list of conditions:
+
+    [{"field": "tribe", "operator": "eq", "value": 3},
+     {"field": "likes", "operator": "gte", "value": 100},
+     {"field": "likes", "operator": "lte", "value": 5000}]
+
+`compile_search_filter` parses it into the unprefixed filter `_build_search_args`
+used to build on every search, and the "metadata."-prefixed filter Custom Search
+sends to the Data API. The result is memoized on the JSON string, so a search with a
+filter the component has already seen costs a dictionary lookup.
+
+Compiling also:
+
+- supports `in`, `nin` and `exists` as well as eq/neq/gt/gte/lt/lte;
+- merges range conditions on the same field into one condition, e.g. gte 100 and
+  lte 5000 on likes become {"likes": {"$gte": 100, "$lte": 5000}}, and keeps only
+  the tighter of two bounds on the same side;
+- orders conditions by field, so filters differing only in the order of their
+  conditions compile to the same filter (and share result-cache entries).
+
+The filters it returns are shared between calls and must not be modified.
+"""
+import json
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
+
+from loguru import logger
+
+SEARCH_FILTER_CACHE_SIZE: int = 256
+
+# Constructor operator -> Data API operator (None: plain equality)
+OPERATORS = {
+    "eq": None,
+    "neq": "$ne",
+    "gt": "$gt",
+    "gte": "$gte",
+    "lt": "$lt",
+    "lte": "$lte",
+    "in": "$in",
+    "nin": "$nin",
+    "exists": "$exists",
+}
+
+_LOWER_BOUNDS = ("$gt", "$gte")
+_UPPER_BOUNDS = ("$lt", "$lte")
+
+
+class CompiledFilter(NamedTuple):
+    key: tuple  # canonical and hashable, equal for equivalent condition lists
+    filter: Optional[dict]  # field names as in the constructor, for the vector store and local index
+    astra_filter: Optional[dict]  # "metadata."-prefixed, for Data API queries on the collection
+
+
+NO_FILTER = CompiledFilter((), None, None)
+
+
+def prefix_metadata_fields(filter_dict: Any) -> Any:
+    """Prepend "metadata." to every field name of a filter, leaving $and/$or/... operators alone."""
+    if not isinstance(filter_dict, dict):
+        return filter_dict
+    result = {}
+    for key, value in filter_dict.items():
+        if key.startswith("$"):
+            result[key] = [prefix_metadata_fields(item) for item in value] if isinstance(value, list) \
+                else prefix_metadata_fields(value)
+        else:
+            result[f"metadata.{key}"] = prefix_metadata_fields(value)
+    return result
+
+
+def _freeze(value) -> Any:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _sort_key(frozen) -> str:
+    return json.dumps(frozen, default=str)
+
+
+def _kind(value) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    return type(value).__name__
+
+
+def _tighter(current: tuple, new: tuple, lower: bool) -> tuple:
+    (current_op, current_value), (new_op, new_value) = current, new
+    if current_value == new_value:
+        # At equal values the strict bound excludes more
+        return current if current_op in ("$gt", "$lt") else new
+    if lower:
+        return new if new_value > current_value else current
+    return new if new_value < current_value else current
+
+
+def _merge_bounds(bounds: list[tuple], lower: bool) -> list[tuple]:
+    """The tightest bound per value type; the Data API only compares values of the same type."""
+    tightest: dict[str, tuple] = {}
+    others = []
+    for bound in bounds:
+        kind = _kind(bound[1])
+        if kind not in ("number", "str"):
+            others.append(bound)
+        elif kind in tightest:
+            tightest[kind] = _tighter(tightest[kind], bound, lower)
+        else:
+            tightest[kind] = bound
+    return [tightest[kind] for kind in sorted(tightest)] + others
+
+
+def _parse_conditions(filter_list: list) -> list[tuple[str, Optional[str], Any]]:
+    conditions = []
+    for item in filter_list:
+        if not isinstance(item, dict):
+            continue
+        field, operator, value = item.get("field"), item.get("operator"), item.get("value")
+        if not (field and isinstance(field, str) and operator and value is not None):
+            continue
+        if operator not in OPERATORS:
+            logger.warning(f"Unknown filter operator {operator!r} on {field!r}, treating it as 'eq'")
+        mapped = OPERATORS.get(operator)
+        if mapped in ("$in", "$nin") and not isinstance(value, list):
+            value = [value]
+        elif mapped == "$exists" and not isinstance(value, bool):
+            logger.warning(f"Ignoring 'exists' condition on {field!r}: value must be true or false, not {value!r}")
+            continue
+        conditions.append((field, mapped, value))
+    return conditions
+
+
+def _merge_conditions(conditions: list[tuple[str, Optional[str], Any]]) -> list[dict]:
+    """One Data API condition per field where possible, with range bounds merged."""
+    by_field: dict[str, list] = {}
+    for field, operator, value in conditions:
+        by_field.setdefault(field, []).append((operator, value))
+
+    merged = []
+    for field, field_conditions in by_field.items():
+        lower = _merge_bounds([c for c in field_conditions if c[0] in _LOWER_BOUNDS], lower=True)
+        upper = _merge_bounds([c for c in field_conditions if c[0] in _UPPER_BOUNDS], lower=False)
+        # The first lower and upper bound go in one condition, any bounds of other types on their own
+        if lower or upper:
+            merged.append({field: dict(lower[:1] + upper[:1])})
+        merged.extend({field: {operator: value}} for operator, value in lower[1:] + upper[1:])
+        for operator, value in field_conditions:
+            if operator is None:
+                merged.append({field: value})
+            elif operator not in _LOWER_BOUNDS and operator not in _UPPER_BOUNDS:
+                merged.append({field: {operator: value}})
+
+    unique = {}
+    for condition in merged:
+        unique.setdefault(_freeze(condition), condition)
+    return [unique[key] for key in sorted(unique, key=_sort_key)]
+
+
+@lru_cache(maxsize=SEARCH_FILTER_CACHE_SIZE)
+def compile_search_filter(search_filter: Optional[str]) -> CompiledFilter:
+    """Compiled form of the component's `search_filter` JSON (NO_FILTER when empty or invalid)."""
+    if not search_filter:
+        return NO_FILTER
+    try:
+        filter_list = json.loads(search_filter)
+    except json.JSONDecodeError:
+        logger.warning("Invalid JSON format for search filter.")
+        return NO_FILTER
+    if not isinstance(filter_list, list):
+        logger.warning("Invalid search filter format. Expected a list of conditions.")
+        return NO_FILTER
+    logger.info(f"Filter list supplied: {filter_list}")
+
+    conditions = _merge_conditions(_parse_conditions(filter_list))
+    if not conditions:
+        return NO_FILTER
+    filter_dict = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    key = tuple(_freeze(condition) for condition in conditions)
+    return CompiledFilter(key, filter_dict, prefix_metadata_fields(filter_dict))
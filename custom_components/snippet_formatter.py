@@ -0,0 +1,54 @@
+from langflow.custom import Component
+from langflow.io import DataInput, MultilineInput, Output, StrInput
+from langflow.schema.message import Message
+
+from custom_components.result_projection import SNIPPET_TEMPLATE
+from custom_components.snippets import get_snippet_formatter
+
+
+class SnippetFormatterComponent(Component):
+    display_name: str = "Snippet Formatter"
+    description: str = ("Replaces Parse JSON (jq field mapping) followed by Parse Data: renames fields, fills in "
+                        "defaults and renders the template for every search result in one pass.")
+    name = "SnippetFormatter"
+    icon = "braces"
+
+    inputs = [
+        DataInput(
+            name="data",
+            display_name="Data",
+            info="Search results from the Astra DB component.",
+            is_list=True,
+        ),
+        MultilineInput(
+            name="template",
+            display_name="Template",
+            info="Same as Parse Data, with the field names of the mapping in braces.",
+            value=SNIPPET_TEMPLATE,
+        ),
+        MultilineInput(
+            name="field_mapping",
+            display_name="Field Mapping",
+            info="jq query of the Parse JSON node it replaces, e.g. '.[] | { text, likes_count: (.likes // \"0\") }'. "
+                 "Only renames and // defaults are supported. Leave blank for the TRIBE flow's mapping.",
+            advanced=True,
+            value="",
+        ),
+        StrInput(
+            name="sep",
+            display_name="Separator",
+            advanced=True,
+            value="\n",
+        ),
+    ]
+
+    outputs = [
+        Output(display_name="Text", name="text", method="format_snippets"),
+    ]
+
+    def format_snippets(self) -> Message:
+        formatter = get_snippet_formatter(self.template, self.field_mapping or None)
+        records = self.data or []
+        text = formatter.format(records, sep=self.sep)
+        self.status = f"{len(records)} snippets"
+        return Message(text=text)
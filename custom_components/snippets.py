@@ -0,0 +1,122 @@
+"""
+Search results to prompt snippets in one pass: the jq mapping of ParseJSONData-eeEA0
+and the template of ParseData-obnZv, fused and compiled once.
+
+The flow used to serialise every search result to JSON, run the jq program
+`.[] | { text, likes_count: (.likes // "0"), ... }` over it to rename fields and fill in
+defaults, wrap each output in a new `Data`, and only then have Parse Data format each
+record. `SnippetFormatter` compiles the same field mapping and the template into one
+positional format string plus, per placeholder, the result field to read and its
+default, so each result is rendered straight from the search record.
+
+`parse_field_mapping` reads the jq program the flow already holds, as long as it only
+renames fields and adds `//` defaults (which apply, as in jq, when the field is
+missing, null or false). Records the mapping has already been applied to (the output
+of ParseJSONData) render the same, so the Context Packer renders through this too.
+"""
+import functools
+import json
+import re
+import string
+from typing import Any, Iterable, Mapping, Optional
+
+from custom_components.result_projection import SNIPPET_FIELDS, SNIPPET_TEMPLATE
+
+_OBJECT = re.compile(r"^\s*(?:\.\[\]\s*\|\s*)?\{(?P<body>.*)\}\s*$", re.DOTALL)
+_ENTRY = re.compile(r"^(?P<name>\w+)\s*(?::\s*(?P<value>.+))?$", re.DOTALL)
+_VALUE = re.compile(r"^\(?\s*\.(?P<source>\w+)\s*(?://\s*(?P<default>.+?))?\s*\)?$", re.DOTALL)
+
+
+def _split_entries(body: str) -> list[str]:
+    """Split a jq object body on top-level commas (not those inside strings or parentheses)."""
+    entries, depth, in_string, start = [], 0, False, 0
+    for position, char in enumerate(body):
+        if in_string:
+            if char == '"' and body[position - 1] != "\\":
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            entries.append(body[start:position].strip())
+            start = position + 1
+    entries.append(body[start:].strip())
+    return [entry for entry in entries if entry]
+
+
+def parse_field_mapping(query: str) -> dict[str, tuple[str, Any]]:
+    """
+    `{snippet field: (result field, default)}` for a jq object construction such as
+    `.[] | { text, likes_count: (.likes // "0"), platform: .platform }`.
+
+    Raises ValueError for anything beyond renaming fields and `//` defaults.
+    """
+    match = _OBJECT.match(query or "")
+    if not match:
+        raise ValueError(f"Unsupported field mapping (expected '.[] | {{ ... }}'): {query!r}")
+    fields = {}
+    for entry in _split_entries(match["body"]):
+        entry_match = _ENTRY.match(entry)
+        if not entry_match:
+            raise ValueError(f"Unsupported field mapping entry: {entry!r}")
+        name, value = entry_match["name"], entry_match["value"]
+        if value is None:
+            fields[name] = (name, None)
+            continue
+        value_match = _VALUE.match(value.strip())
+        if not value_match:
+            raise ValueError(f"Unsupported field mapping entry: {entry!r}")
+        default = value_match["default"]
+        try:
+            fields[name] = (value_match["source"], json.loads(default) if default is not None else None)
+        except json.JSONDecodeError:
+            raise ValueError(f"Unsupported default in field mapping entry: {entry!r}")
+    return fields
+
+
+class SnippetFormatter:
+    """A Parse Data template and a field mapping compiled into a single formatter."""
+
+    def __init__(self, template: str = SNIPPET_TEMPLATE, fields: Optional[Mapping[str, tuple]] = None):
+        fields = SNIPPET_FIELDS if fields is None else fields
+        parts, self._getters = [], []
+        for literal, field_name, spec, conversion in string.Formatter().parse(template):
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field_name is None:
+                continue
+            name = re.split(r"[.\[]", field_name, maxsplit=1)[0]
+            if not name or name.isdigit():
+                raise ValueError(f"Template fields must be named, got {{{field_name}}}")
+            # Fields the mapping doesn't rename are read from the result as they are
+            self._getters.append((name,) + tuple(fields.get(name, (name, None))))
+            parts.append("{%d%s%s%s}" % (len(self._getters) - 1, field_name[len(name):],
+                                         f"!{conversion}" if conversion else "", f":{spec}" if spec else ""))
+        self._format = "".join(parts).format
+        self.fields = dict(fields)
+
+    def values(self, record: Mapping) -> list:
+        values = []
+        for name, source, default in self._getters:
+            value = record.get(source)
+            if value is None and source != name:
+                # An already mapped record carries the snippet field itself
+                value = record.get(name)
+            values.append(default if value is None or value is False else value)
+        return values
+
+    def render(self, record: Mapping) -> str:
+        return self._format(*self.values(record))
+
+    def format(self, records: Iterable, sep: str = "\n") -> str:
+        """Snippets for search results (dicts, or Data with the result in `.data`), joined by `sep`."""
+        return sep.join([self.render(getattr(record, "data", record)) for record in records])
+
+
+@functools.lru_cache(maxsize=64)
+def get_snippet_formatter(template: str = SNIPPET_TEMPLATE, field_mapping: Optional[str] = None) -> SnippetFormatter:
+    """Formatter compiled once per template and jq field mapping (None: the flow's default mapping)."""
+    fields = parse_field_mapping(field_mapping) if field_mapping and field_mapping.strip() else None
+    return SnippetFormatter(template, fields)
@@ -0,0 +1,320 @@
+"""
+Pre-aggregated post counts and engagement per audience segment, for the app sidebar.
+
+The sidebar filters (tribe, country, platform, age group, gender) define a segment,
+and until now the only way to learn anything about one was to run the whole flow. The
+stats cube holds, for every combination of filter values (each also "all"), the number
+of posts and the total and percentiles of their likes, shares and comments, so the
+sidebar can show the size of a segment as soon as it is selected.
+
+A cube directory (STATS_CUBE_DIR/<collection>) holds two Parquet files:
+
+    posts.parquet   per post: a hash of its _id, its five dimension values and metrics
+    cube.parquet    per non-empty combination of dimension values ("" = all): posts,
+                    and <metric>_total, <metric>_p50, <metric>_p90, <metric>_p99
+
+Ingestion (ingest.py) passes every post it writes to `StatsCube.update`; `save` merges
+them into posts.parquet by id, so a re-ingested post replaces its old values, and
+regenerates cube.parquet from it with numpy, without reading the collection again.
+Percentiles come from log-spaced histograms (STATS_CUBE_BIN_GROWTH apart), so they are
+exact for small counts and within 5% otherwise.
+
+Dimension values outside STATS_CUBE_DIMENSIONS (and missing ones) are counted under
+"other", so they are part of every "all". Seed a cube for an existing collection with
+`python -m custom_components.stats_cube`.
+"""
+import argparse
+import hashlib
+import math
+import os
+import threading
+import time
+from array import array
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+STATS_CUBE_DIR: str = os.getenv(
+    "TRIBE_STATS_CUBE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "tribe", "stats_cube"),
+)
+# The values of the sidebar filters (settings.py), as stored in post metadata
+STATS_CUBE_DIMENSIONS: dict[str, tuple[str, ...]] = {
+    "tribe": ("0", "1", "2", "3", "4", "5", "6", "7"),
+    "country": ("GB", "US", "CN", "IN", "DE"),
+    "platform": ("TikTok", "Facebook", "YouTube", "Twitter"),
+    "age": ("<=18", "19_29", "30_39", "40+"),
+    "gender": ("male", "female"),
+}
+STATS_CUBE_METRICS: tuple[str, ...] = ("likes", "shares", "comments")
+STATS_CUBE_PERCENTILES: tuple[int, ...] = (50, 90, 99)
+STATS_CUBE_BIN_GROWTH: float = 1.05
+# Staged posts merged into posts.parquet at once; bounds the memory an ingestion run holds
+STATS_CUBE_FLUSH_POSTS: int = 250_000
+
+ALL = ""
+OTHER = "other"
+
+# Histogram bin of a value v >= 0 is floor(log(1 + v) / log(growth)); a billion likes is plenty
+_BINS = int(math.log1p(1e9) / math.log(STATS_CUBE_BIN_GROWTH)) + 1
+# Smallest integer in each bin: the value reported for a percentile that falls in it
+_BIN_FLOOR = np.ceil(np.power(STATS_CUBE_BIN_GROWTH, np.arange(_BINS)) - 1 - 1e-9).astype(np.int64)
+
+_POSTS_SCHEMA = pa.schema(
+    [("id", pa.uint64())]
+    + [(dimension, pa.string()) for dimension in STATS_CUBE_DIMENSIONS]
+    + [(metric, pa.float64()) for metric in STATS_CUBE_METRICS]
+)
+
+
+def stats_cube_path(collection_name: str) -> str:
+    return os.path.join(STATS_CUBE_DIR, collection_name)
+
+
+def dimension_value(value) -> Optional[str]:
+    """A metadata or sidebar value as stored in the cube: tribe 3 and 3.0 are "3"; None and "" are missing."""
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _metric_value(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) if value >= 0 else math.nan
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return math.nan
+        return number if number >= 0 else math.nan
+    return math.nan
+
+
+def _id_hash(doc_id) -> int:
+    return int.from_bytes(hashlib.blake2b(str(doc_id).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _write_atomic(table: pa.Table, path: str):
+    temporary = path + ".tmp"
+    pq.write_table(table, temporary)
+    os.replace(temporary, path)
+
+
+def histogram_bins(values: np.ndarray) -> np.ndarray:
+    """Histogram bin of each (non-negative, finite) value."""
+    bins = np.floor(np.log1p(values) / math.log(STATS_CUBE_BIN_GROWTH)).astype(np.int64)
+    # log1p can land a hair under an exact bin edge; the floors are the source of truth
+    bins -= _BIN_FLOOR[np.minimum(bins, _BINS - 1)] > values
+    return np.clip(bins, 0, _BINS - 1)
+
+
+class StatsCube:
+    """The posts table of one cube directory, with the posts staged by ingestion since the last save."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._clear_staged()
+
+    def _clear_staged(self):
+        self._ids = array("Q")
+        self._dimensions: dict[str, list] = {dimension: [] for dimension in STATS_CUBE_DIMENSIONS}
+        self._metrics: dict[str, array] = {metric: array("d") for metric in STATS_CUBE_METRICS}
+
+    @property
+    def staged(self) -> int:
+        return len(self._ids)
+
+    def update(self, documents: Iterable[dict]):
+        """Stage Data API documents (`_id` and `metadata`) to be counted, replacing any earlier values."""
+        with self._lock:
+            for doc in documents:
+                metadata = doc.get("metadata") or {}
+                self._ids.append(_id_hash(doc["_id"]))
+                for dimension, values in self._dimensions.items():
+                    values.append(dimension_value(metadata.get(dimension)))
+                for metric, values in self._metrics.items():
+                    values.append(_metric_value(metadata.get(metric)))
+            flush = len(self._ids) >= STATS_CUBE_FLUSH_POSTS
+        if flush:
+            self.save()
+
+    def _take_staged(self) -> pa.Table:
+        with self._lock:
+            columns = [pa.array(np.frombuffer(self._ids, dtype=np.uint64) if self._ids else [], type=pa.uint64())]
+            columns += [pa.array(self._dimensions[dimension], type=pa.string()) for dimension in STATS_CUBE_DIMENSIONS]
+            columns += [pa.array(np.frombuffer(self._metrics[metric], dtype=np.float64) if self._ids else [],
+                                 type=pa.float64(), from_pandas=True) for metric in STATS_CUBE_METRICS]
+            self._clear_staged()
+        staged = pa.Table.from_arrays(columns, schema=_POSTS_SCHEMA)
+        if staged.num_rows == 0:
+            return staged
+        # The last staged values of a post win
+        _, last = np.unique(staged.column("id").to_numpy()[::-1], return_index=True)
+        return staged.take(pa.array(np.sort(staged.num_rows - 1 - last)))
+
+    def posts(self) -> pa.Table:
+        posts_path = os.path.join(self.path, "posts.parquet")
+        if not os.path.exists(posts_path):
+            return _POSTS_SCHEMA.empty_table()
+        return pq.read_table(posts_path, schema=_POSTS_SCHEMA)
+
+    def save(self) -> pa.Table:
+        """Merge the staged posts into posts.parquet and regenerate cube.parquet; returns the cube."""
+        with self._save_lock:
+            os.makedirs(self.path, exist_ok=True)
+            staged = self._take_staged()
+            posts = self.posts()
+            if staged.num_rows:
+                posts = pa.concat_tables([posts.filter(pc.invert(pc.is_in(posts.column("id"),
+                                                                         value_set=staged.column("id")))), staged])
+                _write_atomic(posts, os.path.join(self.path, "posts.parquet"))
+            cube = build_cube(posts)
+            _write_atomic(cube, os.path.join(self.path, "cube.parquet"))
+            return cube
+
+
+def build_cube(posts: pa.Table) -> pa.Table:
+    """The cube of a posts table: every non-empty combination of dimension values and "all"."""
+    labels = [list(values) + [OTHER, ALL] for values in STATS_CUBE_DIMENSIONS.values()]
+    base_shape = tuple(len(values) - 1 for values in labels)  # without "all"
+    cells = np.zeros(posts.num_rows, dtype=np.int64)
+    for dimension, values in STATS_CUBE_DIMENSIONS.items():
+        codes = pc.index_in(posts.column(dimension), value_set=pa.array(values, type=pa.string()))
+        codes = pc.fill_null(codes, len(values)).to_numpy(zero_copy_only=False).astype(np.int64)
+        cells = cells * (len(values) + 1) + codes
+
+    size = math.prod(base_shape)
+    counts = _roll_up(np.bincount(cells, minlength=size).reshape(base_shape))
+    columns = {}
+    for dimension, values, index in zip(STATS_CUBE_DIMENSIONS, labels, np.indices(counts.shape)):
+        columns[dimension] = np.array(values, dtype=object)[index.ravel()]
+    columns["posts"] = counts.ravel()
+    for metric in STATS_CUBE_METRICS:
+        values = posts.column(metric).to_numpy(zero_copy_only=False)
+        known = ~np.isnan(values)
+        metric_cells, values = cells[known], values[known]
+        totals = _roll_up(np.bincount(metric_cells, weights=values, minlength=size).astype(np.float64)
+                          .reshape(base_shape))
+        histograms = _roll_up(np.bincount(metric_cells * _BINS + histogram_bins(values),
+                                          minlength=size * _BINS).reshape(base_shape + (_BINS,)))
+        columns[f"{metric}_total"] = totals.ravel()
+        for percentile, value in zip(STATS_CUBE_PERCENTILES, _percentiles(histograms)):
+            columns[f"{metric}_p{percentile}"] = value.ravel()
+
+    non_empty = columns["posts"] > 0
+    table = pa.table({name: pa.array(column[non_empty], type=pa.string() if column.dtype == object else None)
+                      for name, column in columns.items()})
+    return table.replace_schema_metadata({"built_at": str(time.time()), "posts": str(posts.num_rows)})
+
+
+def _roll_up(values: np.ndarray) -> np.ndarray:
+    """Append the total over each dimension (the "all" value) to the first five axes of `values`."""
+    for axis in range(len(STATS_CUBE_DIMENSIONS)):
+        values = np.concatenate([values, values.sum(axis=axis, keepdims=True)], axis=axis)
+    return values
+
+
+def _percentiles(histograms: np.ndarray) -> list[np.ndarray]:
+    """Nearest-rank percentiles from histograms over the last axis; -1 where a histogram is empty."""
+    cumulative = np.cumsum(histograms, axis=-1)
+    total = cumulative[..., -1]
+    results = []
+    for percentile in STATS_CUBE_PERCENTILES:
+        rank = np.maximum(np.ceil(total * percentile / 100), 1)
+        bins = np.argmax(cumulative >= rank[..., None], axis=-1)
+        results.append(np.where(total > 0, _BIN_FLOOR[bins], -1))
+    return results
+
+
+class SegmentStats(NamedTuple):
+    posts: int
+    totals: dict  # metric -> total
+    percentiles: dict  # metric -> {percentile: value, or None without values}
+
+
+class StatsCubeView:
+    """cube.parquet of one directory as a dict, for lookups while the sidebar renders."""
+
+    def __init__(self, path: str):
+        table = pq.read_table(os.path.join(path, "cube.parquet"))
+        metadata = table.schema.metadata or {}
+        self.built_at = float(metadata.get(b"built_at", 0))
+        self._rows = {}
+        for row in table.to_pylist():
+            key = tuple(row[dimension] for dimension in STATS_CUBE_DIMENSIONS)
+            self._rows[key] = SegmentStats(
+                row["posts"],
+                {metric: row[f"{metric}_total"] for metric in STATS_CUBE_METRICS},
+                {metric: {percentile: row[f"{metric}_p{percentile}"] if row[f"{metric}_p{percentile}"] >= 0 else None
+                          for percentile in STATS_CUBE_PERCENTILES} for metric in STATS_CUBE_METRICS},
+            )
+
+    def segment(self, **filters) -> SegmentStats:
+        """Stats for sidebar filter values (tribe=3, country="GB", ...; "" or missing for all)."""
+        key = []
+        for dimension, values in STATS_CUBE_DIMENSIONS.items():
+            value = dimension_value(filters.get(dimension))
+            key.append(ALL if value is None else value if value in values else OTHER)
+        stats = self._rows.get(tuple(key))
+        if stats is None:
+            return SegmentStats(0, {metric: 0.0 for metric in STATS_CUBE_METRICS},
+                                {metric: {percentile: None for percentile in STATS_CUBE_PERCENTILES}
+                                 for metric in STATS_CUBE_METRICS})
+        return stats
+
+
+_views: dict = {}
+_views_lock = threading.Lock()
+
+
+def get_stats_cube(path: str) -> Optional[StatsCubeView]:
+    """Process-wide view of the cube at `path`, reloaded when it is saved again; None if there is none yet."""
+    try:
+        version = os.stat(os.path.join(path, "cube.parquet")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _views_lock:
+        cached = _views.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        view = StatsCubeView(path)
+        _views[path] = (version, view)
+        return view
+
+
+def main():
+    from custom_components.astra_pool import get_collection
+    from custom_components.bulk_fetch import fetch_range
+
+    parser = argparse.ArgumentParser(description="Build the stats cube of an Astra DB collection from scratch.")
+    parser.add_argument("path", nargs="?", help=f"Cube directory (default {STATS_CUBE_DIR}/<collection>)")
+    parser.add_argument("--collection", default="climate_change")
+    parser.add_argument("--api-endpoint", default=os.getenv("ASTRA_DB_API_ENDPOINT"))
+    parser.add_argument("--namespace", default=None)
+    args = parser.parse_args()
+
+    token = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
+    if not token or not args.api_endpoint:
+        parser.error("ASTRA_DB_APPLICATION_TOKEN and --api-endpoint (or ASTRA_DB_API_ENDPOINT) are required")
+    collection = get_collection(token, args.api_endpoint, args.collection, namespace=args.namespace)
+    path = args.path or stats_cube_path(args.collection)
+    posts_path = os.path.join(path, "posts.parquet")
+    if os.path.exists(posts_path):
+        os.remove(posts_path)
+    cube = StatsCube(path)
+    for page in fetch_range(collection, None, batch_size=1000,
+                            projection={"_id": True, "created_at": True, "metadata": True}):
+        cube.update(page)
+    table = cube.save()
+    print(f"{table.schema.metadata[b'posts'].decode()} posts, {table.num_rows} segments in {path}")
+
+
+if __name__ == "__main__":
+    main()
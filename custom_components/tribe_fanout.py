@@ -0,0 +1,126 @@
+"""
+Per-Tribe Fan-out: which tribes to query, and running one query per tribe in parallel.
+
+An unfiltered search lets the largest tribe crowd out the others in the top-k, so the
+fan-out gives every tribe its own filtered query, capped at a per-tribe quota, and
+merges the results by similarity. The quota is rounded up, so the tribes together can
+return more than k; the merge keeps k, taken round-robin so every tribe is still
+represented.
+
+The tribes come from the search filter when it has a tribe condition: a tribe picked
+in the sidebar (`{"tribe": 3}`) queries that tribe alone, and `{"tribe": {"$in": [...]}}`
+the listed tribes. Only a filter without an equality or $in condition on tribe fans
+out over the configured tribes (all of them by default). Tribes a $ne or $nin
+condition excludes are not queried at all; those conditions, like any on tribe other
+than eq and $in, also stay in the filter each tribe's query sends.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional
+
+# Tribe ids as used in the collection's metadata (see TRIBES in settings.py)
+FANOUT_DEFAULT_TRIBES = range(8)
+TRIBE_FIELD = "tribe"
+
+
+def _conditions(filter_dict: Optional[dict]) -> list:
+    if not filter_dict:
+        return []
+    if "$and" in filter_dict and len(filter_dict) == 1:
+        return list(filter_dict["$and"])
+    return [{key: value} for key, value in filter_dict.items()]
+
+
+def _combine(conditions: list) -> Optional[dict]:
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _excluded_values(condition: Any) -> list:
+    """The values a $ne/$nin condition excludes (none for any other kind of condition)."""
+    if not isinstance(condition, dict):
+        return []
+    excluded = [condition["$ne"]] if "$ne" in condition else []
+    values = condition.get("$nin", [])
+    return excluded + (list(values) if isinstance(values, (list, tuple)) else [values])
+
+
+def _allowed_values(condition: Any) -> Optional[list]:
+    """The values an eq/$eq/$in condition allows, or None for any other kind of condition."""
+    if not isinstance(condition, dict):
+        return [condition]
+    if set(condition) == {"$eq"}:
+        return [condition["$eq"]]
+    if set(condition) == {"$in"}:
+        values = condition["$in"]
+        return list(values) if isinstance(values, (list, tuple)) else [values]
+    return None
+
+
+def fanout_scope(filter_dict: Optional[dict], default_tribes: Iterable = FANOUT_DEFAULT_TRIBES,
+                 field: str = TRIBE_FIELD) -> tuple[list, Optional[dict]]:
+    """
+    The tribes to query and the filter to send with each, from an unprefixed filter.
+
+    Top-level (or top-level $and) eq and $in conditions on `field` choose the tribes,
+    intersected when there are several, in the order the filter lists them; without
+    one, `default_tribes`. Tribes a $ne or $nin condition excludes are not queried.
+    The eq and $in conditions are replaced by each query's own tribe; every other
+    condition is returned as the base filter.
+    """
+    tribes, excluded, rest = None, [], []
+    for condition in _conditions(filter_dict):
+        on_field = isinstance(condition, dict) and list(condition) == [field]
+        allowed = _allowed_values(condition[field]) if on_field else None
+        if allowed is None:
+            rest.append(condition)
+            if on_field:
+                excluded += _excluded_values(condition[field])
+        else:
+            tribes = allowed if tribes is None else [tribe for tribe in tribes if tribe in allowed]
+    if tribes is None:
+        tribes = default_tribes
+    return [tribe for tribe in dict.fromkeys(tribes) if tribe not in excluded], _combine(rest)
+
+
+def tribe_filter(base_filter: Optional[dict], tribe, field: str = TRIBE_FIELD) -> dict:
+    """`base_filter` narrowed to one tribe."""
+    return {"$and": [base_filter, {field: tribe}]} if base_filter else {field: tribe}
+
+
+def fanout_quota(k: int, tribes: int, per_tribe_quota: int = 0) -> int:
+    """Results to ask each tribe for: `per_tribe_quota` if set, else k split evenly (rounded up)."""
+    return per_tribe_quota or max(1, -(-k // max(1, tribes)))
+
+
+def fanout(search_tribe: Callable[[Any], list[tuple[Any, float]]], tribes: list,
+           max_workers: Optional[int] = None) -> list[list[tuple[Any, float]]]:
+    """
+    `search_tribe(tribe)` for every tribe on a bounded thread pool, results in tribe order.
+
+    Each search returns (hit, similarity) pairs; with enough workers, wall-clock time
+    tracks the slowest tribe, not the sum.
+    """
+    if not tribes:
+        return []
+    workers = max(1, min(max_workers or len(tribes), len(tribes)))
+    if workers == 1:
+        return [search_tribe(tribe) for tribe in tribes]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tribe-fanout") as executor:
+        return list(executor.map(search_tribe, tribes))
+
+
+def merge_by_similarity(per_tribe: list[list[tuple[Any, float]]],
+                        k: Optional[int] = None) -> list[tuple[Any, float]]:
+    """
+    The tribes' (hit, similarity) pairs, most similar first, at most `k` of them.
+
+    Hits are taken round-robin: every tribe's best hit, then every tribe's second best
+    (each round by similarity), and so on until k are taken, so a cut to k drops the
+    tribes' weakest hits rather than whole tribes. Each tribe's hits must be best first.
+    """
+    rounds = []
+    for rank in range(max(map(len, per_tribe), default=0)):
+        hits = [hits[rank] for hits in per_tribe if rank < len(hits)]
+        rounds.extend(sorted(hits, key=lambda hit: hit[1], reverse=True))
+    return sorted(rounds[:k], key=lambda hit: hit[1], reverse=True)
@@ -0,0 +1,602 @@
+"""
+Run the TRIBE flow in-process from its JSON export, compiled once and kept warm.
+
+`run_flow_from_json` reparses the export, rebuilds the graph and re-instantiates every
+component (embeddings client, Astra store, three LLM clients) on every call. `FlowRunner`
+does the parsing, edge wiring and topological ordering once; per request it only layers
+the tweaks over the compiled parameters and runs the nodes.
+
+Nodes run as soon as everything they depend on has finished, on a shared thread pool,
+so independent branches overlap: the flow's Anthropic and OpenAI analyses both only
+need the prompt, and join at the combine node, so a request takes max(branches)
+rather than their sum. Cheap in-process nodes (inputs, prompts, text joins) skip the
+pool and run inline in the scheduling thread.
+
+Component instances are cached per node and keyed on their `warm_params` (API keys,
+model names, collection...), so they survive across requests and are only rebuilt when
+a tweak actually changes one of those. Node types with a native implementation below
+run without langflow; any other node (custom components such as the Astra store or the
+metadata filter constructor) runs through the component code embedded in the export,
+which needs langflow installed. That path has not yet been run against the real export,
+so main.py and the local app only use the runner when settings.LANGFLOW_LOCAL_RUNNER is
+set, and otherwise call `run_flow_from_json` as before.
+
+Chat history lives in the runner's `MessageStore` rather than Langflow's database:
+ChatInput and ChatOutput save their message under the run's session id (when
+`should_store_message` is set, as Langflow's do) and the Memory node reads it back, so
+the prompt's history carries over between calls to `run` with the same session. The
+store is in-process, so history starts empty again when the process restarts.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from custom_components.context_packing import (
+    CONTEXT_ENGAGEMENT_WEIGHT,
+    CONTEXT_MAX_SNIPPET_TOKENS,
+    CONTEXT_TOKEN_BUDGET,
+    pack_context,
+)
+from custom_components.result_projection import SNIPPET_TEMPLATE
+from custom_components.snippets import get_snippet_formatter
+from tweaks import canonical_json
+
+# Component instances kept warm per runner; one per node unless tweaks vary a warm param
+MAX_WARM_INSTANCES: int = 64
+# Threads for running independent nodes concurrently; 1 runs nodes one at a time in order
+FLOW_MAX_WORKERS: int = 4
+# Chat messages kept per session; the oldest are dropped first
+MAX_STORED_MESSAGES: int = 1000
+# Session used when `run` is not given one, for exports without an id
+DEFAULT_SESSION_ID: str = "default"
+
+COMPONENTS: Dict[str, type] = {}
+
+
+class FlowError(Exception):
+    pass
+
+
+def register_component(*type_names: str):
+    """Class decorator: use this class for nodes of the given Langflow component types."""
+    def decorator(cls):
+        for type_name in type_names:
+            COMPONENTS[type_name] = cls
+        return cls
+    return decorator
+
+
+def as_text(value) -> str:
+    """Plain text from a string, a Langflow Message/Data, a LangChain message, or a list of those."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return "\n".join(as_text(item) for item in value)
+    for attr in ("text", "content"):
+        text = getattr(value, attr, None)
+        if isinstance(text, str):
+            return text
+    return str(value)
+
+
+class ChatMessage(NamedTuple):
+    session_id: str
+    sender: str
+    sender_name: str
+    text: str
+    timestamp: float
+
+
+class MessageStore:
+    """Chat messages per session, oldest first; the in-process counterpart of Langflow's message table."""
+
+    def __init__(self, max_messages: int = MAX_STORED_MESSAGES):
+        self.max_messages = max_messages
+        self._sessions: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def add(self, session_id: str, sender: str, sender_name: str, text: str) -> ChatMessage:
+        message = ChatMessage(session_id, sender, sender_name, text, time.time())
+        with self._lock:
+            self._sessions.setdefault(session_id, deque(maxlen=self.max_messages)).append(message)
+        return message
+
+    def get(self, session_id: str, sender: Optional[str] = None, sender_name: Optional[str] = None,
+            limit: Optional[int] = None, order: str = "Ascending") -> list:
+        """Messages of a session, filtered like Langflow's `get_messages`: the first `limit` in `order`."""
+        with self._lock:
+            messages = list(self._sessions.get(session_id, ()))
+        messages = [message for message in messages
+                    if (not sender or message.sender == sender) and (not sender_name or message.sender_name == sender_name)]
+        if order == "Descending":
+            messages.reverse()
+        return messages[:limit] if limit else messages
+
+    def clear(self, session_id: Optional[str] = None):
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+
+class FlowComponent:
+    """
+    Base for natively implemented nodes.
+
+    `__init__` receives only the `warm_params` and does the expensive setup (clients,
+    models); `run` receives the full parameters for this request, inbound edges included.
+    Components that only do cheap in-process work set `blocking = False` to run inline.
+    Components that set `uses_message_store = True` get the runner's `MessageStore` as
+    `self.message_store`.
+    """
+    warm_params: tuple = ()
+    blocking: bool = True
+    uses_message_store: bool = False
+    message_store: Optional[MessageStore] = None
+
+    def __init__(self, **params):
+        self.params = params
+
+    def run(self, **params) -> Any:
+        raise NotImplementedError
+
+
+@register_component("TextInput")
+class InputComponent(FlowComponent):
+    blocking = False
+
+    def run(self, input_value="", **params):
+        return input_value
+
+
+@register_component("TextOutput")
+class OutputComponent(FlowComponent):
+    blocking = False
+
+    def run(self, input_value="", **params):
+        return as_text(input_value)
+
+
+class ChatComponent(FlowComponent):
+    """ChatInput/ChatOutput: pass the text through and save it as a chat message, as Langflow's do."""
+    blocking = False
+    uses_message_store = True
+    default_sender = ""
+    default_sender_name = ""
+
+    def run(self, input_value="", sender="", sender_name="", session_id="", should_store_message=True, **params):
+        text = as_text(input_value)
+        if session_id and should_store_message and self.message_store is not None:
+            self.message_store.add(session_id, sender or self.default_sender,
+                                   sender_name or self.default_sender_name, text)
+        return text
+
+
+@register_component("ChatInput")
+class ChatInputComponent(ChatComponent):
+    default_sender = "User"
+    default_sender_name = "User"
+
+    def run(self, input_value="", **params):
+        # The question is passed on as given; only the stored copy is flattened to text
+        super().run(input_value=input_value, **params)
+        return input_value
+
+
+@register_component("ChatOutput")
+class ChatOutputComponent(ChatComponent):
+    default_sender = "Machine"
+    default_sender_name = "AI"
+
+
+@register_component("Memory")
+class MemoryComponent(FlowComponent):
+    """The chat history saved by the chat nodes, rendered with `template` one message per line."""
+    blocking = False
+    uses_message_store = True
+
+    def run(self, sender="Machine and User", sender_name="", n_messages=100, session_id="", order="Ascending",
+            template="{sender_name}: {text}", **params):
+        if self.message_store is None or not session_id:
+            return ""
+        messages = self.message_store.get(session_id, sender=None if sender == "Machine and User" else sender,
+                                          sender_name=sender_name or None, limit=n_messages, order=order)
+        return "\n".join(template.format_map(message._asdict()) for message in messages)
+
+
+@register_component("Prompt")
+class PromptComponent(FlowComponent):
+    blocking = False
+
+    # Langflow formats prompts as f-string templates: {{ and }} are literal braces
+    _TOKEN = re.compile(r"\{\{|\}\}|\{(\w+)\}")
+
+    def run(self, template="", **variables):
+        def replace(match):
+            if match[1] is None:
+                return match[0][0]
+            return as_text(variables[match[1]]) if match[1] in variables else match[0]
+        return self._TOKEN.sub(replace, template)
+
+
+@register_component("CombineText")
+class CombineTextComponent(FlowComponent):
+    blocking = False
+
+    def run(self, text1="", text2="", delimiter=" ", **params):
+        return delimiter.join([as_text(text1), as_text(text2)])
+
+
+@register_component("ContextPacker")
+class ContextPackerComponent(FlowComponent):
+    blocking = False
+
+    def run(self, data=(), template="{text}", sep="\n", field_mapping="", token_budget=CONTEXT_TOKEN_BUDGET,
+            max_snippet_tokens=CONTEXT_MAX_SNIPPET_TOKENS, engagement_weight=CONTEXT_ENGAGEMENT_WEIGHT, **params):
+        records = [getattr(item, "data", item) for item in (data or [])]
+        return pack_context(records, template=template, sep=sep, field_mapping=field_mapping or None,
+                            token_budget=token_budget, max_snippet_tokens=max_snippet_tokens,
+                            engagement_weight=engagement_weight).text
+
+
+@register_component("SnippetFormatter")
+class SnippetFormatterComponent(FlowComponent):
+    blocking = False
+
+    def run(self, data=(), template=SNIPPET_TEMPLATE, field_mapping="", sep="\n", **params):
+        return get_snippet_formatter(template, field_mapping or None).format(data or (), sep=sep)
+
+
+class ChatModelComponent(FlowComponent):
+    def run(self, input_value="", system_message="", **params):
+        messages = []
+        if system_message:
+            messages.append(("system", as_text(system_message)))
+        messages.append(("human", as_text(input_value)))
+        return self.model.invoke(messages).content
+
+
+@register_component("OpenAIModel")
+class OpenAIModelComponent(ChatModelComponent):
+    warm_params = ("api_key", "model_name", "temperature", "max_tokens", "seed", "json_mode",
+                   "model_kwargs", "openai_api_base")
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        from langchain_openai import ChatOpenAI
+
+        model_kwargs = dict(params.get("model_kwargs") or {})
+        if params.get("json_mode"):
+            model_kwargs["response_format"] = {"type": "json_object"}
+        self.model = ChatOpenAI(
+            api_key=params.get("api_key"),
+            model=params.get("model_name"),
+            temperature=params.get("temperature"),
+            max_tokens=params.get("max_tokens") or None,
+            seed=params.get("seed"),
+            base_url=params.get("openai_api_base") or None,
+            model_kwargs=model_kwargs,
+        )
+
+
+@register_component("AnthropicModel")
+class AnthropicModelComponent(ChatModelComponent):
+    warm_params = ("anthropic_api_key", "model", "temperature", "max_tokens", "anthropic_api_url")
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        from langchain_anthropic import ChatAnthropic
+
+        self.model = ChatAnthropic(
+            api_key=params.get("anthropic_api_key"),
+            model=params.get("model"),
+            temperature=params.get("temperature"),
+            max_tokens=params.get("max_tokens"),
+            base_url=params.get("anthropic_api_url") or None,
+        )
+
+    def run(self, input_value="", system_message="", prefill="", **params):
+        if not prefill:
+            return super().run(input_value=input_value, system_message=system_message)
+        messages = [("system", as_text(system_message))] if system_message else []
+        messages += [("human", as_text(input_value)), ("ai", prefill)]
+        return prefill + self.model.invoke(messages).content
+
+
+@register_component("OpenAIEmbeddings")
+class OpenAIEmbeddingsComponent(FlowComponent):
+    warm_params = ("openai_api_key", "model", "dimensions", "chunk_size", "openai_api_base",
+                   "openai_organization", "max_retries", "request_timeout", "embedding_ctx_length",
+                   "tiktoken_enable", "skip_empty", "show_progress_bar")
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        from langchain_openai import OpenAIEmbeddings
+
+        self.embeddings = OpenAIEmbeddings(
+            api_key=params.get("openai_api_key"),
+            model=params.get("model"),
+            dimensions=params.get("dimensions") or None,
+            chunk_size=params.get("chunk_size") or 1000,
+            base_url=params.get("openai_api_base") or None,
+            organization=params.get("openai_organization") or None,
+            max_retries=params.get("max_retries") or 3,
+            timeout=params.get("request_timeout") or None,
+            embedding_ctx_length=params.get("embedding_ctx_length") or 8191,
+            tiktoken_enabled=params.get("tiktoken_enable", True),
+            skip_empty=params.get("skip_empty") or False,
+            show_progress_bar=params.get("show_progress_bar") or False,
+        )
+
+    def run(self, **params):
+        # The node's output is the embeddings client itself, handed to the vector store
+        return self.embeddings
+
+
+# Warm params for nodes that run through their embedded langflow component code
+LANGFLOW_WARM_PARAMS: Dict[str, tuple] = {
+    "AstraDB": ("token", "api_endpoint", "collection_name", "namespace", "metric"),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_component_class(code: str):
+    from langflow.custom.eval import eval_custom_component_code
+
+    return eval_custom_component_code(code)
+
+
+class LangflowComponent:
+    """A node without a native implementation, run through its embedded langflow component code."""
+
+    def __init__(self, code: str, method: str):
+        self.component = _compile_component_class(code)(_code=code)
+        self.method = method
+        # set_attributes + method call is not re-entrant on a shared instance
+        self._lock = threading.Lock()
+
+    def run(self, **params):
+        with self._lock:
+            self.component.set_attributes(params)
+            result = getattr(self.component, self.method)()
+            if inspect.isawaitable(result):
+                result = asyncio.run(result)
+        return result
+
+
+class CompiledNode:
+    __slots__ = ("id", "type", "params", "secret_fields", "inbound", "dependencies", "dependents", "code", "method")
+
+    def __init__(self, node_id, node_type, params, secret_fields, code, method):
+        self.id = node_id
+        self.type = node_type
+        self.params = params
+        self.secret_fields = secret_fields
+        self.code = code
+        self.method = method
+        self.inbound = []  # (source node id, target field)
+        self.dependencies = frozenset()
+        self.dependents = []
+
+
+def compile_flow(flow: Mapping) -> tuple[Dict[str, CompiledNode], list]:
+    """Nodes (with their inbound edges and dependencies) and a topological order from a Langflow export."""
+    data = flow.get("data", flow)
+    nodes, outputs_by_node = {}, {}
+    for raw in data["nodes"]:
+        node = raw["data"]["node"]
+        template = node.get("template", {})
+        fields = {name: field for name, field in template.items() if isinstance(field, dict)}
+        params = {name: field.get("value") for name, field in fields.items() if name != "code"}
+        secret_fields = frozenset(name for name, field in fields.items()
+                                  if field.get("load_from_db") or field.get("password"))
+        outputs = outputs_by_node[raw["id"]] = node.get("outputs") or [{}]
+        nodes[raw["id"]] = CompiledNode(raw["id"], raw["data"]["type"], params, secret_fields,
+                                        fields.get("code", {}).get("value"), outputs[0].get("method"))
+
+    for edge in data["edges"]:
+        source, target = edge["source"], edge["target"]
+        field = edge["data"]["targetHandle"]["fieldName"]
+        if source not in nodes or target not in nodes:
+            raise FlowError(f"Edge {source} -> {target} references an unknown node")
+        nodes[target].inbound.append((source, field))
+        source_output = edge["data"]["sourceHandle"].get("name")
+        method = next((output.get("method") for output in outputs_by_node[source]
+                       if output.get("name") == source_output), None)
+        if method:
+            nodes[source].method = method
+
+    for node_id, node in nodes.items():
+        node.dependencies = frozenset(source for source, _ in node.inbound)
+        for source in sorted(node.dependencies):
+            nodes[source].dependents.append(node_id)
+
+    # Kahn's algorithm; ties keep export order so runs are deterministic. Chat inputs
+    # go first, as in Langflow, so the memory node's history includes this turn's question
+    remaining = {node_id: len(node.dependencies) for node_id, node in nodes.items()}
+    ready = sorted((node_id for node_id, count in remaining.items() if count == 0),
+                   key=lambda node_id: nodes[node_id].type != "ChatInput")
+    order = []
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for dependent in nodes[node_id].dependents:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+    if len(order) != len(nodes):
+        raise FlowError(f"Flow has a cycle through {sorted(set(nodes) - set(order))}")
+    return nodes, order
+
+
+class FlowRunner:
+    def __init__(self, flow: Mapping, components: Optional[Mapping[str, type]] = None,
+                 fallback_to_env_vars: bool = True, max_warm_instances: int = MAX_WARM_INSTANCES,
+                 max_workers: int = FLOW_MAX_WORKERS, message_store: Optional[MessageStore] = None):
+        self.nodes, self.order = compile_flow(flow)
+        self.session_id = flow.get("id") or DEFAULT_SESSION_ID
+        self.message_store = message_store if message_store is not None else MessageStore()
+        self.components = {**COMPONENTS, **(components or {})}
+        self.fallback_to_env_vars = fallback_to_env_vars
+        self.max_warm_instances = max_warm_instances
+        self.max_workers = max_workers
+        self.roots = [node_id for node_id in self.order if not self.nodes[node_id].dependencies]
+        self.inline = frozenset(node_id for node_id, node in self.nodes.items()
+                                if not getattr(self.components.get(node.type), "blocking", True))
+        self.chat_nodes = frozenset(node_id for node_id, node in self.nodes.items()
+                                    if getattr(self.components.get(node.type), "uses_message_store", False))
+        self._instances: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Shared by all requests; only node bodies run on it, never a scheduler, so it can't deadlock
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="flow") if max_workers > 1 else None
+
+    @classmethod
+    def from_json(cls, path: str, **kwargs) -> "FlowRunner":
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file), **kwargs)
+
+    def _resolve_secrets(self, node: CompiledNode, params: dict) -> dict:
+        # Same convention as run_flow_from_json(fallback_to_env_vars=True): a credential
+        # field holding the name of an environment variable is replaced by its value
+        if not self.fallback_to_env_vars:
+            return params
+        for name in node.secret_fields:
+            value = params.get(name)
+            if isinstance(value, str) and value in os.environ:
+                params[name] = os.environ[value]
+        return params
+
+    def _warm_params(self, node: CompiledNode) -> tuple:
+        component_class = self.components.get(node.type)
+        if component_class is not None:
+            return component_class.warm_params
+        return LANGFLOW_WARM_PARAMS.get(node.type, ())
+
+    def _instance(self, node: CompiledNode, params: dict):
+        warm = {name: params.get(name) for name in self._warm_params(node)}
+        key = (node.id, canonical_json(warm))
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is not None:
+                self._instances.move_to_end(key)
+                return instance
+
+        component_class = self.components.get(node.type)
+        if component_class is not None:
+            instance = component_class(**warm)
+            if instance.uses_message_store:
+                instance.message_store = self.message_store
+        elif node.code and node.method:
+            instance = LangflowComponent(node.code, node.method)
+        else:
+            raise FlowError(f"No implementation for node {node.id} of type {node.type!r}")
+
+        with self._lock:
+            instance = self._instances.setdefault(key, instance)
+            self._instances.move_to_end(key)
+            while len(self._instances) > self.max_warm_instances:
+                self._instances.popitem(last=False)
+        return instance
+
+    def _node_params(self, node: CompiledNode, tweaks: Mapping, results: Mapping) -> dict:
+        params = {**node.params, **tweaks.get(node.id, {})}
+        inbound = {}
+        for source, field in node.inbound:
+            inbound.setdefault(field, []).append(results[source])
+        for field, values in inbound.items():
+            params[field] = values[0] if len(values) == 1 else values
+        return self._resolve_secrets(node, params)
+
+    def run_node(self, node_id: str, tweaks: Mapping, results: Mapping):
+        node = self.nodes[node_id]
+        params = self._node_params(node, tweaks, results)
+        return self._instance(node, params).run(**params)
+
+    def run(self, input_value: Optional[str] = None, tweaks: Optional[Mapping] = None,
+            session_id: Optional[str] = None) -> dict:
+        """
+        Run the flow once; `tweaks` is `{node_id: {param: value}}` as for the run API.
+
+        Chat messages are saved and read back under `session_id` (default: the export's
+        id), except on nodes whose own `session_id` parameter is set.
+
+        Returns `{"text": <chat output>, "outputs": {node_id: value}}`.
+        """
+        tweaks = tweaks or {}
+        session_id = session_id or self.session_id
+        overrides = {}
+        for node_id, node in self.nodes.items():
+            if node_id in self.chat_nodes and not {**node.params, **tweaks.get(node_id, {})}.get("session_id"):
+                overrides.setdefault(node_id, {})["session_id"] = session_id
+            if input_value is not None and node.type == "ChatInput":
+                overrides.setdefault(node_id, {})["input_value"] = input_value
+        tweaks = {**tweaks, **{node_id: {**tweaks.get(node_id, {}), **params}
+                               for node_id, params in overrides.items()}}
+
+        if self._executor is None:
+            results = {}
+            for node_id in self.order:
+                results[node_id] = self.run_node(node_id, tweaks, results)
+        else:
+            results = self._run_concurrently(tweaks)
+
+        chat_outputs = [node_id for node_id in self.order if self.nodes[node_id].type == "ChatOutput"]
+        text = as_text(results[chat_outputs[-1]]) if chat_outputs else ""
+        return {"text": text, "outputs": results}
+
+    def _run_concurrently(self, tweaks: Mapping) -> dict:
+        """Run each node once all its dependencies are done; blocking nodes go to the pool."""
+        results = {}
+        remaining = {node_id: len(node.dependencies) for node_id, node in self.nodes.items()}
+        ready = list(self.roots)
+        pending = {}
+        try:
+            while ready or pending:
+                while ready:
+                    node_id = ready.pop(0)
+                    if node_id in self.inline:
+                        results[node_id] = self.run_node(node_id, tweaks, results)
+                        ready.extend(self._release(node_id, remaining))
+                    else:
+                        pending[self._executor.submit(self.run_node, node_id, tweaks, dict(results))] = node_id
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node_id = pending.pop(future)
+                    results[node_id] = future.result()
+                    ready.extend(self._release(node_id, remaining))
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        return {node_id: results[node_id] for node_id in self.order}
+
+    def _release(self, node_id: str, remaining: dict) -> list:
+        released = []
+        for dependent in self.nodes[node_id].dependents:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                released.append(dependent)
+        return released
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@functools.lru_cache(maxsize=None)
+def get_flow_runner(path: str) -> FlowRunner:
+    """One compiled, warm runner per flow export per process."""
+    return FlowRunner.from_json(path)
@@ -0,0 +1,157 @@
+"""
+Helpers for talking to the Langflow run API from the Streamlit app.
+
+Kept out of app.py so they can be imported (and benchmarked) without starting Streamlit.
+"""
+import json
+from typing import Iterable, Iterator, Mapping, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+BASE_API_URL = "https://api.langflow.astra.datastax.com"
+
+# Connection pool for the run API. Streamlit serves every browser session from one
+# process, so this bounds the number of concurrent keep-alive connections we hold open.
+HTTP_POOL_CONNECTIONS: int = 4
+HTTP_POOL_MAXSIZE: int = 16
+
+# Only failures where the flow never ran are retried: connection errors, rate limiting
+# (429) and unavailable (503) responses. Read timeouts are not, since the flow (and its
+# LLM calls) may already be running server-side; nor is a POST answered with 502 or 504,
+# which a gateway can send after Langflow has started the flow. GETs, which don't run
+# anything, are also retried on those.
+HTTP_RETRY_TOTAL: int = 3
+HTTP_RETRY_BACKOFF_S: float = 0.5
+HTTP_RETRY_BACKOFF_MAX_S: float = 8.0
+HTTP_RETRY_JITTER_S: float = 0.5
+HTTP_RETRY_STATUSES = (429, 502, 503, 504)
+HTTP_RETRY_POST_STATUSES = (429, 503)
+
+
+class LangflowStreamError(Exception):
+    pass
+
+
+class RunApiRetry(Retry):
+    """`Retry` that retries a POST only on the statuses in `HTTP_RETRY_POST_STATUSES`."""
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method and method.upper() == "POST" and status_code not in HTTP_RETRY_POST_STATUSES:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def build_session(pool_connections: int = HTTP_POOL_CONNECTIONS,
+                  pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                  retry_total: int = HTTP_RETRY_TOTAL) -> requests.Session:
+    """
+    A keep-alive `requests.Session` for the run API with jittered exponential retry.
+
+    Reusing it across turns skips the TCP and TLS handshake to the Langflow host on
+    every message; cache it once per process (see `get_http_session` in app.py).
+    """
+    retry = RunApiRetry(
+        total=retry_total,
+        connect=retry_total,
+        read=0,
+        status=retry_total,
+        other=0,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        # The run endpoint is a POST; RunApiRetry narrows its statuses to those meaning it
+        # was never executed. Connection errors are retried whatever the method.
+        allowed_methods=frozenset({"GET", "POST"}),
+        backoff_factor=HTTP_RETRY_BACKOFF_S,
+        backoff_max=HTTP_RETRY_BACKOFF_MAX_S,
+        backoff_jitter=HTTP_RETRY_JITTER_S,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def run_url(config: dict, base_api_url: str = BASE_API_URL) -> str:
+    return f"{base_api_url}/lf/{config['langflow_id']}/api/v1/run/{config['flow_id']}"
+
+
+def build_payload(message: str, tweaks: Mapping, output_type: str = "chat", input_type: str = "chat") -> dict:
+    # Tweaks may be a read-only tweaks.Tweaks; the payload needs plain dicts for JSON
+    tweaks = {node_id: dict(params) for node_id, params in tweaks.items()}
+    return {
+        "inputs": {
+            "ChatInput-nM66I": {
+                "input_value": message
+            }
+        },
+        "output_type": output_type,
+        "input_type": input_type,
+        "tweaks": tweaks
+    }
+
+
+def iter_events(lines: Iterable[Union[str, bytes]]) -> Iterator[dict]:
+    """
+    Parse the run endpoint's event stream as it arrives.
+
+    Langflow sends one JSON object per event separated by blank lines
+    (`{"event": "token", "data": {"chunk": ...}}`); SSE-style framing
+    (`event:` / `data:` lines, `:` keep-alive comments) is accepted as well.
+    """
+    buffer = ""
+    sse_event = None
+    for raw_line in lines:
+        line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("event:"):
+            sse_event = line[len("event:"):].strip()
+            continue
+        if line.startswith("data:"):
+            line = line[len("data:"):].strip()
+
+        buffer = f"{buffer}\n{line}" if buffer else line
+        try:
+            event = json.loads(buffer)
+        except json.JSONDecodeError:
+            # Event split across several lines - keep reading
+            continue
+        buffer = ""
+        if isinstance(event, dict):
+            if sse_event and "event" not in event:
+                event = {"event": sse_event, "data": event}
+            yield event
+        sse_event = None
+
+
+class FlowStream:
+    """
+    Iterable of token chunks from a streaming run response, suitable for `st.write_stream`.
+
+    Once exhausted, `result` holds the run result from the `end` event (the same
+    structure the blocking endpoint returns).
+    """
+
+    def __init__(self, lines: Iterable[Union[str, bytes]]):
+        self._lines = lines
+        self.result: Optional[dict] = None
+
+    def __iter__(self) -> Iterator[str]:
+        for event in iter_events(self._lines):
+            name = event.get("event")
+            data = event.get("data") or {}
+            if name == "token":
+                chunk = data.get("chunk")
+                if chunk:
+                    yield chunk
+            elif name == "end":
+                self.result = data.get("result", data)
+            elif name == "error":
+                raise LangflowStreamError(data.get("error") or data.get("text") or str(data))
@@ -1,6 +1,8 @@
+from dotenv import load_dotenv
 from langflow.load import run_flow_from_json
 
-from settings import LANGFLOW_JSON_FILE
+from flow_runner import get_flow_runner
+from settings import LANGFLOW_JSON_FILE, LANGFLOW_LOCAL_RUNNER
 
 TWEAKS = {
   "ChatInput-nM66I": {
@@ -66,7 +68,7 @@ TWEAKS = {
     "input_value": ""
   },
   "ParseJSONData-eeEA0": {
-    "query": ".[] | {   text,   likes_count: (.likes // \"0\"),   comments_count: (.comments // \"0\"),   shares_count: (.shares // \"0\"),   create_time: (.create_time // \"Not specified\"),   user_age_group_years: (.age // \"Not specified\"),   user_gender: (.gender // \"Not Specified\"),   user_country: (.country // \"Unknown\"),   user_follower_count: (.follower_count // \"Not specified\"),   platform: .platform }"
+    "query": ".[] | {   text,   likes_count: (.likes // \"0\"),   comments_count: (.comments // \"0\"),   shares_count: (.shares // \"0\"),   create_time: (.create_time // \"Not specified\"),   user_age_group_years: (.age // \"Not specified\"),   user_gender: (.gender // \"Not Specified\"),   user_country: (.country // \"Unknown\"),   user_follower_count: (.follower_count // \"Not specified\"),   platform: .platform,   similarity: .similarity }"
   },
   "TextInput-n0QkP": {
     "input_value": "0"
@@ -187,14 +189,19 @@ TWEAKS = {
 
 if __name__ == '__main__':
   try:
-    result = run_flow_from_json(
-      input_value="Based on the UN's guide to communicating on climate change, how might the Activist tribe react to messaging that gears towards:\n\n1. Use authoritative scientific information\n2. Convey the problem and the solutions\n3. Mobilize action\n\nPlease based your answer on the social media snippets provided in the context, which represent posts and comments from the Activists tribe",
-      flow=LANGFLOW_JSON_FILE,
-      # session_id="",
-      fallback_to_env_vars=True,
-      env_file=".env",
-      tweaks=TWEAKS
-    )
+    question = "Based on the UN's guide to communicating on climate change, how might the Activist tribe react to messaging that gears towards:\n\n1. Use authoritative scientific information\n2. Convey the problem and the solutions\n3. Mobilize action\n\nPlease based your answer on the social media snippets provided in the context, which represent posts and comments from the Activists tribe"
+    if LANGFLOW_LOCAL_RUNNER:
+      load_dotenv(".env")
+      result = get_flow_runner(LANGFLOW_JSON_FILE).run(input_value=question, tweaks=TWEAKS)
+    else:
+      result = run_flow_from_json(
+        input_value=question,
+        flow=LANGFLOW_JSON_FILE,
+        # session_id="",
+        fallback_to_env_vars=True,
+        env_file=".env",
+        tweaks=TWEAKS
+      )
     print("Flow executed successfully:", result)
   except Exception as e:
     print(f"Error executing flow: {str(e)}")
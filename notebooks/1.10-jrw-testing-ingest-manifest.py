@@ -0,0 +1,113 @@
+"""
+Ingestion manifest: re-ingesting an export only embeds and writes what changed.
+
+100k synthetic posts are ingested three times through `ingest` with a fresh manifest:
+the original export, the same export again, then an export with 1% of texts edited,
+2% of posts with new like counts and 1,000 new posts. The stub embedding model counts
+the texts it embeds (40 ms per call); the Data API stub keeps documents by id and
+rejects duplicate inserts like Astra does.
+"""
+import json
+import os
+import random
+import tempfile
+import time
+
+from custom_components import astra_pool
+from custom_components.ingest import ingest, read_export
+from custom_components.ingest_manifest import IngestManifest
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, synthetic_posts
+
+COUNT = 100_000
+EMBED_LATENCY_S = 0.04
+
+
+class KeyedStub(DataAPIStub):
+    """Documents by _id, with duplicate-id errors, replace and $set updates."""
+
+    def __init__(self):
+        super().__init__()
+        self.by_id = {}
+
+    def handle(self, path, payload):
+        command, body = next(iter(payload.items()))
+        with self._lock:
+            if command == "insertMany":
+                inserted, errors = [], []
+                for doc in body["documents"]:
+                    if doc["_id"] in self.by_id:
+                        errors.append({"message": f"Document already exists with the given _id: {doc['_id']}",
+                                       "errorCode": "DOCUMENT_ALREADY_EXISTS"})
+                    else:
+                        self.by_id[doc["_id"]] = doc
+                        inserted.append(doc["_id"])
+                response = {"status": {"insertedIds": inserted}}
+                if errors:
+                    response["errors"] = errors
+                return response
+            if command == "findOneAndReplace":
+                doc_id = body["filter"]["_id"]
+                before = self.by_id.get(doc_id)
+                self.by_id[doc_id] = {**body["replacement"], "_id": doc_id}
+                return {"data": {"document": before}, "status": {"matchedCount": int(before is not None),
+                                                                 "modifiedCount": int(before is not None)}}
+            if command == "updateOne":
+                doc = self.by_id.get(body["filter"]["_id"])
+                if doc is not None:
+                    doc.update(body["update"]["$set"])
+                return {"status": {"matchedCount": int(doc is not None), "modifiedCount": int(doc is not None)}}
+        return super().handle(path, payload)
+
+
+class CountingEmbeddings:
+    model = "stub-embedding"
+
+    def __init__(self):
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        time.sleep(EMBED_LATENCY_S)
+        self.texts += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def write_export(path, records):
+    with open(path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+
+
+rng = random.Random(9)
+records = [{"id": post["_id"], "text": post["$vectorize"] + f" ({rng.random():.12f})", "created_at": post["created_at"],
+            **post["metadata"]} for post in synthetic_posts(COUNT + 1000, dim=1)]
+original, extra = records[:COUNT], records[COUNT:]
+
+edited = [dict(record) for record in original]
+for record in rng.sample(edited, COUNT // 100):
+    record["text"] += " (edited)"
+for record in rng.sample(edited, COUNT // 50):
+    record["likes"] += 1
+edited += extra
+
+directory = tempfile.mkdtemp()
+write_export(os.path.join(directory, "original.jsonl"), original)
+write_export(os.path.join(directory, "edited.jsonl"), edited)
+manifest = IngestManifest(os.path.join(directory, "manifest.sqlite"))
+
+with KeyedStub() as stub:
+    collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE,
+                                           environment="other")
+    for name, export in (("first ingest", "original"), ("same export again", "original"), ("edited export", "edited")):
+        embeddings = CountingEmbeddings()
+        stub.reset_counters()
+        report = ingest(read_export(os.path.join(directory, f"{export}.jsonl")), collection, embeddings,
+                        id_field="id", manifest=manifest)
+        print(f"{name:18s} {report.seconds:5.1f} s  embedded={report.embedded:6d} inserted={report.inserted:6d} "
+              f"updated={report.updated:5d} skipped={report.skipped:6d}  texts sent to the model={embeddings.texts:6d} "
+              f"Data API requests={stub.requests}")
+
+    assert len(stub.by_id) == COUNT + len(extra)
+    stored = {doc_id: doc for doc_id, doc in stub.by_id.items()}
+    assert all(stored[record["id"]]["content"] == record["text"] and
+               stored[record["id"]]["metadata"]["likes"] == record["likes"] for record in edited)
+    print(f"collection matches the edited export ({len(stored)} documents)")
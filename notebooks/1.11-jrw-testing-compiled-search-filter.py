@@ -0,0 +1,148 @@
+"""
+Compiled search filters (custom_components/search_filter.py) against the filter building
+`_build_search_args` and `_prepend_metadata_to_fields` did on every search.
+
+Equivalence: for 2,000 random condition lists over the constructor's fields (several
+conditions on the same field, mixed value types, unknown operators, invalid entries),
+the compiled Astra filter matches exactly the same of 1,000 random documents as the
+old builder's, using the Data API stub's filter semantics. `in`/`nin`/`exists`, which
+the old builder turned into equality, are checked against their expansion into eq/neq.
+
+Microbenchmark: per-search cost of building the filter, old builder vs compiled.
+"""
+import json
+import random
+import timeit
+
+from loguru import logger
+
+from custom_components.search_filter import compile_search_filter
+from notebooks.data_api_stub import matches
+
+FIELDS = {
+    "tribe": lambda rng: rng.randint(0, 7),
+    "likes": lambda rng: rng.choice([rng.randint(0, 5000), rng.random() * 5000]),
+    "country_code": lambda rng: rng.choice(["GB", "US", "CN", "IN", "DE"]),
+    "platform_name": lambda rng: rng.choice(["TikTok", "Facebook", "YouTube", "Twitter"]),
+}
+OLD_OPERATORS = ["eq", "neq", "gt", "gte", "lt", "lte"]
+
+
+def old_build_filter(search_filter):
+    """`_build_search_args` before compilation (filter part only)."""
+    filter_dict = None
+    if search_filter:
+        try:
+            filter_list = json.loads(search_filter)
+            if isinstance(filter_list, list):
+                filter_conditions = []
+                operator_map = {"eq": None, "neq": "$ne", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte"}
+                for item in filter_list:
+                    if isinstance(item, dict):
+                        field = item.get('field')
+                        operator = item.get('operator')
+                        value = item.get('value')
+                        if field and operator and value is not None:
+                            mapped_operator = operator_map.get(operator)
+                            if mapped_operator:
+                                condition = {field: {mapped_operator: value}}
+                            else:
+                                condition = {field: value}
+                            filter_conditions.append(condition)
+                if filter_conditions:
+                    filter_dict = filter_conditions[0] if len(filter_conditions) == 1 else {"$and": filter_conditions}
+        except json.JSONDecodeError:
+            pass
+    return filter_dict
+
+
+def old_prepend(filter_dict):
+    """`_prepend_metadata_to_fields` before compilation."""
+    if not isinstance(filter_dict, dict):
+        return filter_dict
+    result = {}
+    for key, value in filter_dict.items():
+        if key.startswith('$'):
+            result[key] = [old_prepend(item) for item in value] if isinstance(value, list) else old_prepend(value)
+        else:
+            result[f"metadata.{key}"] = old_prepend(value)
+    return result
+
+
+def random_value(rng, field):
+    if rng.random() < 0.1:
+        # A value of the wrong type matches nothing in a range comparison
+        return rng.choice(["100", 3, 2.5])
+    return FIELDS[field](rng)
+
+
+def random_document(rng):
+    metadata = {field: make(rng) for field, make in FIELDS.items() if rng.random() < 0.9}
+    return {"_id": str(rng.random()), "metadata": metadata}
+
+
+def random_conditions(rng, operators):
+    conditions = []
+    for _ in range(rng.randint(1, 6)):
+        field = rng.choice(list(FIELDS)[:2]) if rng.random() < 0.6 else rng.choice(list(FIELDS))
+        conditions.append({"field": field, "operator": rng.choice(operators), "value": random_value(rng, field)})
+    if rng.random() < 0.1:
+        conditions.append({"field": "tribe", "operator": "gte"})  # no value: ignored
+    return conditions
+
+
+logger.remove()  # compiling logs every filter it sees
+rng = random.Random(11)
+documents = [random_document(rng) for _ in range(1000)]
+
+
+def matching(filter_dict):
+    return [matches(doc, filter_dict) for doc in documents]
+
+
+for _ in range(2000):
+    search_filter = json.dumps(random_conditions(rng, OLD_OPERATORS + ["between"]))
+    compiled = compile_search_filter(search_filter)
+    assert matching(compiled.astra_filter) == matching(old_prepend(old_build_filter(search_filter))), search_filter
+    assert compiled.astra_filter == old_prepend(compiled.filter)
+print("old vs compiled: same documents matched for 2000 random filters")
+
+reordered = 0
+for _ in range(500):
+    conditions = random_conditions(rng, OLD_OPERATORS)
+    shuffled = rng.sample(conditions, len(conditions))
+    assert compile_search_filter(json.dumps(conditions)) == compile_search_filter(json.dumps(shuffled))
+    reordered += conditions != shuffled
+print(f"reordered condition lists compile to the same filter ({reordered} reorderings)")
+
+for _ in range(1000):
+    field = rng.choice(list(FIELDS))
+    values = [random_value(rng, field) for _ in range(rng.randint(1, 4))]
+    present = rng.random() < 0.5
+    checks = [
+        ("in", values, {"$or": [{field: value} for value in values]}),
+        ("nin", values, {"$and": [{field: {"$ne": value}} for value in values]}),
+        ("exists", present, {field: {"$exists": present}}),
+    ]
+    for operator, value, expected in checks:
+        compiled = compile_search_filter(json.dumps([{"field": field, "operator": operator, "value": value}]))
+        assert matching(compiled.astra_filter) == matching(old_prepend(expected)), (operator, value)
+print("in / nin / exists match their eq / neq expansions")
+
+print(compile_search_filter(json.dumps([{"field": "likes", "operator": "gte", "value": 100},
+                                        {"field": "tribe", "operator": "eq", "value": 3},
+                                        {"field": "likes", "operator": "lte", "value": 5000},
+                                        {"field": "likes", "operator": "gt", "value": 50}])).astra_filter)
+
+search_filter = json.dumps([{"field": "tribe", "operator": "eq", "value": 3},
+                            {"field": "likes", "operator": "gte", "value": 100},
+                            {"field": "likes", "operator": "lte", "value": 5000},
+                            {"field": "country_code", "operator": "neq", "value": "US"}])
+number = 100_000
+old = timeit.timeit(lambda: old_prepend(old_build_filter(search_filter)), number=number) / number
+new = timeit.timeit(lambda: compile_search_filter(search_filter).astra_filter, number=number) / number
+compile_search_filter.cache_clear()
+cold = timeit.timeit(lambda: (compile_search_filter.cache_clear(), compile_search_filter(search_filter)),
+                     number=number // 10) / (number // 10)
+print(f"per search: old builder {old * 1e6:.2f} us, compiled (cached) {new * 1e6:.2f} us ({old / new:.0f}x), "
+      f"first compile {cold * 1e6:.2f} us")
@@ -0,0 +1,73 @@
+"""
+Custom Search response size and decode time per 100 documents: `projection={"*": True}`
+(what Custom Search used to request) vs the planned projection for the Parse Data
+template (custom_components/result_projection.py), with and without `$vector` for MMR.
+
+Posts carry 3072-d vectors (text-embedding-3-large). "bytes" is the JSON response of
+the Data API stub for a vector `find` with limit 100; "decode" is parsing that response
+and building one result record per post: a dict shaped like the old `Document` (the
+pydantic model itself would only add to it) vs `SearchHit`. "find" is the same query
+end to end through astrapy, which includes the stub's own similarity computation.
+"""
+import json
+import statistics
+import time
+
+from custom_components import astra_pool
+from custom_components.result_projection import SNIPPET_TEMPLATE, SearchHit, plan_projection
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, synthetic_posts
+
+DIM = 3072
+LIMIT = 100
+REPEATS = 20
+
+posts = list(synthetic_posts(LIMIT * 2, dim=DIM))
+query = posts[0]["$vector"]
+
+
+def old_record(doc):
+    return {"page_content": doc["$vectorize"], "metadata": {**doc["metadata"], "similarity": doc.get("$similarity")}}
+
+
+def best_of(function, repeats=REPEATS):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+cases = [
+    ("*", {"*": True}, old_record),
+    ("planned", plan_projection(SNIPPET_TEMPLATE), SearchHit.from_result),
+    ("planned + $vector (MMR)", plan_projection(SNIPPET_TEMPLATE, include_vector=True), SearchHit.from_result),
+]
+print(f"planned projection: {plan_projection(SNIPPET_TEMPLATE)}\n")
+
+with DataAPIStub(posts) as stub:
+    collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE,
+                                           environment="other")
+    baseline = None
+    for name, projection, decode in cases:
+        body = {"sort": {"$vector": query}, "projection": projection,
+                "options": {"limit": LIMIT, "includeSimilarity": True}}
+        raw = json.dumps(stub.handle("", {"find": body}))
+        records = [decode(doc) for doc in json.loads(raw)["data"]["documents"]]
+        assert len(records) == LIMIT
+
+        decode_s = best_of(lambda: [decode(doc) for doc in json.loads(raw)["data"]["documents"]])
+        find_s = best_of(lambda: list(collection.find({}, sort={"$vector": query}, limit=LIMIT,
+                                                      include_similarity=True, projection=projection)), repeats=5)
+        baseline = baseline or (len(raw), decode_s)
+        print(f"{name:24s} {len(raw) / 1024:8.1f} KiB ({len(raw) / baseline[0]:5.1%})  "
+              f"decode {decode_s * 1000:6.2f} ms ({baseline[1] / decode_s:5.1f}x faster)  find {find_s * 1000:6.1f} ms")
+
+    hit = SearchHit.from_result(json.loads(json.dumps(stub.handle("", {"find": {
+        "sort": {"$vector": query}, "projection": plan_projection(SNIPPET_TEMPLATE),
+        "options": {"limit": 1, "includeSimilarity": True}}})))["data"]["documents"][0])
+    print(f"\n{hit}\nmetadata for Data.from_document: {hit.metadata}")
+    print(SNIPPET_TEMPLATE.format(text=hit.text, user_age_group_years=hit.fields["age"],
+                                  user_gender=hit.fields["gender"], user_country=hit.fields["country"],
+                                  platform=hit.fields["platform"], likes_count=hit.fields["likes"],
+                                  shares_count=hit.fields["shares"], create_time=hit.fields["create_time"]))
@@ -0,0 +1,115 @@
+"""
+Custom Search paging with a score threshold and near-duplicate collapsing: results
+returned, pages (find round trips), rows read and time per search for
+
+- one page: `limit` = k (x the near-duplicate over-fetch), filtered on the client;
+- doubling: what Custom Search did, refetching with twice the limit until k survive
+  or a page comes back short;
+- adaptive: custom_components/adaptive_fetch.py, stopping at the first row under the
+  threshold and sizing the next page from the share of rows that survived.
+
+8,000 posts over 40 topics, 70% of them reposts of an earlier post, against the Data
+API stub with 50 ms per request. Each query is a topic; how many posts pass the
+threshold varies by topic (17 to 66 distinct posts here).
+"""
+import random
+import statistics
+import time
+
+from custom_components import astra_pool
+from custom_components.adaptive_fetch import AdaptiveFetch, read_until_below
+from custom_components.near_duplicates import NEAR_DUPLICATE_OVERFETCH, collapse_near_duplicates
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub
+
+POSTS = 8000
+TOPICS = 40
+DIM = 32
+K = 25
+THRESHOLD = 0.8
+LATENCY_S = 0.05
+MAX_LIMIT = 1000
+
+rng = random.Random(13)
+topics = [[rng.gauss(0, 1) for _ in range(DIM)] for _ in range(TOPICS)]
+WORDS = "climate net zero heatwave flooding protest policy solar wind energy bills farmers carbon tax".split()
+
+posts = []
+for i in range(POSTS):
+    topic = rng.randrange(TOPICS)
+    # Topics differ in how tightly their posts cluster, so some have few posts over the threshold
+    spread = 0.6 + 1.6 * (topic / TOPICS) + rng.random() * 0.6
+    if posts and rng.random() < 0.7:
+        original = rng.choice(posts)
+        text = original["$vectorize"] + " #repost"
+        topic = original["metadata"]["tribe"]
+    else:
+        text = " ".join(rng.choice(WORDS) for _ in range(12)) + f" {i}"
+    posts.append({
+        "_id": f"post-{i:06d}",
+        "$vector": [x + rng.gauss(0, spread) for x in topics[topic]],
+        "$vectorize": text,
+        "metadata": {"tribe": topic, "likes": rng.randint(0, 500), "shares": 0, "comments": 0},
+    })
+
+
+def select(rows, k):
+    kept = collapse_near_duplicates(rows)
+    return [rows[i] for i in kept][:k]
+
+
+def one_page(collection, query):
+    limit = int(K * NEAR_DUPLICATE_OVERFETCH + 0.5)
+    rows = [row for row in collection.find({}, sort={"$vector": query}, limit=limit, include_similarity=True)
+            if row["$similarity"] >= THRESHOLD]
+    return select(rows, K), 1, limit
+
+
+def doubling(collection, query):
+    limit, pages, read = int(K * NEAR_DUPLICATE_OVERFETCH + 0.5), 0, 0
+    while True:
+        fetched = list(collection.find({}, sort={"$vector": query}, limit=limit, include_similarity=True))
+        pages, read = pages + 1, read + len(fetched)
+        rows = [row for row in fetched if row["$similarity"] >= THRESHOLD]
+        hits = select(rows, K)
+        if len(hits) >= K or len(rows) < limit or limit >= MAX_LIMIT:
+            return hits, pages, read
+        limit = min(MAX_LIMIT, limit * 2)
+
+
+def adaptive(collection, query):
+    fetch = AdaptiveFetch(K, int(K * NEAR_DUPLICATE_OVERFETCH + 0.5), MAX_LIMIT)
+    while True:
+        rows, below = read_until_below(
+            collection.find({}, sort={"$vector": query}, limit=fetch.limit, include_similarity=True), THRESHOLD)
+        hits = select(rows, K)
+        if fetch.done(len(rows), below, len(hits)):
+            report = fetch.report
+            return hits, report.pages, report.rows
+
+
+with DataAPIStub(posts, latency_s=LATENCY_S) as stub:
+    collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE,
+                                           environment="other")
+    queries = [topics[topic] for topic in range(0, TOPICS, 2)]
+    qualifying = []
+    for query in queries:
+        rows, _ = read_until_below(collection.find({}, sort={"$vector": query}, limit=MAX_LIMIT,
+                                                   include_similarity=True), THRESHOLD)
+        qualifying.append(len(collapse_near_duplicates(rows)))
+    print(f"{len(queries)} queries, distinct posts over the threshold per query: "
+          f"min {min(qualifying)}, median {statistics.median(qualifying):.0f}, max {max(qualifying)}\n")
+
+    expected = [min(K, count) for count in qualifying]
+    for name, search in (("one page", one_page), ("doubling", doubling), ("adaptive", adaptive)):
+        results, pages, rows, seconds = [], [], [], []
+        for query in queries:
+            start = time.perf_counter()
+            hits, page_count, row_count = search(collection, query)
+            seconds.append(time.perf_counter() - start)
+            results.append(len(hits))
+            pages.append(page_count)
+            rows.append(row_count)
+        short = sum(got < want for got, want in zip(results, expected))
+        print(f"{name:9s} results {statistics.mean(results):5.1f}/{K} ({short:2d} searches short of what's there)  "
+              f"pages {statistics.mean(pages):4.2f} (max {max(pages)})  rows read {statistics.mean(rows):6.1f}  "
+              f"{statistics.mean(seconds) * 1000:6.1f} ms per search")
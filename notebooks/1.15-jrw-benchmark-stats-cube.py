@@ -0,0 +1,176 @@
+"""
+Stats cube: build and update times, size on disk, sidebar lookup time, and the counts,
+totals and percentiles checked against an exact computation over the raw posts.
+
+1. 1,000,000 synthetic posts (metadata from `synthetic_posts`, with 5% of countries and
+   2% of genders outside the sidebar's values or missing) staged and saved: the first
+   build of posts.parquet and cube.parquet.
+2. An ingestion run's worth of changes: 20,000 new posts and 10,000 existing ones with
+   new likes or another tribe, merged into the same cube.
+3. The view the sidebar reads: load time and time per segment lookup. After each save,
+   300 random segments (each filter a value or "all") are checked against numpy on
+   the raw posts: counts and totals exactly, percentiles within a 5% bin.
+4. `ingest` with a stats cube, on 5,000 posts against the Data API stub.
+"""
+import math
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from loguru import logger
+
+from custom_components import astra_pool
+from custom_components.ingest import ingest
+from custom_components.stats_cube import (
+    STATS_CUBE_BIN_GROWTH,
+    STATS_CUBE_DIMENSIONS,
+    STATS_CUBE_METRICS,
+    STATS_CUBE_PERCENTILES,
+    StatsCube,
+    dimension_value,
+    get_stats_cube,
+)
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, synthetic_posts
+
+COUNT = int(os.getenv("COUNT", 1_000_000))
+NEW = 20_000
+CHANGED = 10_000
+SEGMENTS = 300
+CHUNK = 256  # posts per ingestion batch
+
+logger.remove()
+rng = random.Random(25)
+
+
+def documents(count, start=0):
+    for i, post in enumerate(synthetic_posts(count, dim=1, seed=start)):
+        metadata = post["metadata"]
+        if rng.random() < 0.05:
+            metadata["country"] = "FR"
+        if rng.random() < 0.02:
+            del metadata["gender"]
+        yield {"_id": f"post-{start + i:07d}", "metadata": metadata}
+
+
+def stage(cube, docs):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == CHUNK:
+            cube.update(batch)
+            batch = []
+    cube.update(batch)
+
+
+def random_segment():
+    return {dimension: rng.choice(("",) + values) for dimension, values in STATS_CUBE_DIMENSIONS.items()}
+
+
+def check(view, posts):
+    """Compare `SEGMENTS` random segments of the view with the raw posts (id -> metadata)."""
+    columns = {dimension: np.array([dimension_value(metadata.get(dimension)) for metadata in posts.values()],
+                                   dtype=object) for dimension in STATS_CUBE_DIMENSIONS}
+    metrics = {metric: np.array([metadata.get(metric, np.nan) for metadata in posts.values()], dtype=float)
+               for metric in STATS_CUBE_METRICS}
+    worst = 0.0
+    for _ in range(SEGMENTS):
+        segment = random_segment()
+        selected = np.ones(len(posts), dtype=bool)
+        for dimension, value in segment.items():
+            if value:
+                selected &= columns[dimension] == value
+        stats = view.segment(**segment)
+        assert stats.posts == selected.sum(), segment
+        for metric in STATS_CUBE_METRICS:
+            values = metrics[metric][selected]
+            values = values[~np.isnan(values)]
+            assert math.isclose(stats.totals[metric], values.sum(), rel_tol=1e-9), (segment, metric)
+            for percentile in STATS_CUBE_PERCENTILES:
+                got = stats.percentiles[metric][percentile]
+                if not len(values):
+                    assert got is None
+                    continue
+                exact = np.percentile(values, percentile, method="inverted_cdf")
+                assert got <= exact < max(got + 1, (got + 1) * STATS_CUBE_BIN_GROWTH), (segment, metric, got, exact)
+                worst = max(worst, (exact - got) / exact if exact else 0.0)
+    return worst
+
+
+with tempfile.TemporaryDirectory() as directory:
+    cube = StatsCube(os.path.join(directory, "climate_change"))
+    posts = {}
+
+    # 1. First build
+    docs = list(documents(COUNT))
+    posts.update((doc["_id"], doc["metadata"]) for doc in docs)
+    start = time.perf_counter()
+    stage(cube, docs)
+    staged_s = time.perf_counter() - start
+    start = time.perf_counter()
+    table = cube.save()
+    save_s = time.perf_counter() - start
+    sizes = {name: os.path.getsize(os.path.join(cube.path, name)) / 2 ** 20 for name in os.listdir(cube.path)}
+    print(f"1. {COUNT:,} posts: staged in {staged_s:.1f} s ({staged_s / COUNT * 1e6:.1f} us per post, "
+          f"during ingestion), saved in {save_s:.2f} s")
+    print(f"   {table.num_rows:,} segments; posts.parquet {sizes['posts.parquet']:.1f} MiB, "
+          f"cube.parquet {sizes['cube.parquet']:.2f} MiB")
+    print(f"   {SEGMENTS} random segments match the raw posts (percentiles at most "
+          f"{check(get_stats_cube(cube.path), posts):.1%} under the exact value)\n")
+
+    # 2. An ingestion run's changes
+    changes = list(documents(NEW, start=COUNT))
+    for doc_id in rng.sample(sorted(posts), CHANGED):
+        metadata = dict(posts[doc_id])
+        if rng.random() < 0.5:
+            metadata["likes"] = int(rng.expovariate(1 / 400))
+        else:
+            metadata["tribe"] = rng.randrange(8)
+        changes.append({"_id": doc_id, "metadata": metadata})
+    posts.update((doc["_id"], doc["metadata"]) for doc in changes)
+    start = time.perf_counter()
+    stage(cube, changes)
+    table = cube.save()
+    update_s = time.perf_counter() - start
+    print(f"2. {NEW:,} new and {CHANGED:,} changed posts merged and the cube rebuilt in {update_s:.2f} s, "
+          f"without reading the collection")
+
+    # 3. The sidebar's view
+    start = time.perf_counter()
+    view = get_stats_cube(cube.path)
+    load_s = time.perf_counter() - start
+    segments = [random_segment() for _ in range(10_000)]
+    start = time.perf_counter()
+    for segment in segments:
+        view.segment(**segment)
+    lookup_s = (time.perf_counter() - start) / len(segments)
+    start = time.perf_counter()
+    assert get_stats_cube(cube.path) is view
+    cached_s = time.perf_counter() - start
+    print(f"3. view loaded in {load_s * 1000:.0f} ms (then {cached_s * 1e6:.0f} us while unchanged), "
+          f"{lookup_s * 1e6:.1f} us per segment lookup")
+    print(f"   {SEGMENTS} random segments match the raw posts after the update (percentiles at most "
+          f"{check(view, posts):.1%} under the exact value)\n")
+
+    example = view.segment(tribe=3, country="GB")
+    print(f"   e.g. Climate Cynics in the UK: {example.posts:,} posts, likes total {example.totals['likes']:,.0f}, "
+          f"median {example.percentiles['likes'][50]}, p90 {example.percentiles['likes'][90]}, "
+          f"p99 {example.percentiles['likes'][99]}\n")
+
+# 4. Through ingest
+
+records = [{"id": doc["_id"], "text": f"post {doc['_id']} about the climate", **doc["metadata"]}
+           for doc in documents(5000)]
+with tempfile.TemporaryDirectory() as directory, DataAPIStub() as stub:
+    collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE,
+                                           environment="other")
+    cube = StatsCube(os.path.join(directory, COLLECTION))
+    start = time.perf_counter()
+    report = ingest(records, collection, id_field="id", stats_cube=cube)
+    ingest_s = time.perf_counter() - start
+    view = get_stats_cube(cube.path)
+    assert view.segment().posts == report.inserted == len(records)
+    assert check(view, {record["id"]: record for record in records}) < 0.05
+    print(f"4. ingest of {len(records):,} posts with the stats cube: {ingest_s:.2f} s; the cube counts all of them "
+          f"({view.segment(platform='TikTok').posts:,} on TikTok)")
@@ -0,0 +1,142 @@
+"""
+Per-Tribe Fan-out: the tribes the search filter selects are the tribes queried, each
+tribe's quota holds, and the queries overlap.
+
+4,000 posts, half of them in tribe 0 so an unfiltered top-k is mostly tribe 0, against
+the Data API stub with a per-tribe latency (50 ms for tribe 0 up to 190 ms for tribe 7).
+Filters are compiled from the constructor's JSON as the component does, and each
+tribe's query is the component's: the base filter narrowed to the tribe, metadata.-
+prefixed, sorted by vector, `limit` = the quota.
+
+1. Which tribes each filter fans out over, and how many results each tribe returns:
+   a tribe picked in the sidebar (eq), a list ($in), eq and $in together, a list with
+   Fan-out Tribes also set, $nin, no tribe condition, and no tribe condition with
+   Fan-out Tribes set. The merge keeps at most k, with every queried tribe
+   represented (at least k // tribes each), best first.
+2. Wall-clock time of the fan-out against the slowest single tribe query, and the sum.
+"""
+import json
+import random
+import time
+from collections import Counter
+
+from loguru import logger
+
+from custom_components import astra_pool
+from custom_components.search_filter import compile_search_filter, prefix_metadata_fields
+from custom_components.tribe_fanout import (
+    FANOUT_DEFAULT_TRIBES,
+    fanout,
+    fanout_quota,
+    fanout_scope,
+    merge_by_similarity,
+    tribe_filter,
+)
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, random_vector, synthetic_posts
+
+POSTS = 4000
+DIM = 16
+K = 40
+LATENCY_S = {tribe: 0.05 + 0.02 * tribe for tribe in FANOUT_DEFAULT_TRIBES}
+TOLERANCE_S = 0.05
+
+logger.remove()
+rng = random.Random(16)
+posts = list(synthetic_posts(POSTS, dim=DIM, seed=16))
+for post in posts:
+    post["metadata"]["tribe"] = 0 if rng.random() < 0.5 else rng.randrange(1, 8)
+query = random_vector(DIM, rng)
+
+
+def filter_tribe(filter_dict):
+    """The tribe a per-tribe query is narrowed to, if any."""
+    if isinstance(filter_dict, dict):
+        for key, value in filter_dict.items():
+            if key == "metadata.tribe" and not isinstance(value, dict):
+                return value
+            found = filter_tribe(value) if key == "$and" else None
+            if found is not None:
+                return found
+    if isinstance(filter_dict, list):
+        return next((tribe for tribe in map(filter_tribe, filter_dict) if tribe is not None), None)
+    return None
+
+
+class TribeLatencyStub(DataAPIStub):
+    def _find(self, body, single=False):
+        time.sleep(LATENCY_S.get(filter_tribe(body.get("filter")), 0.05))
+        return super()._find(body, single)
+
+
+def constructor_filter(*conditions):
+    return json.dumps([{"field": field, "operator": operator, "value": value} for field, operator, value in conditions])
+
+
+with TribeLatencyStub(posts) as stub:
+    collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE,
+                                           environment="other")
+
+    def search_tribe_for(base_filter, quota):
+        def search_tribe(tribe):
+            rows = collection.find(prefix_metadata_fields(tribe_filter(base_filter, tribe)), sort={"$vector": query},
+                                   limit=quota, include_similarity=True)
+            return [(row, row["$similarity"]) for row in rows]
+        return search_tribe
+
+    def fanout_search(search_filter, fanout_tribes=FANOUT_DEFAULT_TRIBES):
+        tribes, base_filter = fanout_scope(compile_search_filter(search_filter).filter, fanout_tribes)
+        quota = fanout_quota(K, len(tribes))
+        return tribes, quota, fanout(search_tribe_for(base_filter, quota), tribes)
+
+    unfiltered = collection.find({}, sort={"$vector": query}, limit=K, include_similarity=True)
+    print(f"Unfiltered top {K} by tribe: {dict(sorted(Counter(row['metadata']['tribe'] for row in unfiltered).items()))}\n")
+
+    # 1. Which tribes are queried
+    cases = [
+        ("tribe eq 3 (sidebar)", constructor_filter(("tribe", "eq", 3), ("likes", "gte", 10)), None, [3]),
+        ("tribe in [1, 5]", constructor_filter(("tribe", "in", [1, 5])), None, [1, 5]),
+        ("tribe in [1, 5] and eq 5", constructor_filter(("tribe", "in", [1, 5]), ("tribe", "eq", 5)), None, [5]),
+        ("tribe in [1, 5], Fan-out Tribes 0,2", constructor_filter(("tribe", "in", [1, 5])), [0, 2], [1, 5]),
+        ("tribe nin [2]", constructor_filter(("tribe", "nin", [2])), None, [0, 1, 3, 4, 5, 6, 7]),
+        ("country GB, no tribe", constructor_filter(("country", "eq", "GB")), None, list(FANOUT_DEFAULT_TRIBES)),
+        ("no filter, Fan-out Tribes 0,2,4", "", [0, 2, 4], [0, 2, 4]),
+    ]
+    print(f"{'filter':38s} {'tribes':>24s} {'quota':>5s} {'merged':>6s}  results per tribe -> merged")
+    for label, search_filter, fanout_tribes, expected in cases:
+        tribes, quota, per_tribe = fanout_search(search_filter, fanout_tribes or FANOUT_DEFAULT_TRIBES)
+        assert tribes == expected, (label, tribes)
+        counts = Counter(row["metadata"]["tribe"] for hits in per_tribe for row, _ in hits)
+        assert set(counts) <= set(expected), (label, counts)
+        for tribe, hits in zip(tribes, per_tribe):
+            assert len(hits) <= quota, (label, tribe, len(hits))
+            # Every queried tribe has plenty of posts, so each fills its quota
+            assert len(hits) == quota, (label, tribe, len(hits))
+            assert all(row["metadata"]["tribe"] == tribe for row, _ in hits)
+        if "GB" in label:
+            assert all(row["metadata"]["country"] == "GB" for hits in per_tribe for row, _ in hits)
+        merged = merge_by_similarity(per_tribe, K)
+        assert len(merged) == min(K, quota * len(tribes)), (label, len(merged))
+        similarities = [similarity for _, similarity in merged]
+        assert similarities == sorted(similarities, reverse=True), label
+        merged_counts = Counter(row["metadata"]["tribe"] for row, _ in merged)
+        assert all(merged_counts[tribe] >= K // len(tribes) for tribe in tribes), (label, merged_counts)
+        print(f"{label:38s} {str(tribes):>24s} {quota:5d} {len(merged):6d}  {dict(sorted(counts.items()))} -> "
+              f"{dict(sorted(merged_counts.items()))}")
+
+    # 2. Wall clock
+    tribes, base_filter = fanout_scope(None)
+    quota = fanout_quota(K, len(tribes))
+    search_tribe = search_tribe_for(base_filter, quota)
+    fanout(search_tribe, tribes)  # warm up the connection pool
+    singles = {}
+    for tribe in tribes:
+        start = time.perf_counter()
+        search_tribe(tribe)
+        singles[tribe] = time.perf_counter() - start
+    start = time.perf_counter()
+    fanout(search_tribe, tribes)
+    parallel_s = time.perf_counter() - start
+    slowest = max(singles.values())
+    assert parallel_s < slowest + TOLERANCE_S, (parallel_s, slowest)
+    print(f"\nAll 8 tribes: fan-out {parallel_s * 1000:.0f} ms, slowest single tribe {slowest * 1000:.0f} ms, "
+          f"sum of single queries {sum(singles.values()) * 1000:.0f} ms")
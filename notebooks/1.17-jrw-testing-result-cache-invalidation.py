@@ -0,0 +1,101 @@
+"""
+Search result cache: an ingestion that finishes while a search is in flight must not
+leave that search's (pre-ingestion) results cached as fresh.
+
+Each case follows Custom Search: `get` misses, the generation is taken, the search
+runs, `put` stores the results with that generation, and the next identical search
+calls `get` again.
+
+1. No invalidation during the search: the results are stored and the next search hits.
+2. The collection is invalidated mid-search: nothing is stored, the next search misses.
+3. Everything is invalidated mid-search (`invalidate()` with no id), on a collection
+   never invalidated before: same.
+4. Another collection is invalidated mid-search: the results are stored.
+5. Threads: searches that take 20 ms each, with an ingestion invalidating the
+   collection every 30 ms; no search may ever hit results fetched before the latest
+   invalidation.
+"""
+import threading
+import time
+
+from custom_components.result_cache import SearchResultCache
+
+COLLECTION = "https://db.example/default_keyspace/climate_change"
+OTHER = "https://db.example/default_keyspace/other"
+VECTOR = [0.1, -0.2, 0.3]
+
+
+def key(cache, collection=COLLECTION):
+    return cache.make_key(collection, {"metadata.tribe": 3}, VECTOR, 10, 0.7)
+
+
+def search(cache, during=None, collection=COLLECTION):
+    """One cached search; `during` runs between the miss and the put, like an ingestion mid-search."""
+    cache_key = key(cache, collection)
+    hits = cache.get(cache_key)
+    if hits is None:
+        generation = cache.generation(collection)
+        if during:
+            during()
+        hits = ["results fetched before the ingestion"]
+        cache.put(cache_key, hits, generation)
+    return hits
+
+
+cases = [
+    ("no invalidation", None, True),
+    ("collection invalidated mid-search", lambda cache: cache.invalidate(COLLECTION), False),
+    ("everything invalidated mid-search", lambda cache: cache.invalidate(), False),
+    ("other collection invalidated", lambda cache: cache.invalidate(OTHER), True),
+]
+for number, (label, during, stored) in enumerate(cases, 1):
+    cache = SearchResultCache()
+    search(cache, during and (lambda: during(cache)))
+    hit = cache.get(key(cache)) is not None
+    assert hit == stored, label
+    print(f"{number}. {label:36s} next search {'hits' if hit else 'misses'}")
+
+# 5. Concurrent searches and ingestions
+cache = SearchResultCache()
+lock = threading.Lock()
+latest_invalidation = [0.0]
+stale = []
+stop = threading.Event()
+
+
+def searcher():
+    while not stop.is_set():
+        cache_key = key(cache)
+        # Under the ingester's lock, so "latest invalidation" is the one in force for this get
+        with lock:
+            hits = cache.get(cache_key)
+            if hits is not None:
+                (fetched_at,) = hits
+                if fetched_at < latest_invalidation[0]:
+                    stale.append(fetched_at)
+        if hits is not None:
+            continue
+        generation = cache.generation(COLLECTION)
+        fetched_at = time.monotonic()
+        time.sleep(0.02)
+        cache.put(cache_key, [fetched_at], generation)
+
+
+def ingester():
+    while not stop.is_set():
+        time.sleep(0.03)
+        with lock:
+            latest_invalidation[0] = time.monotonic()
+            cache.invalidate(COLLECTION)
+
+
+threads = [threading.Thread(target=searcher) for _ in range(4)] + [threading.Thread(target=ingester)]
+for thread in threads:
+    thread.start()
+time.sleep(2)
+stop.set()
+for thread in threads:
+    thread.join()
+assert not stale, f"{len(stale)} stale hits"
+assert cache.hits, "no search hit the cache"
+print(f"5. 2 s of searches with an invalidation every 30 ms: {cache.hits} hits, {cache.misses} misses, 0 stale")
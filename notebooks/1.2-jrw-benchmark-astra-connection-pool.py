@@ -0,0 +1,78 @@
+"""
+Per-search latency of the Custom Search `find`, before and after the pooled collection registry.
+
+"Before" mirrors the old `collection` property: a new DataAPIClient/Database/Collection
+per search plus the two metadata round trips (`database.info()` and `collection.info()`).
+The stub cannot serve the DevOps API, so those two lookups are emulated with two
+`list_collection_names()` calls, which cost the same single round trip each.
+
+Both sides send their requests through astrapy's class-level `APICommander.client`, as
+the old property did too, so neither opens a connection per search ("new connections"
+is 0 for both). The difference measured is the requests and client objects saved per
+search, not connection setup.
+"""
+import random
+import statistics
+import time
+
+from astrapy import DataAPIClient
+
+from custom_components import astra_pool
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, random_vector, synthetic_posts
+
+N_SEARCHES = 200
+LATENCY_S = 0.005  # fixed per-request latency added by the stub
+DIM = 64
+
+rng = random.Random(1)
+filter_dict = {"$and": [{"metadata.likes": {"$gte": 100}}, {"metadata.tribe": 0}]}
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[min(len(samples) - 1, int(round(0.99 * (len(samples) - 1))))]
+    return p50 * 1000, p99 * 1000
+
+
+def search(collection, query_vector):
+    return list(collection.find(
+        filter_dict,
+        sort={"$vector": query_vector},
+        limit=25,
+        include_similarity=True,
+        projection={"*": True},
+    ))
+
+
+def legacy_search(stub, query_vector):
+    client = DataAPIClient("token", environment="other")
+    database = client.get_database(stub.api_endpoint, keyspace=KEYSPACE)
+    database.list_collection_names()  # stands in for database.info()
+    collection = database.get_collection(COLLECTION)
+    database.list_collection_names()  # stands in for collection.info()
+    return search(collection, query_vector)
+
+
+def pooled_search(stub, query_vector):
+    collection = astra_pool.get_collection(
+        "token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE, environment="other"
+    )
+    return search(collection, query_vector)
+
+
+with DataAPIStub(synthetic_posts(300, dim=DIM), latency_s=LATENCY_S) as stub:
+    for name, fn in [("before (new client objects + info)", legacy_search), ("after (pooled registry)", pooled_search)]:
+        fn(stub, random_vector(DIM, rng))  # warm-up
+        stub.reset_counters()
+        timings = []
+        for _ in range(N_SEARCHES):
+            query_vector = random_vector(DIM, rng)
+            start = time.perf_counter()
+            fn(stub, query_vector)
+            timings.append(time.perf_counter() - start)
+        p50, p99 = percentiles(timings)
+        print(
+            f"{name:36s} p50={p50:7.2f} ms  p99={p99:7.2f} ms  "
+            f"requests/search={stub.requests / N_SEARCHES:.1f}  new connections={stub.connections}"
+        )
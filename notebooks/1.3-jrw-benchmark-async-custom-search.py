@@ -0,0 +1,70 @@
+"""
+Wall-clock time for 1, 8 and 64 simultaneous Custom Search queries, sync vs async.
+
+"sync" runs the searches back to back on one thread, the way the old blocking
+`search_documents` path would on a single worker. "async" runs them on one event loop
+through the pooled `AsyncCollection`, streaming each cursor as
+`asearch_documents` does.
+"""
+import asyncio
+import random
+import time
+
+from custom_components import astra_pool
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, random_vector, synthetic_posts
+
+LATENCY_S = 0.05
+DIM = 32
+SCORE_THRESHOLD = 0.3
+
+rng = random.Random(3)
+
+
+def sync_search(collection, query_vector, tribe):
+    cursor = collection.find(
+        {"metadata.tribe": tribe},
+        sort={"$vector": query_vector},
+        limit=25,
+        include_similarity=True,
+        projection={"*": True},
+    )
+    return [doc for doc in cursor if doc["$similarity"] >= SCORE_THRESHOLD]
+
+
+async def async_search(async_collection, query_vector, tribe):
+    cursor = async_collection.find(
+        {"metadata.tribe": tribe},
+        sort={"$vector": query_vector},
+        limit=25,
+        include_similarity=True,
+        projection={"*": True},
+    )
+    return [doc async for doc in cursor if doc["$similarity"] >= SCORE_THRESHOLD]
+
+
+async def run_async(stub, queries):
+    async_collection = astra_pool.get_async_collection(
+        "token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE, environment="other"
+    )
+    await async_search(async_collection, *queries[0])  # warm the loop's connection pool
+    start = time.perf_counter()
+    await asyncio.gather(*(async_search(async_collection, vector, tribe) for vector, tribe in queries))
+    return time.perf_counter() - start
+
+
+with DataAPIStub(synthetic_posts(200, dim=DIM), latency_s=LATENCY_S) as stub:
+    collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE, environment="other")
+    for concurrency in (1, 8, 64):
+        queries = [(random_vector(DIM, rng), i % 8) for i in range(concurrency)]
+
+        sync_search(collection, *queries[0])
+        start = time.perf_counter()
+        for vector, tribe in queries:
+            sync_search(collection, vector, tribe)
+        sync_elapsed = time.perf_counter() - start
+
+        async_elapsed = asyncio.run(run_async(stub, queries))
+        print(
+            f"concurrency={concurrency:3d}  sync={sync_elapsed * 1000:8.1f} ms  "
+            f"async={async_elapsed * 1000:8.1f} ms  speed-up={sync_elapsed / async_elapsed:5.1f}x"
+        )
@@ -0,0 +1,38 @@
+"""
+Throughput (docs/sec) of bulk candidate fetching for one tribe: sequential keyset
+pagination (`fetch_in_batches`) vs `parallel_search` over disjoint created_at ranges.
+"""
+import time
+
+from custom_components import astra_pool
+from custom_components.bulk_fetch import fetch_in_batches, parallel_search
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, synthetic_posts
+
+LATENCY_S = 0.05
+TOTAL_SIZE = 2000
+BATCH_SIZE = 100
+filter_dict = {"metadata.tribe": 0}
+
+# Keep the stub's own (GIL-bound) filtering cheap so the numbers reflect round trips, not stub CPU
+posts = [{k: v for k, v in post.items() if k != "$vector"} for post in synthetic_posts(TOTAL_SIZE + 500, dim=4)]
+for post in posts:
+    post["metadata"]["tribe"] = 0
+
+with DataAPIStub(posts, latency_s=LATENCY_S, page_size=BATCH_SIZE) as stub:
+    collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE, environment="other")
+
+    stub.reset_counters()
+    start = time.perf_counter()
+    docs = fetch_in_batches(collection, filter_dict, total_size=TOTAL_SIZE, batch_size=BATCH_SIZE)
+    elapsed = time.perf_counter() - start
+    print(f"sequential keyset        {len(docs):5d} docs  {len(docs) / elapsed:8.0f} docs/sec  requests={stub.requests}")
+
+    for partitions in (2, 4, 8):
+        stub.reset_counters()
+        start = time.perf_counter()
+        docs = list(parallel_search(collection, filter_dict, total_size=TOTAL_SIZE, batch_size=BATCH_SIZE,
+                                    partitions=partitions))
+        elapsed = time.perf_counter() - start
+        assert len({doc["_id"] for doc in docs}) == len(docs), "key ranges overlap"
+        print(f"parallel, {partitions} partitions   {len(docs):5d} docs  {len(docs) / elapsed:8.0f} docs/sec  "
+              f"requests={stub.requests}")
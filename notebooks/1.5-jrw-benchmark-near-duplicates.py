@@ -0,0 +1,73 @@
+"""
+Near-duplicate collapsing for Custom Search results: cost per document and quality.
+
+Synthetic top-k: distinct posts plus reposts of some of them (RT prefix, extra
+hashtags and links, changed case/punctuation, one word dropped). Quality counts how
+many planted duplicates were collapsed into their original, and how many distinct
+posts were wrongly merged. Timing covers the whole post-processing step
+(`collapse_near_duplicates`) at the over-fetch sizes used for k=25, 100 and 1000/1.5.
+"""
+import random
+import statistics
+import time
+
+from custom_components.near_duplicates import NEAR_DUPLICATE_MAX_DISTANCE, NEAR_DUPLICATE_OVERFETCH, collapse_near_duplicates
+
+rng = random.Random(11)
+VOCAB = ("climate net zero emissions brands greenwashing heatwave flooding protest policy electric cars "
+         "solar wind energy bills farmers science activists youth future planet carbon tax recycling "
+         "plastic fashion travel flights diet meat vegan oil gas coal jobs economy government london "
+         "summer winter prices petrol insulation homes trains buses cycling beef dairy forests oceans").split()
+
+
+def distinct_post():
+    return " ".join(rng.choice(VOCAB) for _ in range(rng.randint(12, 60)))
+
+
+def repost(text):
+    words = text.split()
+    variant = rng.choice(["rt", "tags", "case", "drop"])
+    if variant == "rt":
+        return "RT @someone: " + text
+    if variant == "tags":
+        return text + " #climate #netzero https://t.co/" + str(rng.randint(0, 10 ** 6))
+    if variant == "case":
+        return text.upper() + "!!!"
+    del words[rng.randrange(len(words))]
+    return " ".join(words)
+
+
+def top_k(n, duplicate_share=0.25):
+    docs, origin = [], []
+    for i in range(n):
+        if docs and rng.random() < duplicate_share:
+            source = rng.randrange(len(docs))
+            docs.append({"$vectorize": repost(docs[source]["$vectorize"]), "metadata": {"likes": rng.randint(0, 500)}})
+            origin.append(origin[source])
+        else:
+            docs.append({"$vectorize": distinct_post(), "metadata": {"likes": rng.randint(0, 500)}})
+            origin.append(i)
+    return docs, origin
+
+
+docs, origin = top_k(2000)
+kept = collapse_near_duplicates(docs)
+kept_origins = [origin[i] for i in kept]
+distinct_posts = len(set(origin))
+planted = len(docs) - distinct_posts
+missed = len(kept_origins) - len(set(kept_origins))
+wrongly_merged = distinct_posts - len(set(kept_origins))
+print(f"quality over {len(docs)} results (max distance {NEAR_DUPLICATE_MAX_DISTANCE} bits): "
+      f"{planted - missed}/{planted} planted duplicates collapsed, {wrongly_merged}/{distinct_posts} distinct posts wrongly merged")
+
+for k in (25, 100, 666):
+    n = int(k * NEAR_DUPLICATE_OVERFETCH + 0.5)
+    timings = []
+    for _ in range(50):
+        sample, _ = top_k(n)
+        start = time.perf_counter()
+        collapse_near_duplicates(sample)
+        timings.append(time.perf_counter() - start)
+    per_doc = statistics.median(timings) / n
+    print(f"k={k:4d} ({n:4d} fetched): median {statistics.median(timings) * 1000:6.2f} ms per search, "
+          f"{per_doc * 1e6:5.1f} µs per document")
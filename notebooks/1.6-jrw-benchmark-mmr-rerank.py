@@ -0,0 +1,65 @@
+"""
+Cost of the client-side MMR rerank in Custom Search at fetch_k = 100, 500 and 1000,
+with 3072-dimensional vectors (text-embedding-3-large) and k = 25 / 100.
+
+"matrix" is turning the `$vector` lists from the JSON response into a float32 matrix;
+"rerank" is `maximal_marginal_relevance` itself. The reference is the textbook version
+(full cosine similarity against every picked result on each step, as LangChain does),
+used to check the picks are identical.
+"""
+import statistics
+import time
+
+import numpy as np
+
+from custom_components.mmr import maximal_marginal_relevance, vector_matrix
+
+DIM = 3072
+REPEATS = 5
+
+
+def reference_mmr(query, candidates, k, lambda_mult):
+    def cosine(a, b):
+        a = a / np.linalg.norm(a, axis=1, keepdims=True)
+        b = b / np.linalg.norm(b, axis=1, keepdims=True)
+        return a @ b.T
+
+    relevance = cosine(candidates, query[None, :])[:, 0]
+    picked = [int(np.argmax(relevance))]
+    while len(picked) < min(k, len(candidates)):
+        redundancy = cosine(candidates, candidates[picked]).max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        picked.append(int(np.argmax(scores)))
+    return picked
+
+
+rng = np.random.default_rng(5)
+# Clustered candidates (a few topics), so diversity actually changes the order
+centres = rng.normal(size=(12, DIM)).astype(np.float32)
+query = centres[0] + rng.normal(scale=0.5, size=DIM).astype(np.float32)
+
+for fetch_k in (100, 500, 1000):
+    vectors = (centres[rng.integers(0, 12, fetch_k)] + rng.normal(scale=0.6, size=(fetch_k, DIM))).astype(np.float32)
+    as_json_lists = [[float(x) for x in row] for row in vectors]  # what the Data API response holds
+
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        vector_matrix(as_json_lists)
+        timings.append(time.perf_counter() - start)
+    matrix_ms = statistics.median(timings) * 1000
+
+    for k in (25, 100):
+        lambda_mult = 0.5
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            picked = maximal_marginal_relevance(query, vectors, k, lambda_mult)
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        expected = reference_mmr(query.astype(np.float64), vectors.astype(np.float64), k, lambda_mult)
+        reference_ms = (time.perf_counter() - start) * 1000
+        assert picked == expected, "MMR picks differ from the reference"
+        print(f"fetch_k={fetch_k:5d} k={k:3d}  matrix={matrix_ms:6.1f} ms  rerank={statistics.median(timings) * 1000:6.2f} ms  "
+              f"(reference {reference_ms:7.1f} ms, same picks)")
@@ -0,0 +1,110 @@
+"""
+Streaming ingestion (custom_components/ingest.py) vs the all-in-memory path of
+`_add_documents_to_vector_store`: docs/sec and peak RSS for 20k and 100k synthetic
+posts, 10% of them reposted word for word (which only the streaming path drops).
+
+Both use the same stub embedding model (40 ms per call, 64-d vectors) and a Data API
+stub that counts inserts without keeping them, so RSS reflects the ingesting side.
+"All in memory" builds every document, embeds every text (in the same batches), then
+inserts everything. Each run is a separate process so peak RSS is its own.
+
+    PYTHONPATH=. python notebooks/1.9-jrw-benchmark-streaming-ingest.py
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from custom_components import astra_pool
+from custom_components.ingest import INGEST_BATCH_SIZE, ingest, read_export, to_document
+from notebooks.data_api_stub import COLLECTION, KEYSPACE, DataAPIStub, synthetic_posts
+
+DIM = 64
+EMBED_LATENCY_S = 0.04
+
+
+class CountingStub(DataAPIStub):
+    def handle(self, path, payload):
+        command, body = next(iter(payload.items()))
+        if command == "insertMany":
+            with self._lock:
+                self.inserted = getattr(self, "inserted", 0) + len(body.get("documents", []))
+            return {"status": {"insertedIds": [d.get("_id") for d in body.get("documents", [])]}}
+        return super().handle(path, payload)
+
+
+class StubEmbeddings:
+    model = "stub-embedding"
+
+    def __init__(self):
+        self.rng = np.random.default_rng(0)
+
+    def embed_documents(self, texts):
+        time.sleep(EMBED_LATENCY_S)
+        return self.rng.normal(size=(len(texts), DIM)).astype(np.float32).tolist()
+
+
+def write_export(path, count):
+    rng = random.Random(5)
+    texts = []
+    with open(path, "w", encoding="utf-8") as file:
+        for post in synthetic_posts(count, dim=1):
+            text = post["$vectorize"] + " " + " ".join(rng.choice("abcdefghij") * rng.randint(1, 8) for _ in range(30))
+            if texts and rng.random() < 0.1:
+                text = rng.choice(texts)
+            texts.append(text)
+            record = {"id": post["_id"], "text": text, "created_at": post["created_at"], **post["metadata"]}
+            file.write(json.dumps(record) + "\n")
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(mode, path):
+    embeddings = StubEmbeddings()
+    with CountingStub(page_size=100) as stub:
+        collection = astra_pool.get_collection("token", stub.api_endpoint, COLLECTION, namespace=KEYSPACE,
+                                               environment="other")
+        baseline = rss_mb()
+        start = time.perf_counter()
+        if mode == "streaming":
+            report = ingest(read_export(path), collection, embeddings, id_field="id")
+            inserted = report.inserted
+        else:
+            docs = [to_document(record, id_field="id") for record in read_export(path)]
+            texts = [doc.pop("text") for doc in docs]
+            vectors = []
+            for i in range(0, len(texts), INGEST_BATCH_SIZE):
+                vectors.extend(embeddings.embed_documents(texts[i:i + INGEST_BATCH_SIZE]))
+            for doc, text, vector in zip(docs, texts, vectors):
+                doc["content"] = text
+                doc["$vector"] = vector
+            inserted = len(collection.insert_many(docs, ordered=False, chunk_size=50, concurrency=4).inserted_ids)
+        elapsed = time.perf_counter() - start
+        return {"inserted": inserted, "seconds": elapsed, "baseline_mb": baseline, "peak_mb": rss_mb(),
+                "stub_inserted": stub.inserted}
+
+
+if len(sys.argv) == 3:
+    print(json.dumps(run(sys.argv[1], sys.argv[2])))
+    sys.exit(0)
+
+directory = tempfile.mkdtemp()
+for count in (20_000, 100_000):
+    path = os.path.join(directory, f"posts-{count}.jsonl")
+    write_export(path, count)
+    print(f"\n{count} posts ({os.path.getsize(path) / 2 ** 20:.0f} MiB export)")
+    for mode in ("streaming", "all in memory"):
+        output = subprocess.run([sys.executable, __file__, mode, path], capture_output=True, text=True,
+                                env={**os.environ, "PYTHONPATH": "."}, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"  {mode:14s} inserted {result['inserted']:6d} ({result['stub_inserted']} received)  "
+              f"{count / result['seconds']:6.0f} docs/sec  peak RSS {result['peak_mb']:6.0f} MB "
+              f"(+{result['peak_mb'] - result['baseline_mb']:.0f} MB over start)")
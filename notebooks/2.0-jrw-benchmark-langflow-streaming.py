@@ -0,0 +1,41 @@
+"""
+Time-to-first-token for the chat: blocking run API call vs `stream=true`.
+
+The fake server waits 1.5 s before its first token (retrieval plus the two analysis
+LLMs) and then emits 300 tokens at 10 ms each, roughly what the gpt-4o-mini merge
+step looks like from the browser.
+"""
+import time
+
+import requests
+
+from langflow_client import FlowStream, build_payload, run_url
+from notebooks.langflow_stub import LangflowStub
+
+CONFIG = {"langflow_id": "local", "flow_id": "tribe"}
+RUNS = 3
+
+with LangflowStub(pre_token_delay_s=1.5, n_tokens=300, token_interval_s=0.01) as stub:
+    url = run_url(CONFIG, base_api_url=stub.base_url)
+    payload = build_payload("How do Activists feel about EVs?", tweaks={})
+
+    for run in range(RUNS):
+        start = time.perf_counter()
+        response = requests.post(url, json=payload, timeout=60)
+        text = response.json()["outputs"][0]["outputs"][0]["results"]["message"]["data"]["text"]
+        blocking = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_token = None
+        with requests.post(url, params={"stream": "true"}, json=payload, stream=True, timeout=(10, 120)) as response:
+            stream = FlowStream(response.iter_lines())
+            chunks = []
+            for chunk in stream:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                chunks.append(chunk)
+        streaming_total = time.perf_counter() - start
+        assert "".join(chunks) == text
+
+        print(f"run {run + 1}: blocking first text at {blocking * 1000:7.0f} ms | "
+              f"streaming first token at {first_token * 1000:7.0f} ms, complete at {streaming_total * 1000:7.0f} ms")
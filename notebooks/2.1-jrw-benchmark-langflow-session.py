@@ -0,0 +1,63 @@
+"""
+100 sequential run API calls over HTTPS: a bare `requests.post` per call (new TCP + TLS
+handshake each time) vs the pooled keep-alive session from `langflow_client.build_session`.
+Also checks that a 503 burst is retried transparently by the session, and that a 502
+or 504 on the run POST is not (a gateway may send it after the flow has started).
+
+Needs the `openssl` CLI to create a throwaway self-signed certificate.
+"""
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+import requests
+
+from langflow_client import build_payload, build_session, run_url
+from notebooks.langflow_stub import LangflowStub
+
+CALLS = 100
+CONFIG = {"langflow_id": "local", "flow_id": "tribe"}
+
+tmp_dir = tempfile.mkdtemp()
+certfile, keyfile = os.path.join(tmp_dir, "cert.pem"), os.path.join(tmp_dir, "key.pem")
+subprocess.run(
+    ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+     "-keyout", keyfile, "-out", certfile, "-subj", "/CN=127.0.0.1",
+     "-addext", "subjectAltName=IP:127.0.0.1"],
+    check=True, capture_output=True,
+)
+
+payload = build_payload("hello", tweaks={})
+
+with LangflowStub(pre_token_delay_s=0, n_tokens=20, token_interval_s=0, certfile=certfile, keyfile=keyfile) as stub:
+    url = run_url(CONFIG, base_api_url=stub.base_url)
+    session = build_session()
+
+    for name, post in [
+        ("requests.post per call", lambda: requests.post(url, json=payload, verify=certfile, timeout=(5, 60))),
+        ("pooled keep-alive session", lambda: session.post(url, json=payload, verify=certfile, timeout=(5, 60))),
+    ]:
+        stub.reset_counters()
+        timings = []
+        for _ in range(CALLS):
+            start = time.perf_counter()
+            post().raise_for_status()
+            timings.append(time.perf_counter() - start)
+        print(f"{name:28s} total={sum(timings) * 1000:7.0f} ms  median={statistics.median(timings) * 1000:6.2f} ms  "
+              f"connections opened={stub.connections}")
+
+with LangflowStub(pre_token_delay_s=0, n_tokens=5, token_interval_s=0, failures_before_success=2) as stub:
+    start = time.perf_counter()
+    response = build_session().post(run_url(CONFIG, base_api_url=stub.base_url), json=payload, timeout=(5, 60))
+    print(f"503 x2 then 200: status={response.status_code} after {stub.requests} attempts "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms (jittered backoff)")
+    assert response.status_code == 200 and stub.requests == 3
+
+for status in (502, 504):
+    with LangflowStub(pre_token_delay_s=0, n_tokens=5, token_interval_s=0, failures_before_success=1,
+                      failure_status=status) as stub:
+        response = build_session().post(run_url(CONFIG, base_api_url=stub.base_url), json=payload, timeout=(5, 60))
+        print(f"{status} then 200: status={response.status_code} after {stub.requests} attempt (POST not retried)")
+        assert response.status_code == status and stub.requests == 1
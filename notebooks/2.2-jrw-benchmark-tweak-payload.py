@@ -0,0 +1,48 @@
+"""
+Run API payload size and build + serialisation time: the full LANGFLOW_TWEAKS tree
+(plus the `pprint` run_flow used to do) vs the compact tweaks from TweakBuilder.
+"""
+import copy
+import io
+import json
+import timeit
+from pprint import pprint
+
+from langflow_client import build_payload
+from notebooks.flow_stub import tribe_flow_export
+from settings import LANGFLOW_TWEAKS
+from tweaks import TweakBuilder, flow_defaults_from_export
+
+N = 5000
+MESSAGE = "How might the Activist tribe react to messaging that uses authoritative scientific information?"
+OVERRIDES = {
+    "ChatInput-nM66I": {"input_value": MESSAGE},
+    "TextInput-n0QkP": {"input_value": 0},
+    "TextInput-wg8O0": {"input_value": "GB"},
+    "TextInput-JZobh": {"input_value": "climate change opinions and sentiment reactions to brands and "
+                                       "conversations around global warming and sustainability"},
+}
+
+# The deployed flow's values, as the app reads them from its export
+builder = TweakBuilder(LANGFLOW_TWEAKS, flow_defaults=flow_defaults_from_export(tribe_flow_export()))
+
+
+def full_tree_request():
+    tweaks = copy.deepcopy(LANGFLOW_TWEAKS)  # stands in for the shared .copy() without polluting it
+    for node_id, params in OVERRIDES.items():
+        tweaks.setdefault(node_id, {}).update(params)
+    pprint(tweaks, stream=io.StringIO())
+    return json.dumps(build_payload(MESSAGE, tweaks))
+
+
+def compact_request():
+    return json.dumps(build_payload(MESSAGE, builder.build(OVERRIDES)))
+
+
+for name, fn in [("full LANGFLOW_TWEAKS tree", full_tree_request), ("TweakBuilder", compact_request)]:
+    body = fn()
+    per_call = timeit.timeit(fn, number=N) / N
+    tweak_bytes = len(json.dumps(json.loads(body)["tweaks"]))
+    print(f"{name:26s} payload={len(body):5d} B  tweaks={tweak_bytes:5d} B  build+serialise={per_call * 1e6:7.1f} µs")
+
+print(f"baseline nodes kept: {list(builder.baseline)}")
@@ -0,0 +1,89 @@
+"""
+Many simulated Streamlit sessions building tweaks at once from the shared baseline.
+
+Each thread applies its own random audience filters and checks that the tweaks it sends
+carry exactly its own choices, and that the shared baseline never changes. The second
+half replays the old `LANGFLOW_TWEAKS.copy()` + in-place update pattern to show the leak
+the immutable model removes.
+"""
+import copy
+import random
+import threading
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from langflow_client import build_payload
+from notebooks.flow_stub import tribe_flow_export
+from settings import AGE_GROUPS, COUNTRIES, LANGFLOW_TWEAKS, PLATFORMS, TRIBES
+from tweaks import TweakBuilder, flow_defaults_from_export, update_tweaks_with_user_input
+
+SESSIONS = 64
+TURNS_PER_SESSION = 200
+
+# The deployed flow's values, as the app reads them from its export
+builder = TweakBuilder(LANGFLOW_TWEAKS, flow_defaults=flow_defaults_from_export(tribe_flow_export()))
+baseline_before = builder.baseline.to_dict()
+start_barrier = threading.Barrier(SESSIONS)
+
+
+def choose_audience(rng):
+    return {
+        "tribe": rng.choice(list(TRIBES.values())),
+        "age_group": rng.choice(list(AGE_GROUPS.values())),
+        "country": rng.choice(list(COUNTRIES.values())),
+        "platform": rng.choice(list(PLATFORMS.values())),
+        "gender": rng.choice(["", "male", "female"]),
+    }
+
+
+def expected_filter_values(audience):
+    nodes = {"tribe": "TextInput-n0QkP", "age_group": "TextInput-4wKnt", "country": "TextInput-wg8O0",
+             "platform": "TextInput-aYfSJ", "gender": "TextInput-WCBMY"}
+    return {nodes[key]: value for key, value in audience.items() if value}
+
+
+def session(session_id):
+    rng = random.Random(session_id)
+    start_barrier.wait()
+    errors = 0
+    for turn in range(TURNS_PER_SESSION):
+        audience = choose_audience(rng)
+        message = f"session {session_id} turn {turn}"
+        tweaks = update_tweaks_with_user_input(builder.baseline, chat_input=message, rag_query=message, **audience)
+        sent = build_payload(message, tweaks)["tweaks"]
+        expected = expected_filter_values(audience)
+        for node_id in ("TextInput-n0QkP", "TextInput-4wKnt", "TextInput-wg8O0", "TextInput-aYfSJ", "TextInput-WCBMY"):
+            if sent.get(node_id, {}).get("input_value") != expected.get(node_id):
+                errors += 1
+        if sent["ChatInput-nM66I"]["input_value"] != message or sent["TextInput-JZobh"]["input_value"] != message:
+            errors += 1
+    return errors
+
+
+with ThreadPoolExecutor(max_workers=SESSIONS) as executor:
+    errors = sum(executor.map(session, range(SESSIONS)))
+assert builder.baseline.to_dict() == baseline_before, "shared baseline was modified"
+assert errors == 0, f"{errors} cross-session leaks"
+print(f"immutable tweaks: {SESSIONS} sessions x {TURNS_PER_SESSION} turns, 0 leaks, baseline unchanged")
+
+try:
+    builder.baseline["AstraDB-wNHGZ"]["number_of_results"] = 1
+except TypeError:
+    print("immutable tweaks: writing into a shared node raises TypeError")
+
+# The old pattern: shallow copy of the module-global tree, then nested writes
+shared = copy.deepcopy(LANGFLOW_TWEAKS)
+leaks = 0
+for turn in range(1000):
+    tweaks = shared.copy()
+    tweaks["TextInput-UhThw"]["input_value"] = str(turn)  # what update_tweaks_with_user_input used to do
+    if shared["TextInput-UhThw"].get("input_value") == str(turn):
+        leaks += 1
+print(f"old .copy() pattern: {leaks}/1000 turns wrote through to the shared tree")
+
+# Per-turn cost: O(changed keys) with structural sharing vs deep-copying the tree
+per_turn_shared = timeit.timeit(
+    lambda: update_tweaks_with_user_input(builder.baseline, chat_input="hi", rag_query="q", tribe=3, country="GB"),
+    number=20000) / 20000
+per_turn_deepcopy = timeit.timeit(lambda: copy.deepcopy(LANGFLOW_TWEAKS), number=2000) / 2000
+print(f"per turn: structural sharing {per_turn_shared * 1e6:.1f} µs vs deepcopy of the tree {per_turn_deepcopy * 1e6:.1f} µs")
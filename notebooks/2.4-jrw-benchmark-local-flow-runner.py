@@ -0,0 +1,65 @@
+"""
+Per-request overhead of running the flow locally: cold (parse the export, build the
+graph and every component on each call, as `run_flow_from_json` does) vs a warm
+`FlowRunner` compiled once per process.
+
+The stub LLM calls take no time here, so the numbers are pure per-request overhead.
+The second table sets every construction cost to zero to isolate parse + compile.
+"""
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from flow_runner import FlowRunner
+from notebooks.flow_stub import stub_components, tribe_flow_export
+from tweaks import update_tweaks_with_user_input, TweakBuilder
+from settings import LANGFLOW_TWEAKS
+
+REQUESTS = 30
+
+flow_path = os.path.join(tempfile.mkdtemp(), "tribe_flow.json")
+with open(flow_path, "w", encoding="utf-8") as file:
+    json.dump(tribe_flow_export(), file)
+print(f"flow export: {os.path.getsize(flow_path) / 1024:.0f} KiB")
+
+baseline = TweakBuilder(LANGFLOW_TWEAKS).baseline
+
+
+def request_tweaks(i):
+    return update_tweaks_with_user_input(baseline, chat_input=f"question {i}", tribe=i % 8, country="GB",
+                                         rag_query="climate change opinions")
+
+
+def measure(run):
+    timings = []
+    for i in range(REQUESTS):
+        start = time.perf_counter()
+        result = run(i)
+        timings.append(time.perf_counter() - start)
+        assert result["text"].startswith("[gpt-4o-mini]"), result["text"]
+    return statistics.median(timings) * 1000, max(timings) * 1000
+
+
+for label, components in [
+    ("stub construction costs", stub_components()),
+    ("zero construction costs", stub_components(llm_init_s=0, embeddings_init_s=0, astra_init_s=0)),
+]:
+    warm_runner = FlowRunner.from_json(flow_path, components=components)
+    start = time.perf_counter()
+    warm_runner.run("warm-up", request_tweaks(0))
+    first = (time.perf_counter() - start) * 1000
+
+    cold = measure(lambda i: FlowRunner.from_json(flow_path, components=components).run(f"question {i}", request_tweaks(i)))
+    warm = measure(lambda i: warm_runner.run(f"question {i}", request_tweaks(i)))
+    print(f"\n{label}")
+    print(f"  cold  per request  median={cold[0]:8.2f} ms  max={cold[1]:8.2f} ms")
+    print(f"  warm  first request           {first:8.2f} ms")
+    print(f"  warm  per request  median={warm[0]:8.2f} ms  max={warm[1]:8.2f} ms")
+    print(f"  warm instances after {REQUESTS} requests: {len(warm_runner._instances)}")
+
+# A tweak to a warm param (here the final model) builds one new instance; the rest stay warm
+before = len(warm_runner._instances)
+result = warm_runner.run("question", request_tweaks(0).with_overrides({"OpenAIModel-k9HRn": {"model_name": "gpt-4o"}}))
+print(f"\nmodel_name tweak: {result['text'][:20]!r}, warm instances {before} -> {len(warm_runner._instances)}")
@@ -0,0 +1,49 @@
+"""
+The two analysis LLMs (Anthropic and gpt-4o) only depend on the prompt, so the runner
+should overlap them and join at CombineText: end-to-end ≈ max(branches) + the merge
+step, instead of the sum of all three model calls.
+
+Stub models sleep for fixed durations; results must match the sequential run exactly.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flow_runner import FlowRunner
+from notebooks.flow_stub import stub_components, tribe_flow_export
+
+ANTHROPIC_S, GPT4O_S, MERGE_S = 1.0, 0.6, 0.2
+TOLERANCE_S = 0.1
+
+components = stub_components(
+    llm_init_s=0, embeddings_init_s=0, astra_init_s=0,
+    llm_call_s_by_model={"claude-3-5-sonnet-latest": ANTHROPIC_S, "gpt-4o": GPT4O_S, "gpt-4o-mini": MERGE_S},
+)
+flow = tribe_flow_export()
+
+timings = {}
+outputs = {}
+for label, max_workers in [("sequential", 1), ("concurrent", 4)]:
+    runner = FlowRunner(flow, components=components, max_workers=max_workers)
+    runner.run("warm-up")
+    start = time.perf_counter()
+    result = runner.run("How might the Activist tribe react?")
+    timings[label] = time.perf_counter() - start
+    # The embeddings node outputs its (per-runner) client object; compare everything else
+    outputs[label] = {node_id: value for node_id, value in result["outputs"].items() if node_id != "OpenAIEmbeddings-tspex"}
+    runner.close()
+    print(f"{label:10s} {timings[label]:.2f} s  ->  {result['text']!r}")
+
+expected_sequential = ANTHROPIC_S + GPT4O_S + MERGE_S
+expected_concurrent = max(ANTHROPIC_S, GPT4O_S) + MERGE_S
+assert outputs["sequential"] == outputs["concurrent"], "concurrent run produced different outputs"
+assert abs(timings["sequential"] - expected_sequential) < TOLERANCE_S, timings
+assert abs(timings["concurrent"] - expected_concurrent) < TOLERANCE_S, timings
+print(f"expected sequential {expected_sequential:.2f} s, concurrent {expected_concurrent:.2f} s: OK, outputs identical")
+
+# Several requests at once share the pool without deadlocking
+runner = FlowRunner(flow, components=components, max_workers=4)
+start = time.perf_counter()
+with ThreadPoolExecutor(4) as requests:
+    results = list(requests.map(lambda i: runner.run(f"question {i}")["text"], range(4)))
+print(f"4 simultaneous requests on a 4-thread pool: {time.perf_counter() - start:.2f} s, {len(results)} results")
+runner.close()
@@ -0,0 +1,87 @@
+"""
+Prompt context size: ParseData (every hit rendered through the template) vs the
+Context Packer at a few token budgets, for 100 synthetic search hits shaped like the
+ParseJSONData output: ~15% reposts, a tail of very long posts, similarity descending.
+
+"Top-25 kept" is how many of the 25 most similar distinct posts made it into the
+context - the relevance check. Tokens are counted with the same tokenizer as the packer
+(tiktoken when installed, else its regex estimate).
+
+The packer renders through the Snippet Formatter, so the same hits as raw search
+results (before the jq field mapping) pack to the same context.
+"""
+import random
+import time
+
+from custom_components.context_packing import fingerprint, get_tokenizer, pack_context
+from custom_components.snippets import SNIPPET_FIELDS, get_snippet_formatter
+from notebooks.flow_stub import flow_parameters
+
+HITS = 100
+ANALYSIS_LLMS = 2  # the context goes to both the Anthropic and the gpt-4o analysis
+
+rng = random.Random(3)
+VOCAB = ("climate net zero emissions brands greenwashing heatwave flooding protest policy electric cars "
+         "solar wind energy bills farmers science activists youth future planet carbon tax recycling "
+         "plastic fashion travel flights diet meat vegan oil gas coal jobs economy government").split()
+
+
+def post_text():
+    words = rng.choice([rng.randint(8, 40)] * 8 + [rng.randint(300, 900)] * 2)
+    return " ".join(rng.choice(VOCAB) for _ in range(words)).capitalize() + "."
+
+
+records = []
+for i in range(HITS):
+    if records and rng.random() < 0.15:
+        # A repost: same text, different casing, hashtags and a link
+        text = rng.choice(records)["text"].upper() + " #climate https://t.co/" + str(i)
+    else:
+        text = post_text()
+    records.append({
+        "text": text,
+        "likes_count": str(int(rng.expovariate(1 / 200))),
+        "comments_count": str(int(rng.expovariate(1 / 10))),
+        "shares_count": str(int(rng.expovariate(1 / 20))),
+        "create_time": "2024-10-0%d" % rng.randint(1, 9),
+        "user_age_group_years": rng.choice(["19_29", "30_39", "Not specified"]),
+        "user_gender": rng.choice(["male", "female", "Not Specified"]),
+        "user_country": rng.choice(["GB", "US", "DE"]),
+        "user_follower_count": str(int(rng.expovariate(1 / 5000))),
+        "platform": rng.choice(["tiktok", "youtube", "twitter", "facebook"]),
+        "similarity": round(0.9 - i * 0.004, 4),
+    })
+
+parse_data = flow_parameters()["ParseData-obnZv"]
+template, sep = parse_data["template"], parse_data["sep"]
+tokenizer = get_tokenizer()
+print(f"tokenizer: {'tiktoken' if tokenizer.exact else 'regex estimate (tiktoken not installed)'}")
+
+distinct, seen = [], set()
+for record in records:
+    if fingerprint(record["text"]) not in seen:
+        seen.add(fingerprint(record["text"]))
+        distinct.append(record)
+
+formatter = get_snippet_formatter(template)
+baseline = formatter.format(records, sep=sep)
+baseline_tokens = tokenizer.count(baseline)
+print(f"{'ParseData (all hits)':28s} tokens={baseline_tokens:6d}  x{ANALYSIS_LLMS} LLMs={baseline_tokens * ANALYSIS_LLMS:6d}  "
+      f"posts={HITS:3d}")
+
+for budget in (2000, 4000, 6000, 8000):
+    start = time.perf_counter()
+    packed = pack_context(records, template=template, sep=sep, token_budget=budget)
+    elapsed = time.perf_counter() - start
+    actual = tokenizer.count(packed.text)
+    assert actual <= budget, (actual, budget)
+    kept = sum(1 for record in distinct[:25] if record["text"][:40] in packed.text)
+    print(f"{'Context Packer @ %d' % budget:28s} tokens={actual:6d}  x{ANALYSIS_LLMS} LLMs={actual * ANALYSIS_LLMS:6d}  "
+          f"posts={packed.included:3d}  dupes={packed.duplicates}  trimmed={packed.trimmed}  "
+          f"over budget={packed.over_budget:2d}  top-25 kept={kept:2d}  time={elapsed * 1000:.1f} ms")
+
+# The same hits as the Astra component returns them, before the field mapping
+raw_records = [{source: record[name] for name, (source, _) in SNIPPET_FIELDS.items()} for record in records]
+assert formatter.format(raw_records, sep=sep) == baseline
+assert pack_context(raw_records, template=template, sep=sep) == pack_context(records, template=template, sep=sep)
+print("raw search results (before the field mapping) pack to the same context")
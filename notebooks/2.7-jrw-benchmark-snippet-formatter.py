@@ -0,0 +1,83 @@
+"""
+Snippet Formatter vs the ParseJSONData (jq) + ParseData chain it replaces, at 100 and
+1,000 search results, with the query and template from the flow's TWEAKS.
+
+The chain is reproduced as Langflow runs it, minus the `Data` wrappers: each result is
+serialised to JSON and read back, the list is serialised again for jq, jq's output
+comes back as dicts, and Parse Data formats each one with `template.format(**record)`.
+Results are shaped like the Astra component's output (metadata, similarity and text),
+with some fields missing, null or false so the // defaults kick in. The check is that
+both produce exactly the same text. Needs the `jq` package, which Langflow depends on.
+"""
+import json
+import random
+import statistics
+import time
+
+import jq
+
+from custom_components.snippets import SNIPPET_FIELDS, SnippetFormatter, parse_field_mapping
+from notebooks.data_api_stub import synthetic_posts
+from notebooks.flow_stub import flow_parameters
+
+REPEATS = 50
+
+parameters = flow_parameters()
+query = parameters["ParseJSONData-eeEA0"]["query"]
+template, sep = parameters["ParseData-obnZv"]["template"], parameters["ParseData-obnZv"]["sep"]
+assert parse_field_mapping(query) == SNIPPET_FIELDS, parse_field_mapping(query)
+
+
+def search_results(count):
+    rng = random.Random(count)
+    results = []
+    for i, post in enumerate(synthetic_posts(count, dim=1)):
+        record = {**post["metadata"], "similarity": round(0.9 - i / count / 2, 4), "text": post["$vectorize"]}
+        for field in ("age", "gender", "country", "likes", "shares", "create_time"):
+            roll = rng.random()
+            if roll < 0.05:
+                del record[field]
+            elif roll < 0.08:
+                record[field] = None
+            elif roll < 0.1:
+                record[field] = False
+        results.append(record)
+    return results
+
+
+program = jq.compile(query)
+
+
+def jq_chain(results):
+    as_dicts = [json.loads(json.dumps(result)) for result in results]  # ParseJSONData: Data -> JSON -> dict
+    filtered = program.input_text(json.dumps(as_dicts)).all()
+    return sep.join(template.format(data=record, **record) for record in filtered)  # ParseData
+
+
+formatter = SnippetFormatter(template, parse_field_mapping(query))
+
+
+def fused(results):
+    return formatter.format(results, sep=sep)
+
+
+def median_time(function, results):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(results)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+for count in (100, 1000):
+    results = search_results(count)
+    assert fused(results) == jq_chain(results), "outputs differ"
+    chain_s, fused_s = median_time(jq_chain, results), median_time(fused, results)
+    print(f"{count:5d} results: jq + Parse Data {chain_s * 1000:7.2f} ms, Snippet Formatter {fused_s * 1000:6.2f} ms "
+          f"({chain_s / fused_s:.0f}x faster), same text ({len(fused(results))} chars)")
+
+start = time.perf_counter()
+SnippetFormatter(template, parse_field_mapping(query))
+print(f"compiling the formatter: {(time.perf_counter() - start) * 1e6:.0f} us (once per template and mapping)")
+print("\n" + fused(search_results(100)[:2]))
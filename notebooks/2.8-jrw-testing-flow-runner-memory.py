@@ -0,0 +1,39 @@
+"""
+Chat history through the local flow runner: ChatInput and ChatOutput save each turn and
+the Memory node feeds it back into the prompt's `history`, as with `run_flow_from_json`.
+
+Two turns in one session: the second turn's prompt must carry the first turn's question
+and answer. A turn in another session must not, nor a second runner (fresh store). Run
+both sequentially and with the thread pool, with the main.py tweaks (empty session ids).
+"""
+from flow_runner import FlowRunner
+from notebooks.flow_stub import flow_parameters, stub_components, tribe_flow_export
+
+PROMPT = "Prompt-oU1Ym"
+TURN_1 = "How might the Activist tribe react to authoritative science?"
+TURN_2 = "And to messaging about solutions?"
+
+components = stub_components(llm_init_s=0, embeddings_init_s=0, astra_init_s=0)
+flow = tribe_flow_export()
+tweaks = flow_parameters()
+
+
+def history(result):
+    prompt = result["outputs"][PROMPT]
+    return prompt.split("Chat history:\n\n", 1)[1].split("\n\n---", 1)[0]
+
+
+for label, max_workers in [("sequential", 1), ("concurrent", 4)]:
+    runner = FlowRunner(flow, components=components, max_workers=max_workers)
+    first = runner.run(TURN_1, tweaks)
+    second = runner.run(TURN_2, tweaks)
+    other = runner.run(TURN_2, tweaks, session_id="another-session")
+    fresh = FlowRunner(flow, components=components, max_workers=max_workers).run(TURN_2, tweaks)
+    runner.close()
+
+    # Memory reads newest first (main.py: "Descending"), after this turn's question is saved
+    assert history(first) == f"User: {TURN_1}", history(first)
+    assert history(second) == f"User: {TURN_2}\nAI: {first['text']}\nUser: {TURN_1}", history(second)
+    assert TURN_1 not in history(other) and TURN_1 not in history(fresh)
+    print(f"{label:10s} turn 2 history:\n    " + history(second).replace("\n", "\n    "))
+    print(f"{'':10s} another session: {history(other)!r}; fresh runner: {history(fresh)!r}")
@@ -0,0 +1,25 @@
+"""
+Prompt node templates in the local flow runner, against Python's own f-string template
+formatting (what Langflow's prompt component uses): {{ and }} are literal braces, and
+nothing inside them is substituted.
+"""
+from flow_runner import COMPONENTS
+
+prompt = COMPONENTS["Prompt"]()
+variables = {"context": "posts", "question": "why?", "example": "SUBSTITUTED"}
+templates = [
+    "Question: {question}\n\n{context}",
+    "Answer as JSON like {{example}}: {question}",
+    'Shape: {{"summary": "...", "quotes": [...]}}',
+    "{{{question}}}",
+    "Closing only }} and opening only {{",
+    "{context}{{context}}{context}",
+]
+for template in templates:
+    got = prompt.run(template=template, **variables)
+    expected = template.format(**variables)
+    assert got == expected, (template, got, expected)
+    print(f"{template!r:50s} -> {got!r}")
+
+# A variable with no value is left as it is, as before
+assert prompt.run(template="{missing} {{x}}", question="q") == "{missing} {x}"
@@ -0,0 +1,279 @@
+"""
+Minimal local stand-in for the Astra Data API, used by the benchmark notebooks.
+
+It speaks just enough of the JSON command protocol for astrapy's `find`,
+`findOne`, `insertMany`, `countDocuments` and `findCollections` calls against a
+single in-memory collection, with an optional fixed per-request latency to
+mimic the round trip to Astra. Run the notebooks from the repo root, e.g.
+
+    PYTHONPATH=. python notebooks/1.2-jrw-benchmark-astra-connection-pool.py
+"""
+import json
+import math
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KEYSPACE = "default_keyspace"
+COLLECTION = "climate_change"
+
+PLATFORM_NAMES = ["TikTok", "Facebook", "YouTube", "Twitter"]
+COUNTRY_CODES = ["GB", "US", "CN", "IN", "DE"]
+AGE_CODES = ["<=18", "19_29", "30_39", "40+"]
+
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None, False
+        value = value[part]
+    return value, True
+
+
+def _match_condition(value, present, condition):
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$exists":
+                if present != bool(operand):
+                    return False
+            elif op == "$in":
+                if value not in operand:
+                    return False
+            elif op == "$nin":
+                if value in operand:
+                    return False
+            elif op == "$ne":
+                if value == operand:
+                    return False
+            elif op == "$eq":
+                if value != operand:
+                    return False
+            else:
+                if not present or value is None:
+                    return False
+                try:
+                    if op == "$gt" and not value > operand:
+                        return False
+                    if op == "$gte" and not value >= operand:
+                        return False
+                    if op == "$lt" and not value < operand:
+                        return False
+                    if op == "$lte" and not value <= operand:
+                        return False
+                except TypeError:
+                    return False
+        return True
+    return present and value == condition
+
+
+def matches(doc, filter_dict):
+    for key, condition in (filter_dict or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        else:
+            value, present = _get_path(doc, key)
+            if not _match_condition(value, present, condition):
+                return False
+    return True
+
+
+def _cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    if not norm:
+        return 0.5
+    # Astra reports cosine similarity rescaled to [0, 1]
+    return (1 + dot / norm) / 2
+
+
+def _project(doc, projection):
+    if not projection or projection.get("*"):
+        return dict(doc)
+    included = [k for k, v in projection.items() if v]
+    if not included:
+        return {k: v for k, v in doc.items() if projection.get(k, True)}
+    result = {"_id": doc["_id"]}
+    for path in included:
+        value, present = _get_path(doc, path)
+        if not present:
+            continue
+        target = result
+        parts = path.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return result
+
+
+def _sort_key(sort):
+    fields = list(sort.items())
+
+    def key(doc):
+        out = []
+        for field, direction in fields:
+            value, _ = _get_path(doc, field)
+            out.append((value is None, value if value is not None else 0))
+        return out
+
+    reverse = bool(fields) and fields[0][1] < 0
+    return key, reverse
+
+
+class DataAPIStub:
+    """An in-memory collection served over HTTP/1.1 with keep-alive."""
+
+    def __init__(self, documents=None, latency_s: float = 0.0, page_size: int = 20):
+        self.documents = list(documents or [])
+        self.latency_s = latency_s
+        self.page_size = page_size
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def api_endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency_s:
+                    time.sleep(stub.latency_s)
+                body = json.dumps(stub.handle(self.path, payload)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, path, payload):
+        command, body = next(iter(payload.items()))
+        if command == "findCollections":
+            return {"status": {"collections": [COLLECTION]}}
+        if command in ("find", "findOne"):
+            return self._find(body, single=command == "findOne")
+        if command == "insertMany":
+            with self._lock:
+                self.documents.extend(body.get("documents", []))
+            return {"status": {"insertedIds": [d.get("_id") for d in body.get("documents", [])]}}
+        if command == "countDocuments":
+            count = sum(1 for d in self.documents if matches(d, body.get("filter")))
+            return {"status": {"count": count}}
+        return {"errors": [{"message": f"Unsupported command: {command}"}]}
+
+    def _find(self, body, single=False):
+        options = body.get("options") or {}
+        sort = body.get("sort") or {}
+        docs = [d for d in self.documents if matches(d, body.get("filter"))]
+        limit = options.get("limit") or (1 if single else None)
+        include_similarity = options.get("includeSimilarity", False)
+        if "$vector" in sort:
+            query = sort["$vector"]
+            scored = sorted(
+                ((_cosine_similarity(query, d.get("$vector") or []), d) for d in docs),
+                key=lambda pair: pair[0],
+                reverse=True,
+            )[: min(limit or 1000, 1000)]
+            out = []
+            for similarity, doc in scored:
+                projected = _project(doc, body.get("projection"))
+                if include_similarity:
+                    projected["$similarity"] = similarity
+                out.append(projected)
+            if single:
+                return {"data": {"document": out[0] if out else None}}
+            return {"data": {"documents": out, "nextPageState": None}}
+
+        if sort:
+            key, reverse = _sort_key(sort)
+            docs.sort(key=key, reverse=reverse)
+        start = int(body.get("pageState") or options.get("pageState") or 0)
+        if limit is not None:
+            docs = docs[:limit]
+        page = docs[start:start + self.page_size]
+        next_state = str(start + self.page_size) if start + self.page_size < len(docs) else None
+        out = [_project(d, body.get("projection")) for d in page]
+        if single:
+            return {"data": {"document": out[0] if out else None}}
+        return {"data": {"documents": out, "nextPageState": next_state}}
+
+
+def random_vector(dim: int, rng: random.Random):
+    vec = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+def synthetic_posts(n: int, dim: int = 64, seed: int = 7):
+    """Fake social posts shaped like the documents in the climate_change collection."""
+    rng = random.Random(seed)
+    base_time = 1_700_000_000
+    for i in range(n):
+        yield {
+            "_id": f"post-{i:07d}",
+            "$vector": random_vector(dim, rng),
+            "$vectorize": f"Post {i} about climate change, tribe {i % 8}, #{rng.choice(['cop28', 'netzero', 'ev'])}",
+            "created_at": base_time + i * 60,
+            "metadata": {
+                "tribe": i % 8,
+                "platform": rng.choice(PLATFORM_NAMES),
+                "country": rng.choice(COUNTRY_CODES),
+                "age": rng.choice(AGE_CODES),
+                "gender": rng.choice(["male", "female"]),
+                "likes": int(rng.expovariate(1 / 200)),
+                "shares": int(rng.expovariate(1 / 20)),
+                "comments": int(rng.expovariate(1 / 10)),
+                "follower_count": int(rng.expovariate(1 / 5000)),
+                "create_time": base_time + i * 60,
+            },
+        }
@@ -0,0 +1,169 @@
+"""
+A stand-in for the TRIBE flow export, plus stub components, for the flow runner notebooks.
+
+`tribe_flow_export()` builds a Langflow-shaped export with the same node ids, parameters
+(the full `TWEAKS` in main.py) and wiring as the real flow. Every node embeds the
+Astra component's source as its `code`, so the file is about as large as a real export.
+
+`stub_components()` returns component classes that sleep instead of constructing real
+clients or calling real APIs; the default construction costs are rough stand-ins for
+the real ones (the Astra figure is the database/collection info round trips measured in
+1.2-jrw-benchmark-astra-connection-pool).
+"""
+import ast
+import os
+import time
+
+from flow_runner import FlowComponent, as_text
+from settings import BASE_DIR
+
+NODE_TYPES = {
+    "ChatInput-nM66I": "ChatInput",
+    "AstraDB-wNHGZ": "AstraDB",
+    "ParseData-obnZv": "ParseData",
+    "ChatOutput-plpD3": "ChatOutput",
+    "AnthropicModel-FvFsG": "AnthropicModel",
+    "TextOutput-xfM5I": "TextOutput",
+    "ParseJSONData-eeEA0": "ParseJSONData",
+    "TextInput-n0QkP": "TextInput",
+    "MetaDataFilterConstructor-vAJyP": "MetaDataFilterConstructor",
+    "TextInput-P1BmY": "TextInput",
+    "TextInput-4wKnt": "TextInput",
+    "TextInput-wg8O0": "TextInput",
+    "TextInput-aYfSJ": "TextInput",
+    "TextInput-WCBMY": "TextInput",
+    "TextInput-Uk4ri": "TextInput",
+    "Memory-MeAfJ": "Memory",
+    "Prompt-oU1Ym": "Prompt",
+    "TextInput-JZobh": "TextInput",
+    "TextInput-UhThw": "TextInput",
+    "OpenAIModel-wA6hw": "OpenAIModel",
+    "CombineText-88DLO": "CombineText",
+    "OpenAIModel-k9HRn": "OpenAIModel",
+    "Prompt-fJCSt": "Prompt",
+    "OpenAIEmbeddings-tspex": "OpenAIEmbeddings",
+}
+
+# (source, source output, target, target field)
+EDGES = [
+    ("ChatInput-nM66I", "message", "Prompt-oU1Ym", "question"),
+    ("Memory-MeAfJ", "messages_text", "Prompt-oU1Ym", "history"),
+    ("TextInput-n0QkP", "text", "MetaDataFilterConstructor-vAJyP", "tribe"),
+    ("TextInput-4wKnt", "text", "MetaDataFilterConstructor-vAJyP", "age"),
+    ("TextInput-wg8O0", "text", "MetaDataFilterConstructor-vAJyP", "country"),
+    ("TextInput-WCBMY", "text", "MetaDataFilterConstructor-vAJyP", "gender"),
+    ("TextInput-aYfSJ", "text", "MetaDataFilterConstructor-vAJyP", "platform"),
+    ("TextInput-UhThw", "text", "MetaDataFilterConstructor-vAJyP", "followers"),
+    ("TextInput-P1BmY", "text", "MetaDataFilterConstructor-vAJyP", "likes_minimum"),
+    ("TextInput-Uk4ri", "text", "MetaDataFilterConstructor-vAJyP", "datetime_from"),
+    ("MetaDataFilterConstructor-vAJyP", "filter", "AstraDB-wNHGZ", "search_filter"),
+    ("TextInput-JZobh", "text", "AstraDB-wNHGZ", "search_input"),
+    ("OpenAIEmbeddings-tspex", "embeddings", "AstraDB-wNHGZ", "embedding"),
+    ("AstraDB-wNHGZ", "search_results", "ParseJSONData-eeEA0", "input_value"),
+    ("ParseJSONData-eeEA0", "filtered_data", "ParseData-obnZv", "data"),
+    ("ParseData-obnZv", "text", "Prompt-oU1Ym", "context"),
+    ("Prompt-oU1Ym", "prompt", "AnthropicModel-FvFsG", "input_value"),
+    ("Prompt-oU1Ym", "prompt", "OpenAIModel-wA6hw", "input_value"),
+    ("AnthropicModel-FvFsG", "text_output", "CombineText-88DLO", "text1"),
+    ("OpenAIModel-wA6hw", "text_output", "CombineText-88DLO", "text2"),
+    ("CombineText-88DLO", "combined_text", "TextOutput-xfM5I", "input_value"),
+    ("CombineText-88DLO", "combined_text", "Prompt-fJCSt", "context"),
+    ("TextInput-JZobh", "text", "Prompt-fJCSt", "topic"),
+    ("Prompt-fJCSt", "prompt", "OpenAIModel-k9HRn", "input_value"),
+    ("OpenAIModel-k9HRn", "text_output", "ChatOutput-plpD3", "input_value"),
+]
+
+SECRET_FIELDS = {"token", "api_key", "anthropic_api_key", "openai_api_key"}
+
+
+def flow_parameters() -> dict:
+    """The `TWEAKS` literal from main.py, read without importing it (and langflow)."""
+    with open(os.path.join(BASE_DIR, "main.py"), encoding="utf-8") as file:
+        module = ast.parse(file.read())
+    for statement in module.body:
+        if isinstance(statement, ast.Assign) and getattr(statement.targets[0], "id", None) == "TWEAKS":
+            return ast.literal_eval(statement.value)
+    raise LookupError("TWEAKS not found in main.py")
+
+
+def tribe_flow_export() -> dict:
+    parameters = flow_parameters()
+    with open(os.path.join(BASE_DIR, "custom_components", "astradb_hack.py"), encoding="utf-8") as file:
+        code = file.read()
+
+    outputs = {}
+    for source, output, _, _ in EDGES:
+        outputs.setdefault(source, []).append(output)
+    nodes = []
+    for node_id, node_type in NODE_TYPES.items():
+        template = {name: {"value": value, "load_from_db": name in SECRET_FIELDS}
+                    for name, value in parameters.get(node_id, {}).items()}
+        template["code"] = {"value": code}
+        node_outputs = [{"name": name, "method": f"build_{name}"} for name in dict.fromkeys(outputs.get(node_id, []))]
+        nodes.append({"id": node_id, "data": {"type": node_type, "node": {"template": template, "outputs": node_outputs}}})
+    edges = [{"source": source, "target": target,
+              "data": {"sourceHandle": {"name": output}, "targetHandle": {"fieldName": field}}}
+             for source, output, target, field in EDGES]
+    return {"data": {"nodes": nodes, "edges": edges}}
+
+
+def stub_components(llm_init_s: float = 0.04, embeddings_init_s: float = 0.12, astra_init_s: float = 0.16,
+                    llm_call_s: float = 0.0, llm_call_s_by_model: dict = None, search_results: int = 25) -> dict:
+    """Component classes for the export's external node types, with the given sleep costs; Memory runs natively."""
+    llm_call_s_by_model = llm_call_s_by_model or {}
+
+    class StubChatModel(FlowComponent):
+        warm_params = ("model_name", "model", "api_key", "anthropic_api_key", "temperature")
+
+        def __init__(self, **params):
+            super().__init__(**params)
+            time.sleep(llm_init_s)
+            self.model = params.get("model_name") or params.get("model")
+
+        def run(self, input_value="", **params):
+            time.sleep(llm_call_s_by_model.get(self.model, llm_call_s))
+            return f"[{self.model}] analysis of {len(as_text(input_value))} characters"
+
+    class StubEmbeddings(FlowComponent):
+        warm_params = ("model", "openai_api_key")
+
+        def __init__(self, **params):
+            super().__init__(**params)
+            time.sleep(embeddings_init_s)
+
+        def run(self, **params):
+            return self
+
+    class StubAstraDB(FlowComponent):
+        warm_params = ("token", "api_endpoint", "collection_name", "namespace")
+
+        def __init__(self, **params):
+            super().__init__(**params)
+            time.sleep(astra_init_s)
+
+        def run(self, search_input="", search_filter=None, **params):
+            return [{"text": f"post {i} about {search_input}", "likes": i, "country": "GB", "platform": "tiktok"}
+                    for i in range(search_results)]
+
+    class StubFilterConstructor(FlowComponent):
+        def run(self, **params):
+            return {f"metadata.{key}": value for key, value in params.items() if value not in ("", None)}
+
+    class StubParseJSONData(FlowComponent):
+        def run(self, input_value=(), **params):
+            return [{"text": row["text"], "likes_count": row.get("likes", "0"), "platform": row.get("platform")}
+                    for row in input_value]
+
+    class StubParseData(FlowComponent):
+        def run(self, data=(), sep="\n", template="{text}", **params):
+            return sep.join(f"{row['text']} ({row['likes_count']} likes, {row['platform']})" for row in data)
+
+    return {
+        "OpenAIModel": StubChatModel,
+        "AnthropicModel": StubChatModel,
+        "OpenAIEmbeddings": StubEmbeddings,
+        "AstraDB": StubAstraDB,
+        "MetaDataFilterConstructor": StubFilterConstructor,
+        "ParseJSONData": StubParseJSONData,
+        "ParseData": StubParseData,
+    }
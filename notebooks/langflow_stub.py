@@ -0,0 +1,131 @@
+"""
+Fake Langflow run API for the benchmark notebooks.
+
+`POST /lf/<langflow_id>/api/v1/run/<flow_id>` waits `pre_token_delay_s` (standing in for
+retrieval and the two analysis LLMs), then "generates" `n_tokens` tokens, one every
+`token_interval_s`. With `?stream=true` each token is sent as a chunked
+`{"event": "token", ...}` event followed by an `end` event carrying the run result;
+otherwise the whole result is returned once generation is finished.
+
+The first `failures_before_success` requests are answered with `failure_status`, and
+passing `certfile`/`keyfile` serves HTTPS so TLS handshakes show up in timings.
+"""
+import json
+import socket
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def run_result(text: str) -> dict:
+    return {"outputs": [{"outputs": [{"results": {"message": {"data": {"text": text}}}}]}]}
+
+
+class LangflowStub:
+    def __init__(self, pre_token_delay_s: float = 1.0, n_tokens: int = 200, token_interval_s: float = 0.01,
+                 failures_before_success: int = 0, failure_status: int = 503,
+                 certfile: str = None, keyfile: str = None):
+        self.pre_token_delay_s = pre_token_delay_s
+        self.n_tokens = n_tokens
+        self.token_interval_s = token_interval_s
+        self.failures_before_success = failures_before_success
+        self.failure_status = failure_status
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.requests = 0
+        self.connections = 0
+        self.payloads = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        scheme = "https" if self.certfile else "http"
+        return f"{scheme}://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                with stub._lock:
+                    stub.requests += 1
+                    attempt = stub.requests
+                    stub.payloads.append(raw)
+                if attempt <= stub.failures_before_success:
+                    self._send_json(stub.failure_status, {"detail": "try again"})
+                    return
+
+                tokens = [f"token{i} " for i in range(stub.n_tokens)]
+                stream = parse_qs(urlparse(self.path).query).get("stream", ["false"])[0].lower() == "true"
+                time.sleep(stub.pre_token_delay_s)
+                if not stream:
+                    time.sleep(stub.token_interval_s * stub.n_tokens)
+                    self._send_json(200, run_result("".join(tokens)))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    event = {"event": "token", "data": {"chunk": token, "id": "msg-1"}}
+                    self._send_chunk(json.dumps(event).encode() + b"\n\n")
+                    time.sleep(stub.token_interval_s)
+                end = {"event": "end", "data": {"result": run_result("".join(tokens))}}
+                self._send_chunk(json.dumps(end).encode() + b"\n\n")
+                self._send_chunk(b"")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        if self.certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile, self.keyfile)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+            self.payloads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
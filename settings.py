@@ -5,15 +5,36 @@ BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 LANGFLOW_DIR = os.path.join(BASE_DIR, "langflow_jsons")
 CONF_DIR = os.path.join(BASE_DIR, "conf")
 
+# Tweaks equal to the deployed flow's own parameter values are not re-sent on every request
+# (see tweaks.TweakBuilder). Those values are read from this export, so re-export it whenever
+# the deployed flow changes; if it can't be read, every tweak is sent.
 LANGFLOW_JSON_FILE = os.path.join(LANGFLOW_DIR, "TRIBE for Climate Convos (4).json")
 CONF_FILE = os.path.join(CONF_DIR, "config.json")
 
 ASTRADB_BATCH_SIZE: int = 50
 ASTRADB_RESULT_SIZE: int = 25
-ASTRADB_SEARCH_TYPE: str = "Custom Search"  # "Custom Search" or "Similarity" or "Similarity with score threshold"
+ASTRADB_SEARCH_TYPE: str = "Custom Search"  # "Custom Search" or "Per-Tribe Fan-out" or "Similarity" or "Similarity with score threshold"
 ASTRADB_SEARCH_SCORE_THRESHOLD: float = 0.3
 ASTRADB_TIMEOUT_MS: int = 10000
 
+# Stream the final report into the chat as it is generated (via the run API's stream=true mode).
+# Off by default: the app waits for the whole response, as it always has; set True to opt in
+LANGFLOW_STREAM: bool = False
+LANGFLOW_STREAM_COMPONENT: str = "OpenAIModel-k9HRn"  # the gpt-4o-mini merge step that writes the final report
+
+# Run the flow in-process with flow_runner.FlowRunner (compiled once, components kept warm)
+# instead of langflow's run_flow_from_json, in main.py and the local app. Opt-in: the
+# nodes it runs through their embedded langflow code (Astra store, filter constructor,
+# parse nodes) have not been checked against the real export yet
+LANGFLOW_LOCAL_RUNNER: bool = False
+
+# Run API timeouts: connect is the TCP/TLS handshake, read is the longest gap between bytes.
+# The longest gap is the first one: nothing arrives until the search and both analysis LLMs
+# (each up to 4096 tokens) have finished - and, without streaming, the merge step too - so
+# read allows for all of that rather than for a gap between tokens
+LANGFLOW_CONNECT_TIMEOUT_S: float = 5
+LANGFLOW_READ_TIMEOUT_S: float = 180
+
 TRIBES = {
     "All tribes": "",
     "Activists": 0,
@@ -0,0 +1,170 @@
+"""
+Build the per-request `tweaks` for the Langflow run API.
+
+`settings.LANGFLOW_TWEAKS` mirrors the whole flow: two dozen empty node dicts and an
+AstraDB block that mostly repeats what the deployed flow already holds. The builder
+prunes that baseline once, at import time, against the parameter values in the flow's
+export (`load_flow_defaults`), and each turn only layers the user's overrides (chat
+input, filters, RAG query) on top.
+
+Tweaks are immutable. Streamlit serves every browser session from the same process,
+so a shared baseline that one session could write into (as `LANGFLOW_TWEAKS.copy()`
+allowed, being a shallow copy) leaks filters into everyone else's runs. `Tweaks`
+hands out read-only node views and `with_overrides` returns a new value that shares
+every untouched node with its parent, so an override costs O(changed keys).
+"""
+import json
+from types import MappingProxyType
+from typing import Iterator, Mapping, Optional
+
+
+def canonical_json(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def compact_tweaks(tweaks: Mapping, flow_defaults: Optional[Mapping] = None) -> dict:
+    """
+    Drop empty node dicts, and any parameter equal to the value the flow already holds.
+
+    `flow_defaults` is `{node_id: {param: value}}` for the deployed flow; parameters it
+    doesn't mention are always kept.
+    """
+    flow_defaults = flow_defaults or {}
+    compacted = {}
+    for node_id, params in tweaks.items():
+        defaults = flow_defaults.get(node_id, {})
+        kept = {key: value for key, value in params.items()
+                if not (key in defaults and defaults[key] == value)}
+        if kept:
+            compacted[node_id] = kept
+    return compacted
+
+
+def flow_defaults_from_export(flow: Mapping) -> dict:
+    """`{node_id: {param: value}}` as held by a Langflow export's node templates."""
+    data = flow.get("data", flow)
+    return {raw["id"]: {name: field.get("value") for name, field in raw["data"]["node"].get("template", {}).items()
+                        if isinstance(field, dict) and name != "code"}
+            for raw in data["nodes"]}
+
+
+def load_flow_defaults(path: str) -> dict:
+    """
+    The parameter values of the flow export at `path`, for `compact_tweaks`.
+
+    An export that can't be read gives {}: nothing is compacted away, so every tweak is
+    sent, as without a builder.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            return flow_defaults_from_export(json.load(file))
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+class Tweaks(Mapping):
+    """Immutable `{node_id: {param: value}}` mapping with structurally shared nodes."""
+
+    __slots__ = ("_nodes",)
+
+    def __init__(self, nodes: Optional[Mapping] = None):
+        self._nodes = {node_id: params if isinstance(params, MappingProxyType) else MappingProxyType(dict(params))
+                       for node_id, params in (nodes or {}).items()}
+
+    @classmethod
+    def _from_frozen(cls, nodes: dict) -> "Tweaks":
+        tweaks = cls.__new__(cls)
+        tweaks._nodes = nodes
+        return tweaks
+
+    def __getitem__(self, node_id: str) -> Mapping:
+        return self._nodes[node_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __repr__(self) -> str:
+        return f"Tweaks({self.to_dict()!r})"
+
+    def with_overrides(self, overrides: Mapping) -> "Tweaks":
+        """
+        A new `Tweaks` with `overrides` applied; `self` is left untouched.
+
+        Only nodes whose values actually change get a new (frozen) dict - every other
+        node is shared with `self`. Returns `self` when nothing changes.
+        """
+        changed = {}
+        for node_id, params in overrides.items():
+            base = self._nodes.get(node_id)
+            if base is None:
+                if params:
+                    changed[node_id] = MappingProxyType(dict(params))
+                continue
+            node_changes = {key: value for key, value in params.items()
+                            if key not in base or base[key] != value}
+            if node_changes:
+                changed[node_id] = MappingProxyType({**base, **node_changes})
+        if not changed:
+            return self
+        return Tweaks._from_frozen({**self._nodes, **changed})
+
+    def to_dict(self) -> dict:
+        """Plain, JSON-serialisable copy for the request payload."""
+        return {node_id: dict(params) for node_id, params in self._nodes.items()}
+
+
+class TweakBuilder:
+    def __init__(self, baseline: Mapping, flow_defaults: Optional[Mapping] = None):
+        self.baseline = Tweaks(compact_tweaks(baseline, flow_defaults))
+
+    def build(self, overrides: Optional[Mapping] = None) -> Tweaks:
+        """Baseline plus per-request overrides, sharing every untouched node with the baseline."""
+        return self.baseline.with_overrides(overrides or {})
+
+
+# Function to update tweaks with user inputs
+def update_tweaks_with_user_input(
+        tweaks: Tweaks,
+        chat_input: str,
+        tribe: Optional[int] = None,
+        age_group: Optional[str] = None,
+        country: Optional[str] = None,
+        gender: Optional[str] = None,
+        platform: Optional[str] = None,
+        rag_query: Optional[str] = None,
+        min_follower_count: Optional[str] = None,
+        min_likes_count: Optional[str] = None) -> Tweaks:
+    """
+    Return `tweaks` with this turn's user inputs applied.
+
+    `tweaks` itself is never modified - it is shared by every browser session.
+    """
+    overrides = {'ChatInput-nM66I': {'input_value': chat_input}}
+
+    if tribe and tribe != "":
+        overrides['TextInput-n0QkP'] = {'input_value': tribe}
+
+    if age_group and age_group != "":
+        overrides['TextInput-4wKnt'] = {'input_value': age_group}  # Age group filter
+
+    if country and country != "":
+        overrides['TextInput-wg8O0'] = {'input_value': country}  # Country filter
+
+    if gender and gender != "":
+        overrides['TextInput-WCBMY'] = {'input_value': gender}
+
+    if platform and platform != "":
+        overrides['TextInput-aYfSJ'] = {'input_value': platform}
+
+    if min_follower_count and min_follower_count != "":
+        overrides['TextInput-UhThw'] = {'input_value': min_follower_count}  # Minimum follower count
+
+    if min_likes_count and min_likes_count != "":
+        overrides['TextInput-P1BmY'] = {'input_value': min_likes_count}  # Minimum likes count
+
+    overrides['TextInput-JZobh'] = {'input_value': rag_query}  # RAG query
+
+    return tweaks.with_overrides(overrides)